@@ -0,0 +1,101 @@
+# Benchmark: diff palavra a palavra das seções — difflib.SequenceMatcher(autojunk=False) sobre
+# listas de strings (caminho antigo) vs diff_utils.opcodes (ids inteiros, histograma + Myers).
+#
+# Uso: python benchmarks/bench_diff.py arquivo.(pdf|docx|txt) [--multiplicar 1] [--repeticoes 3] [--semente 0]
+# O corpus sai do texto do arquivo, em pares (referência, documento) com perfis de edição:
+# poucas trocas, muitas trocas, parágrafo movido, lista longa e repetitiva (como REAÇÕES
+# ADVERSAS) e textos sem relação. Tokens como nas páginas (normalizados). Para cada perfil:
+# tempo dos dois caminhos, tokens casados como iguais e validade dos opcodes.
+import os
+import re
+import sys
+import time
+import random
+import difflib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texto_utils import normalizar_texto
+from diff_utils import opcodes
+from bench_pontuacao import ler_texto
+
+_RX_TOKEN = re.compile(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]')
+
+
+def tokens(texto):
+    texto = re.sub(r'([.,;?!()\[\]])', r' \1 ', texto)
+    return [' ' if t == '\n' else normalizar_texto(t) if t[0].isalnum() else t.strip()
+            for t in _RX_TOKEN.findall(texto)]
+
+
+def trocar(toks, fracao, rnd):
+    saida = list(toks)
+    for _ in range(max(1, int(len(saida) * fracao))):
+        i = rnd.randrange(len(saida))
+        op = rnd.random()
+        if op < 0.4: saida[i] = rnd.choice(toks)
+        elif op < 0.7: saida.insert(i, rnd.choice(toks))
+        else: del saida[i]
+    return saida
+
+
+def corpus(texto, rnd):
+    paragrafos = [p for p in texto.split("\n") if p.strip()]
+    base = tokens(texto)
+    movido = list(paragrafos)
+    movido.insert(rnd.randrange(len(movido)), movido.pop(rnd.randrange(len(movido))))
+    lista = [f"{rnd.choice(['Comum', 'Incomum', 'Rara'])} (> 1/{rnd.choice([10, 100, 1000])}): "
+             f"{rnd.choice(paragrafos)[:60]}." for _ in range(max(50, len(paragrafos)))]
+    lista = tokens("\n".join(lista))
+    meio = len(base) // 2
+    return {
+        "poucas trocas": (base, trocar(base, 0.005, rnd)),
+        "muitas trocas": (base, trocar(base, 0.10, rnd)),
+        "parágrafo movido": (base, tokens("\n".join(movido))),
+        "lista repetitiva": (lista, trocar(lista, 0.02, rnd)),
+        "sem relação": (base[:meio], base[meio:]),
+    }
+
+
+def casados(ops):
+    return sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == 'equal')
+
+
+def valido(a, b, ops):
+    i = j = 0
+    for tag, i1, i2, j1, j2 in ops:
+        if (i1, j1) != (i, j) or (tag == 'equal' and a[i1:i2] != b[j1:j2]): return False
+        i, j = i2, j2
+    return (i, j) == (len(a), len(b))
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("arquivo")
+    parser.add_argument("--multiplicar", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    texto = "\n".join([ler_texto(args.arquivo)] * args.multiplicar)
+    print(f"{'perfil':<18} {'tokens':>13} {'difflib':>10} {'motor':>10} {'casados difflib/motor':>22}  válido")
+    for nome, (a, b) in corpus(texto, random.Random(args.semente)).items():
+        t_antigo, r_antigo = medir(lambda: difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes(),
+                                   args.repeticoes)
+        t_novo, r_novo = medir(lambda: opcodes(a, b), args.repeticoes)
+        print(f"{nome:<18} {len(a):>6}x{len(b):<6} {t_antigo * 1000:>7.1f} ms {t_novo * 1000:>7.1f} ms "
+              f"{casados(r_antigo):>10}/{casados(r_novo):<11} {'sim' if valido(a, b, r_novo) else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
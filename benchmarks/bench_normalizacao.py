@@ -0,0 +1,53 @@
+# Benchmark: normalizar_texto por token — sem cache (caminho antigo) vs cache do processo.
+#
+# Uso: python benchmarks/bench_normalizacao.py arquivo.(pdf|docx|txt) [--repeticoes 5]
+# Normaliza os tokens do diff palavra a palavra e as linhas do texto, como as páginas fazem
+# numa auditoria (os dois lados: o texto entra duas vezes). A primeira rodada com cache
+# começa vazia; as seguintes simulam uma nova auditoria no mesmo processo.
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import texto_utils
+from texto_utils import normalizar_texto, normalizar_texto_sem_cache, estatisticas_normalizacao
+from bench_pontuacao import ler_texto
+
+_RX_TOKEN = re.compile(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]')
+
+
+def medir(funcao, entradas):
+    t0 = time.perf_counter()
+    resultado = [funcao(e) for e in entradas]
+    return time.perf_counter() - t0, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("arquivo")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    texto = ler_texto(args.arquivo)
+    tokens = [t for t in _RX_TOKEN.findall(texto) if t != "\n"]
+    entradas = (tokens + texto.split("\n")) * 2
+    print(f"{len(entradas)} entradas ({len(set(entradas))} distintas), "
+          f"{sum(t.isascii() and t.isalnum() for t in entradas)} pelo atalho ASCII")
+
+    t_antigo, antigo = min(medir(normalizar_texto_sem_cache, entradas) for _ in range(args.repeticoes))
+    texto_utils._normalizar_com_cache.cache_clear()
+    t_frio, novo = medir(normalizar_texto, entradas)
+    t_quente = min(medir(normalizar_texto, entradas)[0] for _ in range(args.repeticoes))
+
+    print(f"sem cache        : {t_antigo * 1000:8.1f} ms")
+    print(f"cache vazio      : {t_frio * 1000:8.1f} ms")
+    print(f"cache aquecido   : {t_quente * 1000:8.1f} ms")
+    print(f"resultado idêntico: {'sim' if antigo == novo else 'NÃO'}")
+    print(estatisticas_normalizacao()["normalizar_texto"])
+
+
+if __name__ == "__main__":
+    main()
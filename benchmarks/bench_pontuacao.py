@@ -0,0 +1,94 @@
+# Benchmark: pontuação das linhas contra os títulos de seção — laço com thefuzz (caminho
+# antigo de construir_heading_candidates) vs pontuacao_utils.melhores_titulos em lote.
+#
+# Uso: python benchmarks/bench_pontuacao.py arquivo.(pdf|docx|txt) [--multiplicar 1] [--repeticoes 5]
+# Sem dicas de extração (todas as linhas pontuadas, como na página 3); as linhas numeradas
+# pedem a nota exata. Confere que as notas e os títulos escolhidos são os mesmos do laço
+# para as linhas exatas e para toda linha que chega à nota de candidato.
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thefuzz import fuzz
+
+import pontuacao_utils
+from pontuacao_utils import melhores_titulos, TITULO_NOTA_CANDIDATO, TITULO_NOTA_SUBSTRING
+from texto_utils import normalizar_titulo_para_comparacao
+
+# Títulos da bula do paciente com alguns aliases, como as páginas montam.
+TITULOS = [
+    "APRESENTAÇÕES", "COMPOSIÇÃO", "PARA QUE ESTE MEDICAMENTO É INDICADO?",
+    "COMO ESTE MEDICAMENTO FUNCIONA?", "QUANDO NÃO DEVO USAR ESTE MEDICAMENTO?",
+    "O QUE DEVO SABER ANTES DE USAR ESTE MEDICAMENTO?",
+    "ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR ESTE MEDICAMENTO?", "COMO DEVO USAR ESTE MEDICAMENTO?",
+    "O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR ESTE MEDICAMENTO?",
+    "QUAIS OS MALES QUE ESTE MEDICAMENTO PODE ME CAUSAR?",
+    "O QUE FAZER SE ALGUÉM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA DESTE MEDICAMENTO?",
+    "DIZERES LEGAIS", "PARA QUÊ ESTE MEDICAMENTO É INDICADO?", "QUAIS OS MALES QUE ESTE MEDICAMENTO PODE CAUSAR?",
+]
+_RX_NUMERO = re.compile(r'^\s*(\d{1,2})\s*[\.\)\-]?\s*(.*)$')
+
+
+def ler_texto(caminho):
+    if caminho.lower().endswith(".pdf"):
+        from pdf_utils import extrair_paginas_pdf
+        return "".join(extrair_paginas_pdf(caminho))
+    if caminho.lower().endswith(".docx"):
+        from docx_utils import texto_docx
+        return texto_docx(caminho)
+    with open(caminho, encoding="utf-8") as f:
+        return f.read()
+
+
+def laco_antigo(titulos, linhas):
+    saida = []
+    for norm in linhas:
+        best_score, best = 0, -1
+        for j, t_norm in enumerate(titulos):
+            score = fuzz.token_set_ratio(t_norm, norm)
+            if t_norm in norm: score = max(score, TITULO_NOTA_SUBSTRING)
+            if score > best_score: best_score, best = score, j
+        saida.append((best_score, best))
+    return saida
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("arquivo")
+    parser.add_argument("--multiplicar", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    brutas = [l.strip() for l in ler_texto(args.arquivo).split("\n") if l.strip()] * args.multiplicar
+    linhas = [normalizar_titulo_para_comparacao(l) for l in brutas]
+    exatas = [_RX_NUMERO.match(l) is not None for l in brutas]
+    titulos = [normalizar_titulo_para_comparacao(t) for t in TITULOS]
+    print(f"{len(linhas)} linhas x {len(titulos)} títulos ({sum(exatas)} numeradas)")
+
+    t0 = time.perf_counter()
+    antigo = laco_antigo(titulos, linhas)
+    t_antigo = time.perf_counter() - t0
+    tempos = []
+    for _ in range(args.repeticoes):
+        pontuacao_utils._melhores.cache_clear()
+        t0 = time.perf_counter()
+        notas, melhores = melhores_titulos(titulos, linhas, exatas=exatas)
+        tempos.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    melhores_titulos(titulos, linhas, exatas=exatas)
+    t_cache = time.perf_counter() - t0
+
+    iguais = all(velho == novo for velho, novo, exata in zip(antigo, zip(notas, melhores), exatas)
+                 if exata or velho[0] >= TITULO_NOTA_CANDIDATO or novo[0] >= TITULO_NOTA_CANDIDATO)
+    print(f"laço thefuzz     : {t_antigo * 1000:8.1f} ms")
+    print(f"lote (cdist)     : {min(tempos) * 1000:8.1f} ms")
+    print(f"lote, em cache   : {t_cache * 1000:8.1f} ms")
+    print(f"resultado idêntico: {'sim' if iguais else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Benchmark: renderização para OCR — RGB + PNG (caminho antigo) vs cinza sem codificação.
+#
+# Uso: python benchmarks/bench_render_ocr.py arquivo.pdf [--dpi 300] [--ocr]
+# Sem --ocr mede só render -> imagem pronta para o Tesseract (inclui o arquivo
+# temporário que o pytesseract grava); com --ocr inclui o reconhecimento.
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from ocr_utils import renderizar_cinza, reconhecer, OCR_DPI
+
+
+def caminho_antigo(page, dpi):
+    pix = page.get_pixmap(dpi=dpi)
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    img.load()
+    return img
+
+
+def gravar_como_pytesseract(img):
+    # Reproduz o arquivo temporário que o pytesseract grava antes de chamar o binário.
+    with tempfile.NamedTemporaryFile(suffix="." + (img.format or "PNG").lower()) as f:
+        img.save(f, format=img.format or "PNG")
+        return f.tell()
+
+
+def medir(doc, dpi, render, com_ocr):
+    tempos, tamanhos = [], []
+    for page in doc:
+        t0 = time.perf_counter()
+        img = render(page, dpi)
+        tamanhos.append(gravar_como_pytesseract(img))
+        if com_ocr: reconhecer(img)
+        tempos.append(time.perf_counter() - t0)
+        del img
+    return tempos, tamanhos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--ocr", action="store_true")
+    args = parser.parse_args()
+
+    with fitz.open(args.pdf) as doc:
+        antigo, tam_antigo = medir(doc, args.dpi, caminho_antigo, args.ocr)
+        novo, tam_novo = medir(doc, args.dpi, renderizar_cinza, args.ocr)
+
+    n = len(antigo)
+    print(f"{n} páginas a {args.dpi} dpi" + (" (com OCR)" if args.ocr else ""))
+    print(f"RGB + PNG : {sum(antigo) / n * 1000:8.1f} ms/página  arquivo tmp {sum(tam_antigo) / n / 1e6:6.1f} MB")
+    print(f"cinza raw : {sum(novo) / n * 1000:8.1f} ms/página  arquivo tmp {sum(tam_novo) / n / 1e6:6.1f} MB")
+    print(f"economia  : {(sum(antigo) - sum(novo)) / n * 1000:8.1f} ms/página")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Benchmark: recorte do conteúdo das seções — obter_dados_secao_v2 por seção (caminho antigo,
+# com a trava numérica da página 2) vs secoes_utils.segmentar numa passada.
+#
+# Uso: python benchmarks/bench_segmentacao.py arquivo.(pdf|docx|txt) [--multiplicar 1] [--repeticoes 5]
+# O mapa de seções é montado com as linhas que são títulos da bula do paciente. Os dois
+# caminhos rodam com o cache de normalização vazio e aquecido; confere que o resultado é idêntico.
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import texto_utils
+from texto_utils import normalizar_titulo_para_comparacao
+from secoes_utils import segmentar
+from bench_pontuacao import TITULOS, ler_texto
+
+
+def obter_dados_secao_antigo(secao_canonico, mapa_secoes, linhas_texto, secoes):
+    entrada = None
+    for m in mapa_secoes:
+        if m['canonico'] == secao_canonico: entrada = m; break
+    if not entrada: return False, None, ""
+    linha_inicio = entrada['linha_inicio']
+    if secao_canonico.strip().upper() == "DIZERES LEGAIS": linha_fim = len(linhas_texto)
+    else:
+        sorted_map = sorted(mapa_secoes, key=lambda x: x['linha_inicio'])
+        prox_idx = None
+        for m in sorted_map:
+            if m['linha_inicio'] > linha_inicio: prox_idx = m['linha_inicio']; break
+        linha_fim = prox_idx if prox_idx is not None else len(linhas_texto)
+    titulos_norm = {normalizar_titulo_para_comparacao(s) for s in secoes}
+    conteudo_lines = []
+    for i in range(linha_inicio + 1, linha_fim):
+        line_norm = normalizar_titulo_para_comparacao(linhas_texto[i])
+        match_num = re.match(r'^(\d{1,2})\.', linhas_texto[i].strip())
+        if match_num:
+            num_enc = int(match_num.group(1))
+            match_atual = re.match(r'^(\d{1,2})\.', secao_canonico)
+            if match_atual:
+                if num_enc > int(match_atual.group(1)): break
+        if line_norm in titulos_norm: break
+        conteudo_lines.append(linhas_texto[i])
+    return True, entrada['titulo_encontrado'], "\n".join(conteudo_lines).strip()
+
+
+def limpar_caches():
+    texto_utils._normalizar_com_cache.cache_clear()
+    texto_utils._normalizar_titulo.cache_clear()
+
+
+def medir(funcao, repeticoes, frio=True):
+    tempos = []
+    for _ in range(repeticoes):
+        if frio: limpar_caches()
+        t0 = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("arquivo")
+    parser.add_argument("--multiplicar", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    linhas = ler_texto(args.arquivo).split("\n") * args.multiplicar
+    canon = {normalizar_titulo_para_comparacao(t): t for t in TITULOS}
+    mapa = []
+    for i, linha in enumerate(linhas):
+        t = canon.get(normalizar_titulo_para_comparacao(linha))
+        if t: mapa.append({'canonico': t, 'titulo_encontrado': linha, 'linha_inicio': i})
+    print(f"{len(linhas)} linhas, {len(mapa)} títulos no mapa, {len(TITULOS)} seções")
+
+    def antigo():
+        return {s: obter_dados_secao_antigo(s, mapa, linhas, TITULOS) for s in TITULOS}
+
+    def novo():
+        segmentos = segmentar(mapa, linhas, set(canon), normalizar_titulo_para_comparacao, trava_numerica=True)
+        return {s: (True,) + segmentos[s] if s in segmentos else (False, None, "") for s in TITULOS}
+
+    t_antigo, r_antigo = medir(antigo, args.repeticoes)
+    t_novo, r_novo = medir(novo, args.repeticoes)
+    print(f"por seção        : {t_antigo * 1000:8.2f} ms (cache aquecido: {medir(antigo, args.repeticoes, False)[0] * 1000:.2f} ms)")
+    print(f"uma passada      : {t_novo * 1000:8.2f} ms (cache aquecido: {medir(novo, args.repeticoes, False)[0] * 1000:.2f} ms)")
+    print(f"resultado idêntico: {'sim' if r_antigo == r_novo else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Benchmark: normalização dos títulos — cadeia de 9 re.sub (caminho antigo) vs varredura única.
+#
+# Uso: python benchmarks/bench_titulos.py arquivo.(pdf|docx|txt) [--multiplicar 1] [--repeticoes 5]
+# --multiplicar repete o texto N vezes (simula saídas longas de OCR). Confere também que o
+# resultado é idêntico e informa se a varredura única precisou cair na cadeia antiga.
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from titulos_utils import forcar_titulos, cadeia_regex, _ocorrencias, _interferem, NORMALIZADOR_PADRAO
+from bench_pontuacao import ler_texto
+
+
+def medir(funcao, texto, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = funcao(texto)
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("arquivo")
+    parser.add_argument("--multiplicar", type=int, default=1)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    texto = ler_texto(args.arquivo) * args.multiplicar
+    ancoras, trechos = _ocorrencias(texto, NORMALIZADOR_PADRAO)
+    t_antigo, antigo = medir(cadeia_regex, texto, args.repeticoes)
+    t_novo, novo = medir(forcar_titulos, texto, args.repeticoes)
+
+    print(f"{len(texto) / 1e6:.2f} MB, {sum(map(len, ancoras))} âncoras, {sum(map(len, trechos))} títulos")
+    print(f"cadeia re.sub  : {t_antigo * 1000:8.1f} ms")
+    print(f"varredura única: {t_novo * 1000:8.1f} ms"
+          + ("  (caiu na cadeia antiga)" if _interferem(NORMALIZADOR_PADRAO, ancoras, trechos) else ""))
+    print(f"resultado idêntico: {'sim' if antigo == novo else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import re
+import logging
+import unicodedata
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Detecção genérica de blocos deslocados pela diagramação (ex.: uma coluna lida fora de ordem
+# que joga um parágrafo para baixo do título seguinte). Os parágrafos (linhas não vazias) dos
+# dois documentos são indexados pelo texto normalizado; um parágrafo que aparece uma única vez
+# em cada um, mas sob seções diferentes, foi deslocado. Os parágrafos deslocados em sequência
+# formam um bloco, que volta para a seção da referência. Tudo em tempo linear.
+BLOCO_MIN_CARACTERES = 30   # parágrafos normalizados mais curtos não servem de âncora
+
+# texto: início do bloco; de/para: seções (chaves) de origem e destino; paragrafos: quantos.
+Relocacao = namedtuple("Relocacao", ["texto", "de", "para", "paragrafos"])
+
+_RX_NAO_PALAVRA = re.compile(r"[^\w\s]")
+
+
+def normalizar_paragrafo(texto):
+    texto = "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+    return " ".join(_RX_NAO_PALAVRA.sub("", texto).lower().split())
+
+
+def _paragrafos(linhas, secoes, normalizar):
+    """[(índice da linha, seção, chave)] das linhas não vazias."""
+    return [(i, secoes[i], normalizar(linha)) for i, linha in enumerate(linhas) if linha.strip()]
+
+
+def _unicos(paragrafos):
+    """chave -> posição do parágrafo, só para as chaves que aparecem uma vez."""
+    vistos, repetidos = {}, set()
+    for k, (_, _, chave) in enumerate(paragrafos):
+        if len(chave) < BLOCO_MIN_CARACTERES: continue
+        if chave in vistos: repetidos.add(chave)
+        else: vistos[chave] = k
+    return {c: k for c, k in vistos.items() if c not in repetidos}
+
+
+def _parear(linhas_ref, secoes_ref, linhas_doc, secoes_doc, normalizar):
+    """Parágrafos dos dois lados e, para cada parágrafo do documento, a posição do seu par
+    (único dos dois lados) na referência, ou None."""
+    par_ref = _paragrafos(linhas_ref, secoes_ref, normalizar)
+    par_doc = _paragrafos(linhas_doc, secoes_doc, normalizar)
+    unicos_ref, unicos_doc = _unicos(par_ref), _unicos(par_doc)
+    par = [unicos_ref.get(chave) if unicos_doc.get(chave) == k else None
+           for k, (_, _, chave) in enumerate(par_doc)]
+    return par_ref, par_doc, par
+
+
+# ----------------- DETECÇÃO -----------------
+def _blocos(par_ref, par_doc, par):
+    blocos, atual = [], None  # atual: [primeira, última, destino, posição ref da última]
+    for k, r in enumerate(par):
+        if r is None: continue  # sem par: acompanha o bloco se ficar entre dois deslocados
+        destino, origem = par_ref[r][1], par_doc[k][1]
+        if destino == origem or destino is None:
+            if atual: blocos.append(atual); atual = None
+            continue
+        if (atual and atual[2] == destino and r > atual[3] and par_doc[atual[1]][1] == origem
+                and all(p is None for p in par[atual[1] + 1:k])):
+            atual[1], atual[3] = k, r
+            continue
+        if atual: blocos.append(atual)
+        atual = [k, k, destino, r]
+    if atual: blocos.append(atual)
+    # Posição na referência: a do primeiro parágrafo do bloco.
+    return [(a, b, destino, par[a]) for a, b, destino, _ in blocos]
+
+
+def detectar_blocos(linhas_ref, secoes_ref, linhas_doc, secoes_doc, normalizar=normalizar_paragrafo):
+    """Blocos do documento que estão sob outra seção na referência.
+
+    secoes_*: a seção (qualquer chave; None antes do primeiro título) de cada linha.
+    Retorna [(primeira, última, seção de destino, posição na referência)], em posições
+    de parágrafo do documento.
+    """
+    return _blocos(*_parear(linhas_ref, secoes_ref, linhas_doc, secoes_doc, normalizar))
+
+
+# ----------------- RELOCAÇÃO -----------------
+def realocar_blocos(linhas_ref, secoes_ref, linhas_doc, secoes_doc, normalizar=normalizar_paragrafo):
+    """Devolve (linhas do documento com os blocos deslocados de volta à seção da referência,
+    [Relocacao]). Cada bloco entra junto do vizinho mais próximo na referência (da mesma seção)
+    que esteja no lugar no documento: depois do anterior ou antes do seguinte. Sem vizinho,
+    entra logo depois do título da seção."""
+    par_ref, par_doc, par = _parear(linhas_ref, secoes_ref, linhas_doc, secoes_doc, normalizar)
+    blocos = _blocos(par_ref, par_doc, par)
+    if not blocos: return list(linhas_doc), []
+
+    # Parágrafo da referência -> linha do documento onde ele está no lugar (mesma seção).
+    no_lugar = {r: par_doc[k][0] for k, r in enumerate(par) if r is not None and par_ref[r][1] == par_doc[k][1]}
+    # Para cada seção do documento, a linha do seu título (a primeira linha com a chave).
+    titulo = {}
+    for i, s in enumerate(secoes_doc): titulo.setdefault(s, i)
+    # Vizinhos no lugar de cada parágrafo da referência, dentro da mesma seção:
+    # (posição na referência, linha no documento) do último até ele e do primeiro a partir dele.
+    anterior, seguinte = [None] * len(par_ref), [None] * len(par_ref)
+    for ordem, vizinho in ((range(len(par_ref)), anterior), (range(len(par_ref) - 1, -1, -1), seguinte)):
+        atual, secao = None, object()
+        for r in ordem:
+            if par_ref[r][1] != secao: atual, secao = None, par_ref[r][1]
+            if r in no_lugar: atual = (r, no_lugar[r])
+            vizinho[r] = atual
+
+    antes, depois, remover, relocacoes = {}, {}, set(), []
+    for a, b, destino, r in blocos:
+        ultimo = par[b]
+        ant = anterior[r - 1] if r > 0 and par_ref[r - 1][1] == destino else None
+        seg = seguinte[ultimo + 1] if ultimo + 1 < len(par_ref) and par_ref[ultimo + 1][1] == destino else None
+        inicio, fim = par_doc[a][0], par_doc[b][0]
+        if seg and (not ant or seg[0] - ultimo < r - ant[0]): antes.setdefault(seg[1], []).append((r, inicio, fim))
+        elif ant: depois.setdefault(ant[1], []).append((r, inicio, fim))
+        elif destino in titulo: depois.setdefault(titulo[destino], []).append((r, inicio, fim))
+        else: continue  # a seção de destino não existe no documento
+        remover.update(range(inicio, fim + 1))
+        relocacoes.append(Relocacao(linhas_doc[inicio].strip()[:80], par_doc[a][1], destino, b - a + 1))
+
+    saida = []
+    for i, linha in enumerate(linhas_doc):
+        for _, inicio, fim in sorted(antes.get(i, ())): saida.extend(linhas_doc[inicio:fim + 1])
+        if i not in remover: saida.append(linha)
+        for _, inicio, fim in sorted(depois.get(i, ())): saida.extend(linhas_doc[inicio:fim + 1])
+    for r in relocacoes:
+        logger.info("bloco realocado (%d parágrafos) de %s para %s: %s", r.paragrafos, r.de, r.para, r.texto)
+    return saida, relocacoes
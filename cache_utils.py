@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Cache persistente do texto extraído, endereçado pelo conteúdo do upload.
+# Um único arquivo SQLite (modo WAL) permite que várias sessões do Streamlit
+# leiam e gravem ao mesmo tempo sem corromper as entradas.
+CACHE_DIR = os.environ.get("BULAS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "validador_bulas_cache")
+CACHE_MAX_MB = int(os.environ.get("BULAS_CACHE_MAX_MB", "256"))
+
+_local = threading.local()
+
+
+def chave_cache(dados, *modo):
+    """Digest dos bytes do upload + parâmetros que alteram o resultado da extração."""
+    return chave_cache_digest(hashlib.sha256(dados).hexdigest(), *modo)
+
+
+def chave_cache_digest(digest, *modo):
+    """Como chave_cache, a partir do sha256 (hex) já calculado do upload."""
+    return digest + ":" + "|".join(str(m) for m in modo)
+
+
+def _conexao():
+    con = getattr(_local, "con", None)
+    if con is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        con = sqlite3.connect(os.path.join(CACHE_DIR, "extracao.sqlite3"), timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("CREATE TABLE IF NOT EXISTS extracao (chave TEXT PRIMARY KEY, valor TEXT NOT NULL, "
+                    "tamanho INTEGER NOT NULL, acesso REAL NOT NULL)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_extracao_acesso ON extracao (acesso)")
+        _local.con = con
+    return con
+
+
+def ler_cache(chave):
+    """Retorna o valor guardado (ou None) e marca a entrada como usada recentemente."""
+    try:
+        con = _conexao()
+        row = con.execute("SELECT valor FROM extracao WHERE chave = ?", (chave,)).fetchone()
+        if row is None: return None
+        con.execute("UPDATE extracao SET acesso = ? WHERE chave = ?", (time.time(), chave))
+        return json.loads(row[0])
+    except (sqlite3.Error, OSError, ValueError):
+        return None
+
+
+def _despejar_lru(con):
+    limite = CACHE_MAX_MB * 1024 * 1024
+    total = con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM extracao").fetchone()[0]
+    if total <= limite: return
+    remover = []
+    for chave, tamanho in con.execute("SELECT chave, tamanho FROM extracao ORDER BY acesso"):
+        if total <= limite: break
+        remover.append((chave,)); total -= tamanho
+    con.executemany("DELETE FROM extracao WHERE chave = ?", remover)
+
+
+def gravar_cache(chave, valor):
+    """Grava um valor serializável em JSON; falhas do cache nunca interrompem a extração."""
+    try:
+        dado = json.dumps(valor, ensure_ascii=False)
+        con = _conexao()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute("INSERT OR REPLACE INTO extracao (chave, valor, tamanho, acesso) VALUES (?, ?, ?, ?)",
+                        (chave, dado, len(dado.encode("utf-8")), time.time()))
+            _despejar_lru(con)
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            con.execute("ROLLBACK")
+            raise
+    except (sqlite3.Error, OSError, TypeError, ValueError):
+        pass
@@ -0,0 +1,115 @@
+import re
+import logging
+from collections import Counter
+
+from texto_utils import normalizar_texto, normalizar_titulo_para_comparacao
+from marcadores_utils import varrer, contar_em, buscar_em, MARCADORES_ANVISA
+
+logger = logging.getLogger(__name__)
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Contexto de análise de um documento numa auditoria: o texto e tudo o que as etapas derivam
+# dele (linhas, candidatos a título, mapa e conteúdo das seções, marcadores, vocabulário).
+# Cada artefato é calculado na primeira vez que alguma etapa pede e reaproveitado nas outras;
+# o contexto conta pedidos e cálculos de cada um. O que depende das regras da página (seções,
+# aliases, validações) entra como função no construtor.
+_RX_VOCABULARIO = re.compile(r'\b[a-zA-ZÀ-ÖØ-öø-ÿ0-9\-]+\b')
+
+
+def _artefato(funcao):
+    """Propriedade calculada na primeira leitura e guardada no contexto."""
+    nome = funcao.__name__
+
+    def obter(self):
+        self.pedidos[nome] += 1
+        if nome not in self._artefatos:
+            self.calculos[nome] += 1
+            self._artefatos[nome] = funcao(self)
+        return self._artefatos[nome]
+    return property(obter, doc=funcao.__doc__)
+
+
+# ----------------- CONTEXTO DO DOCUMENTO -----------------
+class ContextoDocumento:
+    """Um texto e os seus artefatos de análise, calculados sob demanda e uma vez só.
+
+    candidatos(ctx), mapear(ctx) e segmentar(ctx): funções da página para os candidatos a
+    título, o mapa de seções e {seção: (título, conteúdo)}; normalizar_linha: a forma das linhas
+    usada no recorte das seções.
+    """
+
+    def __init__(self, texto, titulos=None, candidatos=None, mapear=None, segmentar=None,
+                 normalizar_linha=normalizar_titulo_para_comparacao):
+        self.texto = texto or ""
+        self.titulos = titulos
+        self._candidatos, self._mapear, self._segmentar = candidatos, mapear, segmentar
+        self._normalizar_linha = normalizar_linha
+        self._artefatos = {}
+        self.pedidos, self.calculos = Counter(), Counter()
+
+    @_artefato
+    def linhas(self):
+        return self.texto.split('\n')
+
+    @_artefato
+    def linhas_normalizadas(self):
+        return [self._normalizar_linha(linha) for linha in self.linhas]
+
+    @_artefato
+    def candidatos(self):
+        return self._candidatos(self)
+
+    @_artefato
+    def mapa(self):
+        return self._mapear(self)
+
+    @_artefato
+    def segmentos(self):
+        return self._segmentar(self)
+
+    @_artefato
+    def secao_por_linha(self):
+        """Seção canônica de cada linha (None antes do primeiro título)."""
+        secoes = [None] * len(self.linhas)
+        inicios = sorted((m['linha_inicio'], m['canonico']) for m in self.mapa)
+        for (ini, sec), (fim, _) in zip(inicios, inicios[1:] + [(len(secoes), None)]):
+            secoes[ini:fim] = [sec] * (fim - ini)
+        return secoes
+
+    @_artefato
+    def marcadores(self):
+        """Achados da varredura de marcadores_utils (tipo de bula, qualidade, ANVISA)."""
+        return varrer(self.texto)
+
+    @_artefato
+    def vocabulario(self):
+        """Palavras do texto em minúsculas (como o corretor ortográfico as carrega)."""
+        return set(_RX_VOCABULARIO.findall(self.texto.lower()))
+
+    @_artefato
+    def vocabulario_normalizado(self):
+        return {normalizar_texto(w) for w in self.vocabulario}
+
+    # ----------------- CONSULTAS -----------------
+    def secao(self, canonico):
+        """(encontrou, título encontrado, conteúdo) da seção."""
+        if canonico not in self.segmentos: return False, None, ""
+        titulo, conteudo = self.segmentos[canonico]
+        return True, titulo, conteudo
+
+    def contar_marcadores(self, frases):
+        return contar_em(self.marcadores, frases) if self.texto else 0
+
+    def buscar_marcador(self, rx, frases=MARCADORES_ANVISA):
+        return buscar_em(self.texto, self.marcadores, rx, frases) if self.texto else None
+
+    def estatisticas(self):
+        """{artefato: (pedidos, calculados)}."""
+        return {nome: (self.pedidos[nome], self.calculos[nome]) for nome in self.pedidos}
+
+
+def registrar_estatisticas(**contextos):
+    """Loga pedidos/cálculos de cada artefato dos contextos de uma auditoria (nome=contexto)."""
+    for nome, ctx in contextos.items():
+        logger.info("contexto %s: %s", nome,
+                    ", ".join(f"{a} {p}/{c}" for a, (p, c) in sorted(ctx.estatisticas().items())))
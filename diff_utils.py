@@ -0,0 +1,174 @@
+from array import array
+from collections import namedtuple
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Comparação palavra a palavra do conteúdo de uma seção (referência x documento auditado).
+# O diff de cada seção é calculado uma vez e guarda os dois lados: as duas colunas do relatório
+# são montadas a partir do mesmo resultado. Tokenização, normalização dos tokens e a junção
+# em HTML continuam sendo as de cada página.
+#
+# O motor trabalha com inteiros: cada token normalizado vira um id (array compacto) e os
+# trechos iguais saem de um diff histograma — âncora no trecho comum de tokens mais raros,
+# recursão dos dois lados — com o passo de Myers em espaço linear (cobra do meio) quando só
+# sobram tokens muito frequentes. Em edições típicas o custo fica perto de linear, em vez do
+# pior caso quadrático de difflib.SequenceMatcher. Os opcodes têm o formato de get_opcodes().
+LIMITE_HISTOGRAMA = 64  # tokens mais frequentes que isso (no trecho) não servem de âncora
+LIMITE_MYERS = 256      # passos de edição do Myers antes de cortar no ponto mais avançado (como o GNU diff)
+
+# tokens_*: tokens originais de cada lado; opcodes: os do motor abaixo sobre os tokens
+# normalizados; marcados_*: índices dos tokens de cada lado fora de trechos 'equal'.
+DiffSecao = namedtuple("DiffSecao", ["tokens_ref", "tokens_belfar", "opcodes", "marcados_ref", "marcados_belfar"])
+
+
+# ----------------- MOTOR -----------------
+def internar(*sequencias):
+    """Cada sequência de tokens como array de ids inteiros (tokens iguais, mesmo id)."""
+    ids = {}
+    return [array('i', [ids.setdefault(t, len(ids)) for t in seq]) for seq in sequencias]
+
+
+def _aparar(a, b, alo, ahi, blo, bhi, blocos):
+    """Tira prefixo e sufixo comuns do trecho (guardando-os como blocos iguais)."""
+    i, j = alo, blo
+    while i < ahi and j < bhi and a[i] == b[j]: i += 1; j += 1
+    if i > alo: blocos.append((alo, blo, i - alo))
+    fa, fb = ahi, bhi
+    while fa > i and fb > j and a[fa - 1] == b[fb - 1]: fa -= 1; fb -= 1
+    if fa < ahi: blocos.append((fa, fb, ahi - fa))
+    return i, fa, j, fb
+
+
+def _ancora(a, b, alo, ahi, blo, bhi):
+    """(âncora, tem_comum): a âncora é o trecho igual (x, y, u, v) cujo token mais frequente
+    em a[alo:ahi] é o mais raro possível — no empate, o mais longo e depois o mais perto da
+    diagonal do trecho (texto repetido casa com a cópia correspondente); None se todos os
+    tokens em comum passam de LIMITE_HISTOGRAMA."""
+    posicoes = {}
+    for i in range(alo, ahi): posicoes.setdefault(a[i], []).append(i)
+    melhor, menor, maior, desvio = None, LIMITE_HISTOGRAMA, 0, 0
+    tem_comum = False
+    j = blo
+    while j < bhi:
+        ocorrencias = posicoes.get(b[j])
+        prox = j + 1
+        if ocorrencias is not None:
+            tem_comum = True
+            if len(ocorrencias) <= menor:
+                for i in ocorrencias:
+                    conta = len(ocorrencias)
+                    si, sj = i, j
+                    while si > alo and sj > blo and a[si - 1] == b[sj - 1]:
+                        si -= 1; sj -= 1; conta = min(conta, len(posicoes[a[si]]))
+                    ei, ej = i + 1, j + 1
+                    while ei < ahi and ej < bhi and a[ei] == b[ej]:
+                        conta = min(conta, len(posicoes[a[ei]])); ei += 1; ej += 1
+                    if ej > prox: prox = ej
+                    fora = abs((si - alo) * (bhi - blo) - (sj - blo) * (ahi - alo))
+                    if conta < menor or (conta == menor and (ei - si > maior or (ei - si == maior and fora < desvio))):
+                        melhor, menor, maior, desvio = (si, sj, ei, ej), conta, ei - si, fora
+        j = prox
+    return melhor, tem_comum
+
+
+def _cobra_do_meio(a, b, alo, ahi, blo, bhi):
+    """Passo de Myers em espaço linear: o trecho igual (x, y, u, v) no meio de um caminho
+    mínimo de edição entre a[alo:ahi] e b[blo:bhi] (sem prefixo/sufixo comum, lados não vazios).
+
+    Passando de LIMITE_MYERS edições, devolve o trecho que chegou mais longe na ida: o
+    resultado deixa de ser mínimo, mas o custo fica limitado.
+    """
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    impar = delta & 1
+    maximo = (n + m + 1) // 2
+    off = maximo + 1
+    vf, vb = [0] * (2 * maximo + 3), [0] * (2 * maximo + 3)  # x alcançado em cada diagonal
+    alcance, cobra = 0, None
+    for d in range(maximo + 1):
+        for k in range(-d, d + 1, 2):
+            x = vf[off + k + 1] if k == -d or (k != d and vf[off + k - 1] < vf[off + k + 1]) else vf[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]: x += 1; y += 1
+            vf[off + k] = x
+            if impar and -(d - 1) <= delta - k <= d - 1 and x + vb[off + delta - k] >= n:
+                return alo + x0, blo + y0, alo + x, blo + y
+            if alcance < x + y < n + m and x <= n and 0 <= y0 and y <= m: alcance, cobra = x + y, (alo + x0, blo + y0, alo + x, blo + y)
+        for k in range(-d, d + 1, 2):  # de trás para frente: diagonal k aqui é delta - k na ida
+            x = vb[off + k + 1] if k == -d or (k != d and vb[off + k - 1] < vb[off + k + 1]) else vb[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]: x += 1; y += 1
+            vb[off + k] = x
+            if not impar and -d <= delta - k <= d and x + vf[off + delta - k] >= n:
+                return ahi - x, bhi - y, ahi - x0, bhi - y0
+        if d >= LIMITE_MYERS and cobra: return cobra
+    raise AssertionError("cobra do meio não encontrada")
+
+
+def blocos_iguais(a, b):
+    """Trechos iguais (i, j, n) em ordem, adjacentes fundidos — como get_matching_blocks()
+    sem o sentinela."""
+    blocos = []
+    pilha = [(0, len(a), 0, len(b))]
+    while pilha:
+        alo, ahi, blo, bhi = _aparar(a, b, *pilha.pop(), blocos)
+        if alo == ahi or blo == bhi: continue
+        ancora, tem_comum = _ancora(a, b, alo, ahi, blo, bhi)
+        if not tem_comum: continue
+        x, y, u, v = ancora or _cobra_do_meio(a, b, alo, ahi, blo, bhi)
+        if u > x: blocos.append((x, y, u - x))
+        pilha.append((alo, x, blo, y))
+        pilha.append((u, ahi, v, bhi))
+    fundidos = []
+    for i, j, n in sorted(blocos):
+        if fundidos and fundidos[-1][0] + fundidos[-1][2] == i and fundidos[-1][1] + fundidos[-1][2] == j:
+            fundidos[-1] = (fundidos[-1][0], fundidos[-1][1], fundidos[-1][2] + n)
+        else: fundidos.append((i, j, n))
+    return fundidos
+
+
+def opcodes(a, b):
+    """Opcodes ('equal'/'replace'/'delete'/'insert', i1, i2, j1, j2) de a -> b, no formato de
+    difflib.SequenceMatcher.get_opcodes()."""
+    ids_a, ids_b = internar(a, b)
+    saida = []
+    i = j = 0
+    for ai, bj, n in blocos_iguais(ids_a, ids_b) + [(len(a), len(b), 0)]:
+        tag = 'replace' if i < ai and j < bj else 'delete' if i < ai else 'insert' if j < bj else None
+        if tag: saida.append((tag, i, ai, j, bj))
+        i, j = ai + n, bj + n
+        if n: saida.append(('equal', ai, i, bj, j))
+    return saida
+
+
+# ----------------- DIFF -----------------
+def comparar(texto_ref, texto_belfar, tokenizar, normalizar):
+    """Diff de tokens entre os dois textos, com as marcações dos dois lados."""
+    tokens_ref, tokens_belfar = tokenizar(texto_ref or ""), tokenizar(texto_belfar or "")
+    ops = opcodes([normalizar(t) for t in tokens_ref], [normalizar(t) for t in tokens_belfar])
+    marcados_ref, marcados_belfar = set(), set()
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == 'equal': continue
+        marcados_ref.update(range(i1, i2))
+        marcados_belfar.update(range(j1, j2))
+    return DiffSecao(tokens_ref, tokens_belfar, ops, frozenset(marcados_ref), frozenset(marcados_belfar))
+
+
+def comparar_secoes(secoes_analisadas, tokenizar, normalizar):
+    """{seção: DiffSecao} das seções comparadas (as marcadas como 'ignorada' ficam de fora)."""
+    return {d['secao']: comparar(d.get('conteudo_ref'), d.get('conteudo_belfar'), tokenizar, normalizar)
+            for d in secoes_analisadas if not d.get('ignorada', False)}
+
+
+# ----------------- RENDERIZAÇÃO -----------------
+def marcar_tokens(diff, eh_referencia):
+    """Tokens de um lado com '<br>' nas quebras de linha e <mark class='diff'> nos que mudaram."""
+    tokens = diff.tokens_ref if eh_referencia else diff.tokens_belfar
+    marcados = diff.marcados_ref if eh_referencia else diff.marcados_belfar
+    marcado = []
+    for idx, tok in enumerate(tokens):
+        if tok == '\n': marcado.append('<br>'); continue
+        if idx in marcados and tok.strip() != '': marcado.append(f"<mark class='diff'>{tok}</mark>")
+        else: marcado.append(tok)
+    return marcado
@@ -0,0 +1,153 @@
+import io
+import zipfile
+from collections import namedtuple
+import xml.etree.ElementTree as ET
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Leitura do DOCX em fluxo direto do word/document.xml (sem montar a árvore do python-docx):
+# a memória fica limitada ao parágrafo/linha de tabela em andamento.
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+# texto = parágrafo, ou linha de tabela com as células separadas por \t
+ItemDocx = namedtuple("ItemDocx", ["texto", "estilo", "negrito", "tabela"])
+
+_FALSO = ("0", "false", "off")
+
+
+def _ligado(elem):
+    return elem.get(W + "val", "1").lower() not in _FALSO
+
+
+# ----------------- ESTILOS -----------------
+def ler_estilos(zf):
+    """{styleId: (nome, negrito)} com o negrito herdado via basedOn; chave None = estilo padrão."""
+    try:
+        raiz = ET.fromstring(zf.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    brutos, padrao = {}, None
+    for st in raiz.iter(W + "style"):
+        sid = st.get(W + "styleId")
+        nome = st.find(W + "name")
+        base = st.find(W + "basedOn")
+        b = st.find(W + "rPr/" + W + "b")
+        brutos[sid] = (nome.get(W + "val") if nome is not None else sid,
+                       None if b is None else _ligado(b),
+                       base.get(W + "val") if base is not None else None)
+        if st.get(W + "type") == "paragraph" and st.get(W + "default") in ("1", "true"): padrao = sid
+
+    def negrito(sid, vistos=()):
+        if sid not in brutos or sid in vistos: return False
+        nome, b, base = brutos[sid]
+        return b if b is not None else negrito(base, vistos + (sid,))
+
+    estilos = {sid: (nome, negrito(sid)) for sid, (nome, _, _) in brutos.items()}
+    if padrao in estilos: estilos[None] = estilos[padrao]
+    return estilos
+
+
+# ----------------- EXTRAÇÃO EM FLUXO -----------------
+def iterar_docx(dados):
+    """Gera ItemDocx na ordem do documento: parágrafos (inclusive de caixas de texto) e
+    linhas de tabela. Nos parágrafos simples o texto é o mesmo de python-docx (p.text)."""
+    with zipfile.ZipFile(io.BytesIO(dados) if isinstance(dados, (bytes, bytearray)) else dados) as zf:
+        estilos = ler_estilos(zf)
+        with zf.open("word/document.xml") as xml:
+            yield from _itens(ET.iterparse(xml, events=("start", "end")), estilos)
+
+
+def _itens(eventos, estilos):
+    caminho = []      # tags abertas, para saber o pai de cada elemento
+    paragrafos = []   # [partes, styleId, negrito de cada run com texto]
+    linhas, celulas = [], []
+    run = None        # [negrito explícito, negrito do estilo de caractere, tem texto]
+    ignorar = 0       # dentro de mc:Fallback (cópia alternativa do mesmo conteúdo)
+    corpo = None
+
+    for evento, elem in eventos:
+        tag = elem.tag
+        if evento == "start":
+            caminho.append(tag)
+            if tag == MC_FALLBACK: ignorar += 1
+            if ignorar: continue
+            if tag == W + "p": paragrafos.append([[], None, []])
+            elif tag == W + "r": run = [None, False, False]
+            elif tag == W + "tr": linhas.append([])
+            elif tag == W + "tc": celulas.append([])
+            elif tag == W + "body": corpo = elem
+            continue
+
+        caminho.pop()
+        pai = caminho[-1] if caminho else None
+        if tag == MC_FALLBACK: ignorar -= 1; continue
+        if ignorar: continue
+
+        if tag == W + "t" and run is not None:
+            if elem.text: paragrafos[-1][0].append(elem.text); run[2] = True
+        elif pai == W + "r" and tag in (W + "tab", W + "ptab"):
+            paragrafos[-1][0].append("\t")
+        elif pai == W + "r" and tag == W + "br":
+            if elem.get(W + "type", "textWrapping") == "textWrapping": paragrafos[-1][0].append("\n")
+        elif pai == W + "r" and tag == W + "cr":
+            paragrafos[-1][0].append("\n")
+        elif pai == W + "r" and tag == W + "noBreakHyphen":
+            paragrafos[-1][0].append("-")
+        elif pai == W + "rPr" and run is not None and len(caminho) > 1 and caminho[-2] == W + "r":
+            if tag == W + "b": run[0] = _ligado(elem)
+            elif tag == W + "rStyle": run[1] = estilos.get(elem.get(W + "val"), ("", False))[1]
+        elif tag == W + "pStyle" and pai == W + "pPr":
+            paragrafos[-1][1] = elem.get(W + "val")
+        elif tag == W + "r":
+            if run is not None and run[2]: paragrafos[-1][2].append(run)
+            run = None
+            elem.clear()
+        elif tag == W + "p":
+            partes, sid, runs = paragrafos.pop()
+            nome, negrito_estilo = estilos.get(sid, estilos.get(None, ("", False)))
+            negrito = bool(runs) and all(r[0] if r[0] is not None else (r[1] or negrito_estilo) for r in runs)
+            texto = "".join(partes)
+            if celulas: celulas[-1].append((texto, negrito))
+            else: yield ItemDocx(texto, nome, negrito, False)
+            elem.clear()
+        elif tag == W + "tc":
+            partes = [p for p in celulas.pop() if p[0].strip()]
+            linhas[-1].append((" ".join(t for t, _ in partes), partes))
+        elif tag == W + "tr":
+            cels = linhas.pop()
+            texto = "\t".join(t for t, _ in cels)
+            partes = [p for _, ps in cels for p in ps]
+            negrito = bool(partes) and all(n for _, n in partes)
+            # Tabela dentro de tabela: a linha interna vira conteúdo da célula externa.
+            if celulas: celulas[-1].append((texto, negrito))
+            else: yield ItemDocx(texto, "", negrito, True)
+            elem.clear()
+
+        # Elementos do corpo já processados não ficam acumulados na árvore.
+        if pai == W + "body" and corpo is not None: corpo.clear()
+
+
+def texto_docx(dados):
+    """Texto do DOCX, um parágrafo ou linha de tabela por linha, na ordem do documento."""
+    return "\n".join(item.texto for item in iterar_docx(dados))
+
+
+# ----------------- DICAS DE TÍTULO -----------------
+DOCX_TITULO_MAX_CARACTERES = 90
+_ESTILOS_TITULO = ("heading", "título", "titulo", "title")
+
+
+def eh_titulo_docx(item):
+    """Parágrafo com estilo de título, ou curto e todo em negrito (linhas de tabela não contam)."""
+    if item.tabela or not item.texto.strip(): return False
+    if (item.estilo or "").lower().startswith(_ESTILOS_TITULO): return True
+    return item.negrito and len(item.texto.strip()) <= DOCX_TITULO_MAX_CARACTERES
+
+
+def texto_docx_com_titulos(dados):
+    """(texto, títulos) numa só leitura: o texto é o mesmo de texto_docx."""
+    linhas, titulos = [], []
+    for item in iterar_docx(dados):
+        linhas.append(item.texto)
+        if eh_titulo_docx(item): titulos.append(item.texto.strip())
+    return "\n".join(linhas), titulos
@@ -0,0 +1,104 @@
+import numpy as np
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Motor de ordem de leitura: colunas a partir do histograma de cobertura em x dos blocos.
+LAYOUT_CALHA_MIN_PT = 8     # largura mínima de uma calha entre colunas
+# Blocos mais largos que isto (x a largura mediana) são candidatos a título de largura total
+# e não entram no histograma: senão taparia as calhas que atravessam.
+LAYOUT_LARGO_RELATIVO = 1.5
+# Ainda conta como calha a faixa cuja cobertura (soma das alturas dos blocos em cada x)
+# fica abaixo desta fração do pico: números de página e notas soltas não a tapam.
+LAYOUT_FRACAO_VALE = 0.1
+LAYOUT_VAO_PT = 6           # vão vertical que separa faixas com grades de colunas diferentes
+
+
+# ----------------- CALHAS -----------------
+def _vales(inicio, fim, peso, vao_min, fracao):
+    """Intervalos internos [a, b) onde a cobertura ponderada fica abaixo de `fracao` do pico."""
+    origem = np.floor(inicio.min())
+    a = (np.floor(inicio) - origem).astype(np.int64)
+    b = np.maximum((np.ceil(fim) - origem).astype(np.int64), a + 1)
+    delta = np.zeros(int(b.max()) + 1)
+    np.add.at(delta, a, peso)
+    np.add.at(delta, b, -peso)
+    cobertura = np.cumsum(delta)[:-1]
+    baixo = cobertura <= fracao * cobertura.max()
+    # Bordas das sequências "baixas": só contam as que têm cobertura dos dois lados.
+    bordas = np.flatnonzero(np.diff(np.concatenate(([0], baixo.view(np.int8), [0]))))
+    return [(origem + i, origem + j) for i, j in zip(bordas[::2], bordas[1::2])
+            if i > 0 and j < len(baixo) and j - i >= vao_min]
+
+
+def calhas(caixas):
+    """Calhas verticais entre colunas, em pontos: [(x_início, x_fim)]."""
+    caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+    if len(caixas) < 2: return []
+    largura = caixas[:, 2] - caixas[:, 0]
+    caixas = caixas[largura <= LAYOUT_LARGO_RELATIVO * np.median(largura)]
+    if len(caixas) < 2: return []
+    return _vales(caixas[:, 0], caixas[:, 2], caixas[:, 3] - caixas[:, 1] + 1,
+                  LAYOUT_CALHA_MIN_PT, LAYOUT_FRACAO_VALE)
+
+
+def _atravessa(caixas, grade):
+    return any(((caixas[:, 0] < a) & (caixas[:, 2] > b)).any() for a, b in grade)
+
+
+# ----------------- ORDEM DE LEITURA -----------------
+def _ordem_linear(caixas, idx):
+    return idx[np.lexsort((caixas[idx, 0], caixas[idx, 1]))].tolist()
+
+
+def _ordem(caixas, idx):
+    if len(idx) < 2: return idx.tolist()
+    sub = caixas[idx]
+    grade = calhas(sub)
+    if not grade:
+        # Sem colunas: faixas separadas por vãos horizontais podem ter grades próprias.
+        # Faixas vizinhas que não cruzam as calhas umas das outras (linhas da mesma grade de
+        # colunas cortadas por vãos alinhados) são reagrupadas antes de descer na recursão.
+        faixas = _vales(sub[:, 1], sub[:, 3], np.ones(len(sub)), LAYOUT_VAO_PT, 0)
+        cortes = np.array([(a + b) / 2 for a, b in faixas])
+        faixa = np.searchsorted(cortes, (sub[:, 1] + sub[:, 3]) / 2)
+        grupos = []
+        for f in range(len(cortes) + 1):
+            atual = idx[faixa == f]
+            if grupos and not _atravessa(caixas[atual], calhas(caixas[grupos[-1]])) \
+                    and not _atravessa(caixas[grupos[-1]], calhas(caixas[atual])):
+                grupos[-1] = np.concatenate((grupos[-1], atual))
+            else:
+                grupos.append(atual)
+        if len(grupos) == 1: return _ordem_linear(caixas, idx)
+        return [i for g in grupos for i in _ordem(caixas, g)]
+
+    inicios = np.array([a for a, _ in grade])
+    fins = np.array([b for _, b in grade])
+    # Títulos de largura total atravessam todas as calhas e separam faixas horizontais.
+    largos = (sub[:, 0] <= inicios[0]) & (sub[:, 2] >= fins[-1])
+    if largos.any():
+        separadores = idx[largos][np.argsort(sub[largos, 1], kind="stable")]
+        resto = idx[~largos]
+        centros = (caixas[resto, 1] + caixas[resto, 3]) / 2
+        faixa = np.searchsorted((caixas[separadores, 1] + caixas[separadores, 3]) / 2, centros)
+        ordem = []
+        for f in range(len(separadores) + 1):
+            ordem += _ordem(caixas, resto[faixa == f])
+            if f < len(separadores): ordem.append(int(separadores[f]))
+        return ordem
+
+    # Cada bloco vai para a coluna onde começa; a leitura desce uma coluna inteira por vez.
+    coluna = np.searchsorted(fins, sub[:, 0], side="right")
+    if (coluna == coluna[0]).all(): return _ordem_linear(caixas, idx)
+    return [i for c in range(len(grade) + 1) for i in _ordem(caixas, idx[coluna == c])]
+
+
+def ordem_leitura(caixas):
+    """Índices das caixas (x0, y0, x1, y1) na ordem de leitura, coluna a coluna."""
+    caixas = np.asarray(caixas, dtype=float).reshape(-1, 4)
+    return _ordem(caixas, np.arange(len(caixas)))
+
+
+def ordenar_blocos(blocos):
+    """Ordena tuplas de bloco do PyMuPDF (bbox nas 4 primeiras posições) para leitura."""
+    if not blocos: return []
+    return [blocos[i] for i in ordem_leitura([b[:4] for b in blocos])]
@@ -0,0 +1,217 @@
+import re
+import time
+import logging
+from collections import namedtuple, Counter
+
+logger = logging.getLogger(__name__)
+
+# ----------------- CONFIGURAÇÃO -----------------
+# A limpeza do texto extraído é uma lista declarativa de etapas por onde as linhas passam
+# em fluxo (geradores encadeados). Cada página monta a sua lista a partir do catálogo abaixo.
+#   "linha": funcao(linha) -> linha nova, ou None para descartá-la
+#   "fluxo": funcao(linhas) -> gerador de linhas (etapas que olham a vizinhança)
+#   "texto": funcao(texto) -> texto (barreira: junta tudo; para regras que cruzam linhas)
+Etapa = namedtuple("Etapa", ["nome", "tipo", "funcao"])
+RelatorioEtapa = namedtuple("RelatorioEtapa", ["nome", "segundos", "entrada", "saida", "alteradas"])
+
+INVISIVEIS = "\u00AD\u200B\u200C\u200D\uFEFF"
+
+_RX_PALAVRA = re.compile(r"\w+")
+_RX_ESPACOS = re.compile(r"[ \t]+")
+_RX_SUBLINHADO = re.compile(r"^_+$")
+_RX_NUMERO_SOLTO = re.compile(r"(?m)^\s*\d{1,2}\.\s*$")
+
+
+# ----------------- FONTE -----------------
+def linhas_de(partes, separador=""):
+    """Linhas de separador.join(partes) (ex.: páginas da extração), sem montar o texto inteiro."""
+    if isinstance(partes, str): partes = (partes,)
+    pendente = []
+    for k, parte in enumerate(partes):
+        pedacos = ((separador if k else "") + parte).split("\n")
+        pendente.append(pedacos[0])
+        if len(pedacos) == 1: continue
+        yield "".join(pendente)
+        yield from pedacos[1:-1]
+        pendente = [pedacos[-1]]
+    yield "".join(pendente)
+
+
+# ----------------- EXECUÇÃO -----------------
+def _cronometrar(linhas, medida):
+    """Repassa as linhas somando em medida o tempo gasto para obtê-las (inclui etapas anteriores)."""
+    linhas = iter(linhas)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            linha = next(linhas)
+        except StopIteration:
+            medida[0] += time.perf_counter() - t0
+            return
+        medida[0] += time.perf_counter() - t0
+        medida[1] += 1
+        yield linha
+
+
+def _diferenca(entrada, saida):
+    """Linhas alteradas entre dois multiconjuntos (uma troca, descarte ou criação conta 1)."""
+    return max(sum((saida - entrada).values()), sum((entrada - saida).values()))
+
+
+def _contar(linhas, contador):
+    for linha in linhas:
+        contador[linha] += 1
+        yield linha
+
+
+def _etapa_linha(linhas, funcao, medida):
+    for linha in linhas:
+        nova = funcao(linha)
+        if nova != linha: medida[2] += 1
+        if nova is not None: yield nova
+
+
+def _etapa_fluxo(linhas, funcao, medida):
+    entrada, saida = Counter(), Counter()
+    yield from _contar(funcao(_contar(linhas, entrada)), saida)
+    medida[2] = _diferenca(entrada, saida)
+
+
+def _etapa_texto(linhas, funcao, medida):
+    entrada = list(linhas)
+    saida = funcao("\n".join(entrada)).split("\n")
+    medida[2] = _diferenca(Counter(entrada), Counter(saida))
+    yield from saida
+
+
+_EXECUTORES = {"linha": _etapa_linha, "fluxo": _etapa_fluxo, "texto": _etapa_texto}
+
+
+def executar_limpeza(fonte, etapas):
+    """Passa as linhas da fonte (texto, ou iterável de linhas) pelas etapas.
+
+    Retorna (texto, relatório): por etapa, o tempo próprio, as linhas de entrada/saída e
+    quantas linhas ela alterou (inclui as descartadas ou criadas).
+    """
+    linhas = linhas_de(fonte) if isinstance(fonte, str) else fonte
+    medidas = [[0.0, 0, 0]]  # [segundos acumulados, linhas produzidas, linhas alteradas]
+    linhas = _cronometrar(linhas, medidas[0])
+    for etapa in etapas:
+        medida = [0.0, 0, 0]
+        linhas = _cronometrar(_EXECUTORES[etapa.tipo](linhas, etapa.funcao, medida), medida)
+        medidas.append(medida)
+    texto = "\n".join(linhas)
+
+    # O tempo de cada gerador inclui o das etapas anteriores: o próprio é a diferença.
+    relatorio = [RelatorioEtapa(e.nome, m[0] - a[0], a[1], m[1], m[2])
+                 for e, a, m in zip(etapas, medidas, medidas[1:])]
+    for r in relatorio:
+        logger.info("limpeza %-22s %7.1f ms  %6d -> %6d linhas, %d alteradas",
+                    r.nome, r.segundos * 1000, r.entrada, r.saida, r.alteradas)
+    return texto, relatorio
+
+
+# ----------------- CATÁLOGO DE ETAPAS -----------------
+def etapa_caracteres(remover=INVISIVEIS, trocar=None, nome="caracteres"):
+    """Remove/troca caracteres com uma única tabela de str.translate."""
+    tabela = str.maketrans(trocar or {})
+    tabela.update({ord(c): None for c in remover})
+    return Etapa(nome, "linha", lambda linha: linha.translate(tabela))
+
+
+def etapa_descartar(padrao, nome):
+    """Descarta as linhas em que `padrao` (regex compilada) aparece."""
+    return Etapa(nome, "linha", lambda linha: None if padrao.search(linha.strip()) else linha)
+
+
+def etapa_texto(funcao, nome=None):
+    return Etapa(nome or funcao.__name__, "texto", funcao)
+
+
+def quebras_de_linha(linhas):
+    """Equivale a .replace('\\r\\n', '\\n').replace('\\r', '\\n') no texto inteiro."""
+    anterior = None
+    for linha in linhas:
+        if anterior is not None: yield from (anterior[:-1] if anterior.endswith("\r") else anterior).split("\r")
+        anterior = linha
+    if anterior is not None: yield from anterior.split("\r")
+
+
+def juntar_hifenizacao(linhas):
+    """Equivale a re.sub(r'(\\w+)-\\n(\\w+)', r'\\1\\2', texto): junta palavras hifenizadas na quebra."""
+    atual, livre = None, 0  # livre: a partir de onde a linha atual ainda pode casar o (\w+) inicial
+    for linha in linhas:
+        if atual is not None:
+            m = _RX_PALAVRA.match(linha)
+            if m and atual.endswith("-") and len(atual) - 2 >= livre and _RX_PALAVRA.match(atual[-2]):
+                livre = len(atual) - 1 + m.end()
+                atual = atual[:-1] + linha
+                continue
+            yield atual
+        atual, livre = linha, 0
+    if atual is not None: yield atual
+
+
+def colapsar_linhas_vazias(linhas):
+    """Equivale a re.sub(r'\\n{3,}', '\\n\\n', texto)."""
+    vazias, inicio = 0, True
+    for linha in linhas:
+        if linha == "": vazias += 1; continue
+        # No meio, k linhas vazias são k+1 quebras; nas pontas, k quebras.
+        if inicio: yield from [""] * min(vazias, 2); inicio = False
+        else: yield from [""] * min(vazias, 1)
+        vazias = 0
+        yield linha
+    yield from [""] * (min(vazias, 3) if inicio else min(vazias, 2))
+
+
+def aparar(linhas):
+    """Equivale a texto.strip(): tira as linhas em branco e os espaços das pontas."""
+    brancas, ultima = [], None
+    for linha in linhas:
+        if not linha.strip():
+            if ultima is not None: brancas.append(linha)
+            continue
+        if ultima is None: linha = linha.lstrip()
+        else:
+            yield ultima
+            yield from brancas
+        brancas, ultima = [], linha
+    if ultima is not None: yield ultima.rstrip()
+
+
+ETAPA_INVISIVEIS = etapa_caracteres()
+ETAPA_INVISIVEIS_NBSP = etapa_caracteres(trocar={"\u00A0": " "})
+ETAPA_QUEBRAS = Etapa("quebras_de_linha", "fluxo", quebras_de_linha)
+ETAPA_HIFENIZACAO = Etapa("juntar_hifenizacao", "fluxo", juntar_hifenizacao)
+ETAPA_NUMEROS_SOLTOS = etapa_texto(lambda t: _RX_NUMERO_SOLTO.sub("", t), "numeros_soltos")
+ETAPA_SUBLINHADOS = Etapa("sublinhados", "linha", lambda linha: _RX_SUBLINHADO.sub("", linha))
+ETAPA_ESPACOS = Etapa("espacos", "linha", lambda linha: _RX_ESPACOS.sub(" ", linha))
+ETAPA_LINHAS_VAZIAS = Etapa("linhas_vazias", "fluxo", colapsar_linhas_vazias)
+ETAPA_APARAR = Etapa("aparar", "fluxo", aparar)
+
+
+# ----------------- PARÁGRAFOS -----------------
+def etapa_paragrafos(eh_titulo, isolar=None, nome="paragrafos"):
+    """Remonta parágrafos quebrados pela diagramação. Títulos (eh_titulo) e linhas que casam
+    `isolar` ficam sozinhos; linhas vazias ou muito curtas separam parágrafos."""
+    def paragrafos(linhas):
+        partes, ultima = [], None
+        for linha in linhas:
+            l_strip = linha.strip()
+            if not l_strip or (len(l_strip) < 3 and not re.match(r'^\d+\.?$', l_strip)):
+                if partes: ultima = "".join(partes); yield ultima; partes = []
+                if ultima != "": ultima = ""; yield ultima
+                continue
+            if eh_titulo(l_strip) or (isolar is not None and isolar.search(l_strip)):
+                if partes: yield "".join(partes); partes = []
+                ultima = l_strip
+                yield ultima
+                continue
+            if partes:
+                if partes[-1].endswith('-'): partes[-1] = partes[-1][:-1]; partes.append(l_strip)
+                elif not partes[-1].endswith(('.', ':', '!', '?')): partes += [" ", l_strip]
+                else: ultima = "".join(partes); yield ultima; partes = [l_strip]
+            else: partes = [l_strip]
+        if partes: yield "".join(partes)
+    return Etapa(nome, "fluxo", paragrafos)
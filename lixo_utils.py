@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import namedtuple, Counter
+
+logger = logging.getLogger(__name__)
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Regras de lixo gráfico ficam em regras_lixo.json e são compiladas uma vez, na importação.
+# Cada conjunto (uma página do app) tem uma "ordem" de varreduras; todas as regras de uma
+# varredura viram um único padrão alternado, então o texto é percorrido uma vez por etapa,
+# e não uma ou duas vezes por regra.
+ARQUIVO_REGRAS = os.environ.get("BULAS_REGRAS_LIXO") or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                     "regras_lixo.json")
+
+Regra = namedtuple("Regra", ["conjunto", "padrao", "inteira", "troca"])
+# rx: todas as regras da varredura num padrão só; regras: [(Regra, padrão individual)] na
+# ordem das alternativas, para saber qual regra casou.
+Varredura = namedtuple("Varredura", ["rx", "regras"])
+
+_contagem = Counter()
+_trava = threading.Lock()
+
+
+# ----------------- COMPILAÇÃO -----------------
+def _alternativa(regra):
+    """(ancorada, padrão com as flags da regra num grupo com escopo, ex.: (?im:...)).
+
+    Ancoradas são as que só casam no início de uma linha: linha inteira, "^..." multilinha e
+    ".*X.*" (se X não está na linha a partir do início, também não está depois). Na varredura
+    elas ficam juntas atrás de um único ^, em vez de serem tentadas em cada posição do texto.
+    """
+    p = re.escape(regra["padrao"]) if regra.get("literal") else regra["padrao"]
+    flags = regra.get("flags", "i")
+    ancorada = True
+    if regra.get("inteira"):
+        p = "(?:" + p + ")$"
+        if "m" not in flags: flags += "m"
+    elif p.startswith("^") and "m" in flags: p = p[1:]
+    elif not p.startswith(".*"): ancorada = False
+    return ancorada, f"(?{flags}:{p})" if flags else f"(?:{p})"
+
+
+def compilar_conjunto(nome, definicao):
+    varreduras = []
+    for etapa in definicao["ordem"]:
+        grupos = [etapa] if isinstance(etapa, str) else etapa
+        ancoradas, livres = [], []
+        for r in (r for g in grupos for r in definicao["grupos"][g]):
+            ancorada, alt = _alternativa(r)
+            regra = Regra(nome, r["padrao"], bool(r.get("inteira")), r.get("troca", ""))
+            if ancorada: ancoradas.append((regra, "(?m:^)" + alt, alt))
+            else: livres.append((regra, alt, alt))
+        # Sem grupos nomeados: eles desligam a otimização de prefixo literal do re.
+        partes = (["(?m:^)(?:" + "|".join(a for _, _, a in ancoradas) + ")"] if ancoradas else []) \
+            + [a for _, _, a in livres]
+        varreduras.append(Varredura(re.compile("|".join(partes)),
+                                    [(regra, re.compile(p)) for regra, p, _ in ancoradas + livres]))
+    return varreduras
+
+
+def digest_conjunto(definicao):
+    """Resumo da definição de um conjunto (JSON canônico): muda a cada edição das regras."""
+    return hashlib.sha256(json.dumps(definicao, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def carregar_regras(caminho=ARQUIVO_REGRAS):
+    """({conjunto: varreduras}, {conjunto: digest_conjunto})."""
+    with open(caminho, encoding="utf-8") as f:
+        dados = {nome: d for nome, d in json.load(f).items() if not nome.startswith("_")}
+    return ({nome: compilar_conjunto(nome, d) for nome, d in dados.items()},
+            {nome: digest_conjunto(d) for nome, d in dados.items()})
+
+
+CONJUNTOS, DIGESTS = carregar_regras()
+
+
+def versao_regras(conjunto):
+    """Digest das regras carregadas do conjunto, para a chave do cache de extração: editar o
+    arquivo de regras (ou trocá-lo via BULAS_REGRAS_LIXO) invalida o texto limpo com as antigas."""
+    return DIGESTS[conjunto]
+
+
+# ----------------- APLICAÇÃO -----------------
+def aplicar_regras(texto, conjunto):
+    """Remove o lixo do texto com as varreduras do conjunto, contando os acertos de cada regra."""
+    acertos = Counter()
+    for varredura in CONJUNTOS[conjunto]:
+        def trocar(m, regras=varredura.regras):
+            # A alternância escolhe a primeira alternativa que casa nesta posição.
+            regra = next(r for r, rx in regras if rx.match(m.string, m.start()))
+            acertos[regra] += 1
+            return regra.troca
+        texto = varredura.rx.sub(trocar, texto)
+    if acertos:
+        with _trava: _contagem.update(acertos)
+        logger.debug("lixo %s: %d remoções por %d regras", conjunto, sum(acertos.values()), len(acertos))
+    return texto
+
+
+def contagem_regras(conjunto=None):
+    """[(regra, acertos)] desde o início do processo, incluindo as que nunca dispararam
+    (candidatas a sair do arquivo), das mais para as menos usadas."""
+    with _trava: contagem = dict(_contagem)
+    regras = {r for nome, vs in CONJUNTOS.items() if conjunto in (None, nome) for v in vs for r, _ in v.regras}
+    return sorted(((r, contagem.get(r, 0)) for r in regras), key=lambda x: (-x[1], x[0].conjunto, x[0].padrao))
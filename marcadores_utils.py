@@ -0,0 +1,101 @@
+import re
+import unicodedata
+from functools import lru_cache
+from collections import namedtuple
+
+import numpy as np
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Frases fixas que várias funções procuravam no texto inteiro, cada uma na sua passada
+# (tipo de bula, qualidade da extração, marcador de aprovação da ANVISA). Todas entram num
+# só conjunto de palavras-chave, compilado uma vez por processo, e cada documento é varrido
+# uma vez (resultado em cache) numa forma normalizada: minúsculo, sem acentos, só letras e
+# dígitos — "Onde, como e por quanto" vira "ondecomoeporquanto".
+MARCADORES_PACIENTE = (
+    "como este medicamento funciona", "o que devo saber antes de usar",
+    "onde como e por quanto tempo posso guardar", "o que devo fazer quando eu me esquecer",
+    "quais os males que este medicamento pode causar", "o que fazer se alguem usar uma quantidade maior",
+)
+MARCADORES_PROFISSIONAL = (
+    "resultados de eficacia", "caracteristicas farmacologicas", "interacoes medicamentosas",
+    "posologia e modo de usar", "reacoes adversas", "superdose", "propriedades farmacocinetica",
+)
+MARCADORES_QUALIDADE = ("para que este", "como devo usar", "dizeres legais", "quando nao devo", "composicao")
+# Candidatos à data de aprovação: a regex de cada página confirma no texto original.
+MARCADORES_ANVISA = ("aprovado pela anvisa em", "aprovada pela anvisa em", "data de aprova")
+
+VARREDURA_CACHE = 8  # documentos (textos) mantidos em cache
+
+Achados = namedtuple("Achados", ["posicoes"])  # chave normalizada -> (início no texto original, ...)
+
+
+def chave(frase):
+    """Forma normalizada de uma frase (a mesma do texto varrido)."""
+    return "".join(c for c in unicodedata.normalize("NFD", frase.lower()) if c.isascii() and c.isalnum())
+
+
+def _tabela_ascii():
+    """Código -> letra/dígito ASCII minúsculo sem acento (0 = descartar), até U+024F."""
+    tabela = np.zeros(0x250, dtype=np.uint8)
+    for c in range(0x250):
+        base = unicodedata.normalize("NFD", chr(c))[0].lower()
+        if base.isascii() and base.isalnum(): tabela[c] = ord(base)
+    tabela[0x131], tabela[0x17F] = ord("i"), ord("s")  # ı e ſ: o re.IGNORECASE os iguala a i/s
+    return tabela
+
+
+_TABELA = _tabela_ascii()
+CHAVES = tuple(dict.fromkeys(chave(f) for grupo in (MARCADORES_PACIENTE, MARCADORES_PROFISSIONAL,
+                                                    MARCADORES_QUALIDADE, MARCADORES_ANVISA) for f in grupo))
+# Alternância de literais sem grupos: o re filtra as posições pelo primeiro caractere.
+_RX_CHAVES = re.compile("|".join(sorted(map(re.escape, CHAVES), key=len, reverse=True)))
+
+
+# ----------------- VARREDURA -----------------
+def normalizar_com_posicoes(texto):
+    """(texto normalizado, posição no original de cada caractere dele)."""
+    codigos = np.frombuffer(texto.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    mapeados = _TABELA[np.minimum(codigos, 0x24F)]
+    mapeados[codigos >= 0x250] = 0
+    manter = mapeados != 0
+    return mapeados[manter].tobytes().decode("ascii"), np.flatnonzero(manter)
+
+
+@lru_cache(maxsize=VARREDURA_CACHE)
+def varrer(texto):
+    """Todas as ocorrências (inclusive sobrepostas) de todas as chaves, numa passada."""
+    normal, posicoes = normalizar_com_posicoes(texto)
+    achados = {c: [] for c in CHAVES}
+    m = _RX_CHAVES.search(normal)
+    while m:
+        i = m.start()
+        for c in CHAVES:
+            if normal.startswith(c, i): achados[c].append(int(posicoes[i]))
+        m = _RX_CHAVES.search(normal, i + 1)
+    return Achados({c: tuple(p) for c, p in achados.items()})
+
+
+# ----------------- CONSULTAS -----------------
+# As versões *_em recebem os Achados de uma varredura já feita (ver contexto_utils).
+def contar_em(achados, frases):
+    return sum(1 for f in frases if achados.posicoes[chave(f)])
+
+
+def buscar_em(texto, achados, rx, frases=MARCADORES_ANVISA):
+    for inicio in sorted({p for f in frases for p in achados.posicoes[chave(f)]}):
+        m = rx.match(texto, inicio)
+        if m: return m
+    return None
+
+
+def contar_marcadores(texto, frases):
+    """Quantas das frases aparecem no texto (ignorando caixa, acentos, espaços e pontuação)."""
+    if not texto: return 0
+    return contar_em(varrer(texto), frases)
+
+
+def buscar_marcador(texto, rx, frases=MARCADORES_ANVISA):
+    """Equivale a rx.search(texto) quando todo casamento de rx começa numa das frases: a regex
+    só é tentada nas ocorrências delas, em ordem."""
+    if not texto: return None
+    return buscar_em(texto, varrer(texto), rx, frases)
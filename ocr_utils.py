@@ -0,0 +1,524 @@
+import os
+import math
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import namedtuple, defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import fitz  # PyMuPDF
+from PIL import Image
+import pytesseract
+
+from pdf_utils import abrir_pdf
+
+try:
+    import tesserocr  # API do Tesseract em processo: o modelo fica carregado entre as imagens
+except ImportError:
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+# ----------------- CONFIGURAÇÃO -----------------
+OCR_DPI = 300
+OCR_LANG = 'por'
+OCR_CONFIG = '--psm 3'
+# Processos do motor de OCR (0 = um por núcleo).
+OCR_WORKERS = int(os.environ.get("BULAS_OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+# Máximo de páginas renderizadas/em reconhecimento ao mesmo tempo (mantém a memória estável).
+OCR_MAX_EM_VOO = int(os.environ.get("BULAS_OCR_MAX_EM_VOO", "0")) or OCR_WORKERS
+# Teto de memória do bitmap de cada job de OCR (cinza = 1 byte/pixel). Páginas maiores
+# (artes de 19 x 45 cm a 300 dpi passam de 100 MB) são rasterizadas em faixas horizontais.
+OCR_MEMORIA_MAX_MB = int(os.environ.get("BULAS_OCR_MEMORIA_MAX_MB", "64"))
+# Sobreposição entre faixas, em pontos: precisa ser maior que a linha de texto mais alta.
+OCR_SOBREPOSICAO_PT = 36
+# Cada processo do motor é reciclado após este número de imagens (contém vazamentos do Tesseract).
+OCR_RECICLAR_APOS = int(os.environ.get("BULAS_OCR_RECICLAR_APOS", "200"))
+# Detecção de regiões com tinta numa prévia de baixa resolução: só elas vão para o OCR.
+OCR_DETECTAR_REGIOES = os.environ.get("BULAS_OCR_REGIOES", "1") != "0"
+OCR_DPI_PREVIA = 50
+OCR_LIMIAR_TINTA = 200      # cinza abaixo disto (0-255) conta como tinta
+OCR_CALHA_PT = 7            # vão vertical mínimo entre colunas
+OCR_ENTRELINHA_PT = 10      # vão horizontal mínimo entre blocos
+OCR_MARCA_MAX_PT = 4        # regiões mais finas que isto são fios / marcas de corte
+OCR_PREENCHIMENTO_MAX = 0.9 # regiões quase sólidas são barras de cor / chapados
+OCR_MARGEM_REGIAO_PT = 3
+OCR_FUNDIR_PT = 24          # blocos da mesma coluna mais próximos que isto viram uma região só
+# Imagens embutidas (parágrafos achatados, quadros escaneados) reconhecidas na resolução nativa.
+OCR_IMAGEM_MIN_PX = (100, 20)   # largura, altura mínimas em pixels nativos
+OCR_IMAGEM_MIN_PT = (30, 8)     # largura, altura mínimas na página
+OCR_IMAGEM_DPI_MIN = 150        # abaixo disto a imagem é ampliada antes do OCR
+
+TempoPagina = namedtuple("TempoPagina", ["pagina", "render", "ocr"])
+# faixa = (y0 do clip, início e fim da zona "dona" da faixa) em pontos; None = página inteira.
+# regiao = índice da região de texto na ordem de leitura; ordem = faixa dentro da região.
+Recorte = namedtuple("Recorte", ["pagina", "regiao", "ordem", "img", "faixa", "escala", "render"])
+
+
+# ----------------- RENDERIZAÇÃO -> OCR -----------------
+def renderizar_cinza(page, dpi=OCR_DPI, clip=None):
+    """Renderiza em tons de cinza (1 canal) e expõe pix.samples como imagem PIL, sem PNG."""
+    return _imagem_do_pixmap(page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False, clip=clip))
+
+
+def _sem_compressao(img):
+    """Marca a imagem para o pytesseract gravá-la sem compressão.
+
+    O pytesseract grava a imagem num arquivo temporário no formato de `img.format`: PPM (PGM
+    binário para 1 canal) sai sem compressão, ao contrário do PNG que ele usa quando a imagem
+    não tem formato — caso de toda imagem criada com frombuffer/frombytes.
+    """
+    img.format = "PPM"
+    return img
+
+
+def _imagem_do_pixmap(pix):
+    img = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+    # A imagem aponta para a memória do pixmap: ele precisa viver (e morrer) junto com ela.
+    img._pixmap = pix
+    return _sem_compressao(img)
+
+
+# ----------------- RECONHECEDOR (roda dentro dos processos do motor) -----------------
+_api = None  # reconhecedor residente deste processo
+
+
+def _iniciar_reconhecedor():
+    global _api
+    if tesserocr is None: return
+    try:
+        _api = tesserocr.PyTessBaseAPI(lang=OCR_LANG, psm=tesserocr.PSM.AUTO)
+    except RuntimeError:
+        logger.warning("tesserocr sem o idioma '%s'; usando o binário tesseract", OCR_LANG)
+
+
+def reconhecer(img):
+    """Texto da imagem igual ao de `tesseract --psm 3` (None se o Tesseract falhar)."""
+    try:
+        if _api is not None:
+            _api.SetImage(img)
+            # O CLI (e portanto o pytesseract) termina cada página com o separador \f.
+            return _api.GetUTF8Text() + "\f"
+        return pytesseract.image_to_string(img, lang=OCR_LANG, config=OCR_CONFIG)
+    except Exception:
+        return None
+
+
+def linhas_com_posicao(img):
+    """[(parágrafo, topo, base, texto)] em pixels, na ordem de leitura (None se falhar)."""
+    try:
+        if _api is not None:
+            _api.SetImage(img)
+            _api.Recognize()
+            linhas, paragrafo = [], 0
+            for it in tesserocr.iterate_level(_api.GetIterator(), tesserocr.RIL.TEXTLINE):
+                if it.IsAtBeginningOf(tesserocr.RIL.PARA): paragrafo += 1
+                texto = " ".join((it.GetUTF8Text(tesserocr.RIL.TEXTLINE) or "").split())
+                if texto:
+                    _, topo, _, base = it.BoundingBox(tesserocr.RIL.TEXTLINE)
+                    linhas.append((paragrafo, topo, base, texto))
+            return linhas
+        dados = pytesseract.image_to_data(img, lang=OCR_LANG, config=OCR_CONFIG,
+                                          output_type=pytesseract.Output.DICT)
+    except Exception:
+        return None
+    linhas = {}
+    for i, palavra in enumerate(dados["text"]):
+        if not palavra.strip(): continue
+        chave = (dados["block_num"][i], dados["par_num"][i], dados["line_num"][i])
+        topo, base = dados["top"][i], dados["top"][i] + dados["height"][i]
+        if chave in linhas:
+            linha = linhas[chave]
+            linha[1] = min(linha[1], topo); linha[2] = max(linha[2], base); linha[3].append(palavra)
+        else:
+            linhas[chave] = [chave[:2], topo, base, [palavra]]
+    return [(paragrafo, topo, base, " ".join(palavras)) for paragrafo, topo, base, palavras in linhas.values()]
+
+
+def _reconhecer_no_motor(tamanho, dados, com_posicao):
+    # A imagem chega como bytes e é remontada aqui, sem formato: marca de novo como PPM.
+    img = _sem_compressao(Image.frombytes("L", tamanho, dados))
+    t0 = time.perf_counter()
+    resultado = linhas_com_posicao(img) if com_posicao else reconhecer(img)
+    return resultado, time.perf_counter() - t0
+
+
+# ----------------- MOTOR DE OCR PERSISTENTE -----------------
+class MotorOCR:
+    """Pool de reconhecedores residentes que recebe imagens por uma fila.
+
+    Cada processo carrega o modelo `por` uma vez (via tesserocr, quando instalado; sem ele
+    cada imagem ainda vira uma chamada ao binário `tesseract`) e é reciclado após
+    `reciclar_apos` imagens.
+    """
+
+    def __init__(self, workers=None, reciclar_apos=None):
+        self._pool = ProcessPoolExecutor(max_workers=workers or OCR_WORKERS,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_iniciar_reconhecedor,
+                                         max_tasks_per_child=reciclar_apos or OCR_RECICLAR_APOS)
+
+    def submeter(self, img, com_posicao=False):
+        """Enfileira uma imagem em tons de cinza. O futuro resolve para (resultado, segundos)."""
+        return self._pool.submit(_reconhecer_no_motor, img.size, img.tobytes(), com_posicao)
+
+    def encerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def obter_motor():
+    """Motor compartilhado pelo processo (todas as sessões do Streamlit)."""
+    global _motor
+    with _motor_lock:
+        if _motor is None: _motor = MotorOCR()
+        return _motor
+
+
+def _descartar_motor(motor):
+    global _motor
+    with _motor_lock:
+        if _motor is motor: _motor = None
+    motor.encerrar()
+
+
+# ----------------- FAIXAS (TETO DE MEMÓRIA) -----------------
+def faixas_pagina(rect, dpi=OCR_DPI, memoria_max_mb=None):
+    """Divide a página em faixas sobrepostas cujo bitmap cabe no teto de memória.
+
+    Retorna [(clip, (início, fim))]: cada linha reconhecida pertence à única faixa cuja
+    zona contém o centro da linha — é assim que as linhas repetidas na sobreposição
+    (ou cortadas na borda de uma faixa) são descartadas. [(None, None)] = página inteira.
+    """
+    memoria = (OCR_MEMORIA_MAX_MB if memoria_max_mb is None else memoria_max_mb) * 1024 * 1024
+    escala = dpi / 72
+    altura_pt = (memoria // max(1, math.ceil(rect.width * escala))) / escala
+    if altura_pt >= rect.height: return [(None, None)]
+    altura_pt = max(altura_pt, 2 * OCR_SOBREPOSICAO_PT)
+    passo = altura_pt - OCR_SOBREPOSICAO_PT
+    clips = []
+    y = rect.y0
+    while True:
+        clips.append(fitz.Rect(rect.x0, y, rect.x1, min(y + altura_pt, rect.y1)))
+        if y + altura_pt >= rect.y1: break
+        y += passo
+    metade = OCR_SOBREPOSICAO_PT / 2
+    return [(clip, (rect.y0 if k == 0 else clip.y0 + metade,
+                    rect.y1 if k == len(clips) - 1 else clip.y1 - metade))
+            for k, clip in enumerate(clips)]
+
+
+def recortes_pagina(page, dpi=OCR_DPI, memoria_max_mb=None, regioes=None):
+    """Gera, sob demanda, os bitmaps a reconhecer: cada região de texto (ou a página
+    inteira), uma faixa por vez."""
+    regioes = OCR_DETECTAR_REGIOES if regioes is None else regioes
+    t0 = time.perf_counter()
+    areas = regioes_texto(page) if regioes else [None]
+    for r, area in enumerate(areas):
+        faixas = faixas_pagina(area or page.rect, dpi, memoria_max_mb)
+        for k, (clip, dono) in enumerate(faixas):
+            img = renderizar_cinza(page, dpi, clip or area)
+            faixa = (clip.y0, dono[0], dono[1]) if clip is not None else None
+            yield Recorte(page.number, r, k, img, faixa, dpi / 72, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+
+
+def _linhas_da_faixa(recorte, linhas):
+    """Mantém só as linhas cujo centro cai na zona "dona" da faixa."""
+    if linhas is None: return None
+    y0, inicio, fim = recorte.faixa
+    return [(paragrafo, texto) for paragrafo, topo, base, texto in linhas
+            if inicio <= y0 + (topo + base) / 2 / recorte.escala < fim]
+
+
+def _montar_texto(partes):
+    """Junta os resultados dos recortes de uma página (None se todos falharam)."""
+    if len(partes) == 1 and not isinstance(partes[0], list): return partes[0]
+    if all(p is None for p in partes): return None
+    texto, paragrafo_anterior = "", None
+    for k, linhas in enumerate(partes):
+        for paragrafo, linha in linhas or []:
+            # Linha em branco entre parágrafos, como no image_to_string (não na troca de faixa).
+            if paragrafo_anterior is not None and paragrafo != paragrafo_anterior[1] and k == paragrafo_anterior[0]:
+                texto += "\n"
+            texto += linha + "\n"
+            paragrafo_anterior = (k, paragrafo)
+    return texto
+
+
+def _texto_da_pagina(partes):
+    """Texto da página a partir de {(região, faixa): resultado}, na ordem de leitura."""
+    if not partes: return ""  # nenhuma região com tinta: nada a reconhecer
+    regioes = defaultdict(list)
+    for (r, _), resultado in sorted(partes.items()): regioes[r].append(resultado)
+    textos = [_montar_texto(p) for _, p in sorted(regioes.items())]
+    if all(t is None for t in textos): return None
+    if len(textos) == 1: return textos[0]
+    # Blocos separados por linha em branco, como os parágrafos do Tesseract.
+    return "\n".join(t.rstrip("\f\n") + "\n" for t in textos if t and t.strip("\f\n"))
+
+
+def _produzir_recortes(doc, paginas, dpi, memoria_max_mb, regioes, fila, erros, parar):
+    # Produtor: renderiza o próximo recorte enquanto o motor reconhece os anteriores.
+    try:
+        for indice in paginas:
+            for recorte in recortes_pagina(doc[indice], dpi, memoria_max_mb, regioes):
+                if parar.is_set(): return
+                fila.put(recorte)
+    except Exception as e:
+        erros.append(e)
+    finally:
+        fila.put(None)
+
+
+# ----------------- REGIÕES DE TEXTO (PRÉVIA EM BAIXA RESOLUÇÃO) -----------------
+def _trechos(perfil, vao_min):
+    """Intervalos [a, b) com tinta, separados por vãos de pelo menos `vao_min` posições."""
+    idx = np.flatnonzero(perfil)
+    if idx.size == 0: return []
+    quebras = np.flatnonzero(np.diff(idx) > vao_min)
+    inicios = np.concatenate(([idx[0]], idx[quebras + 1]))
+    fins = np.concatenate((idx[quebras], [idx[-1]])) + 1
+    return list(zip(inicios.tolist(), fins.tolist()))
+
+
+def _mesmas_colunas(a, b):
+    # Duas fatias horizontais continuam a mesma grade de colunas se as calhas se sobrepõem.
+    if len(a) < 2 or len(a) != len(b): return False
+    return all(a[i][1] < b[i + 1][0] and b[i][1] < a[i + 1][0] for i in range(len(a) - 1))
+
+
+def _cortar_xy(tinta, y0, y1, x0, x1, calha, entrelinha, regioes):
+    # Corte XY recursivo: colunas (calhas de altura total) primeiro, depois blocos
+    # horizontais. Fatias vizinhas com a mesma grade de colunas são reagrupadas para
+    # que a leitura desça cada coluna inteira antes de passar à próxima.
+    sub = tinta[y0:y1, x0:x1]
+    colunas = _trechos(sub.any(axis=0), calha)
+    if len(colunas) > 1:
+        for a, b in colunas:
+            _cortar_xy(tinta, y0, y1, x0 + a, x0 + b, calha, entrelinha, regioes)
+        return
+    linhas = _trechos(sub.any(axis=1), entrelinha)
+    if not linhas: return
+    if len(linhas) == 1:
+        (a, b), (c, d) = linhas[0], colunas[0]
+        regioes.append((x0 + c, y0 + a, x0 + d, y0 + b))
+        return
+    grupos, grade_anterior = [], None
+    for a, b in linhas:
+        grade = _trechos(tinta[y0 + a:y0 + b, x0:x1].any(axis=0), calha)
+        if grupos and _mesmas_colunas(grade_anterior, grade): grupos[-1][1] = b
+        else: grupos.append([a, b])
+        grade_anterior = grade
+    if len(grupos) == 1:
+        # As calhas não se alinham em altura total: a fatia vai inteira como uma região
+        # (o Tesseract ainda segmenta as colunas dentro dela).
+        (c, d) = colunas[0]
+        regioes.append((x0 + c, y0 + linhas[0][0], x0 + d, y0 + linhas[-1][1]))
+        return
+    for a, b in grupos:
+        _cortar_xy(tinta, y0 + a, y0 + b, x0, x1, calha, entrelinha, regioes)
+
+
+def _fundir_blocos(caixas, vao):
+    # Cada região é uma chamada ao Tesseract: parágrafos seguidos da mesma coluna vão juntos,
+    # desde que a união não invada nenhuma outra região.
+    fundidas = []
+    for i, (x0, y0, x1, y1) in enumerate(caixas):
+        if fundidas:
+            a0, b0, a1, b1 = fundidas[-1]
+            uniao = (min(a0, x0), b0, max(a1, x1), max(b1, y1))
+            outras = fundidas[:-1] + caixas[i + 1:]
+            if (0 <= y0 - b1 <= vao and x0 < a1 and a0 < x1
+                    and not any(o[0] < uniao[2] and uniao[0] < o[2] and o[1] < uniao[3] and uniao[1] < o[3]
+                                for o in outras)):
+                fundidas[-1] = uniao
+                continue
+        fundidas.append((x0, y0, x1, y1))
+    return fundidas
+
+
+def regioes_texto(page, dpi=OCR_DPI_PREVIA):
+    """Regiões da página com texto, em pontos e na ordem de leitura.
+
+    Perfis de projeção da tinta numa prévia de baixa resolução separam colunas e blocos;
+    fios, marcas de corte, barras de cor e tudo o que fica fora do TrimBox são descartados.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    cinza = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    tinta = cinza < OCR_LIMIAR_TINTA
+    escala = dpi / 72
+    caixas = []
+    _cortar_xy(tinta, 0, pix.height, 0, pix.width, max(1, round(OCR_CALHA_PT * escala)),
+               max(1, round(OCR_ENTRELINHA_PT * escala)), caixas)
+
+    # TrimBox menor que a página = prova com sangria: marcas e barras ficam fora dele.
+    corte = page.trimbox if page.trimbox != page.mediabox else page.rect
+    caixas = [(x0, y0, x1, y1) for x0, y0, x1, y1 in caixas
+              if min(x1 - x0, y1 - y0) >= OCR_MARCA_MAX_PT * escala
+              and tinta[y0:y1, x0:x1].mean() <= OCR_PREENCHIMENTO_MAX
+              and fitz.Rect(x0 / escala, y0 / escala, x1 / escala, y1 / escala).intersects(corte)]
+    m = OCR_MARGEM_REGIAO_PT
+    return [fitz.Rect(x0 / escala - m, y0 / escala - m, x1 / escala + m, y1 / escala + m) & page.rect
+            for x0, y0, x1, y1 in _fundir_blocos(caixas, OCR_FUNDIR_PT * escala)]
+
+
+# ----------------- OCR DE PÁGINAS -----------------
+def executar_ocr_paginas(pdf, paginas=None, dpi=OCR_DPI, max_em_voo=None, memoria_max_mb=None,
+                         regioes=None):
+    """OCR das páginas pedidas (todas por padrão) no motor persistente.
+
+    `pdf` pode ser os bytes, o caminho ou o documento fitz já aberto da sessão.
+    Retorna (textos, tempos) na ordem das páginas; o texto é None nas páginas em que o
+    Tesseract falhou. No máximo `max_em_voo` recortes ficam renderizados ao mesmo tempo,
+    cada um limitado a `memoria_max_mb` (padrão OCR_MEMORIA_MAX_MB). Com `regioes`
+    (padrão OCR_DETECTAR_REGIOES) só as regiões de texto da página são reconhecidas.
+    """
+    max_em_voo = max(1, OCR_MAX_EM_VOO if max_em_voo is None else max_em_voo)
+    motor = obter_motor()
+    partes, tempos = defaultdict(dict), {}
+    with abrir_pdf(pdf) as doc:
+        paginas = list(range(doc.page_count)) if paginas is None else list(paginas)
+        fila, erros, parar = queue.Queue(maxsize=1), [], threading.Event()
+        produtor = threading.Thread(target=_produzir_recortes,
+                                    args=(doc, paginas, dpi, memoria_max_mb, regioes, fila, erros, parar), daemon=True)
+        produtor.start()
+        pendentes, fim = {}, False
+        try:
+            while not fim or pendentes:
+                # Enche o motor até `max_em_voo` recortes; a imagem sai da memória ao ser enviada.
+                while not fim and len(pendentes) < max_em_voo:
+                    recorte = fila.get()
+                    if recorte is None: fim = True; break
+                    futuro = motor.submeter(recorte.img, com_posicao=recorte.faixa is not None)
+                    pendentes[futuro] = recorte._replace(img=None)
+                if not pendentes: break
+                prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    r = pendentes.pop(futuro)
+                    resultado, t_ocr = futuro.result()
+                    if r.faixa is not None: resultado = _linhas_da_faixa(r, resultado)
+                    partes[r.pagina][(r.regiao, r.ordem)] = resultado
+                    t_render, t_total = tempos.get(r.pagina, (0.0, 0.0))
+                    tempos[r.pagina] = (t_render + r.render, t_total + t_ocr)
+        except BrokenProcessPool:
+            _descartar_motor(motor)
+            raise
+        finally:
+            # Em caso de erro, esvazia a fila para o produtor não ficar preso no put().
+            parar.set()
+            while produtor.is_alive():
+                try: fila.get(timeout=0.1)
+                except queue.Empty: pass
+    if erros: raise erros[0]
+
+    textos = [_texto_da_pagina(partes[i]) for i in paginas]
+    tempos = [TempoPagina(i, *tempos.get(i, (0.0, 0.0))) for i in paginas]
+    _registrar_tempos(tempos)
+    return textos, tempos
+
+
+def _registrar_tempos(tempos):
+    for t in tempos:
+        logger.info("OCR página %d: render %.2fs, reconhecimento %.2fs", t.pagina + 1, t.render, t.ocr)
+
+
+# ----------------- IMAGENS EMBUTIDAS -----------------
+def imagens_para_ocr(page, blocos_texto=None):
+    """Imagens da página que podem conter texto: [{"bbox", "xref", "number", ...}].
+
+    Ficam de fora imagens inline (sem xref), miniaturas e fios, e as que têm texto nativo
+    por cima (fundo decorativo ou página escaneada que já tem camada de texto).
+    """
+    if blocos_texto is None: blocos_texto = page.get_text("blocks")
+    centros = [fitz.Point((b[0] + b[2]) / 2, (b[1] + b[3]) / 2) for b in blocos_texto if b[6] == 0]
+    imagens = []
+    for info in page.get_image_info(xrefs=True):
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        if info["xref"] <= 0 or bbox.is_empty: continue
+        if info["width"] < OCR_IMAGEM_MIN_PX[0] or info["height"] < OCR_IMAGEM_MIN_PX[1]: continue
+        if bbox.width < OCR_IMAGEM_MIN_PT[0] or bbox.height < OCR_IMAGEM_MIN_PT[1]: continue
+        if any(bbox.contains(c) for c in centros): continue
+        imagens.append(dict(info, bbox=tuple(bbox)))
+    return imagens
+
+
+def blocos_com_imagens(page, imagens=None):
+    """Blocos de texto na ordem do conteúdo, com as imagens a reconhecer intercaladas.
+
+    As imagens entram como blocos (x0, y0, x1, y1, None, número, 1, xref); sem imagens a
+    junção dos textos é idêntica a page.get_text().
+    """
+    blocos = [b for b in page.get_text("blocks") if b[6] == 0]
+    if imagens is None: imagens = imagens_para_ocr(page, blocos)
+    # "number" numera imagens e blocos de texto juntos, no fluxo do conteúdo: inseridas em
+    # ordem, cada imagem cai exatamente na posição do seu número.
+    for info in sorted(imagens, key=lambda i: i["number"]):
+        blocos.insert(min(info["number"], len(blocos)), (*info["bbox"], None, info["number"], 1, info["xref"]))
+    return blocos
+
+
+def imagem_nativa(doc, xref, largura_pt=None, memoria_max_mb=None):
+    """Imagem embutida em tons de cinza na resolução em que foi colocada no PDF (None se ilegível)."""
+    try:
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha: pix = fitz.Pixmap(pix, 0)
+        if pix.colorspace is None or pix.colorspace.n != 1: pix = fitz.Pixmap(fitz.csGRAY, pix)
+    except (RuntimeError, ValueError):
+        return None
+    memoria = (OCR_MEMORIA_MAX_MB if memoria_max_mb is None else memoria_max_mb) * 1024 * 1024
+    while pix.width * pix.height > memoria and min(pix.width, pix.height) > 1: pix.shrink(1)
+    img = _imagem_do_pixmap(pix)
+    dpi = pix.width * 72 / largura_pt if largura_pt else OCR_DPI
+    if dpi < OCR_IMAGEM_DPI_MIN:
+        # Texto achatado em baixa resolução: o Tesseract lê bem melhor depois de ampliar.
+        fator = math.ceil(OCR_IMAGEM_DPI_MIN / dpi)
+        img = img.resize((img.width * fator, img.height * fator), Image.LANCZOS)
+    return img
+
+
+def executar_ocr_imagens(pdf, imagens, max_em_voo=None, memoria_max_mb=None):
+    """OCR das imagens embutidas {xref: largura na página em pt}. Retorna {xref: texto ou None}."""
+    max_em_voo = max(1, OCR_MAX_EM_VOO if max_em_voo is None else max_em_voo)
+    motor = obter_motor()
+    textos, pendentes = {}, {}
+
+    def coletar(quando):
+        prontos, _ = wait(pendentes, return_when=quando)
+        for futuro in prontos: textos[pendentes.pop(futuro)] = futuro.result()[0]
+
+    with abrir_pdf(pdf) as doc:
+        try:
+            for xref, largura_pt in imagens.items():
+                if len(pendentes) >= max_em_voo: coletar(FIRST_COMPLETED)
+                img = imagem_nativa(doc, xref, largura_pt, memoria_max_mb)
+                if img is None: textos[xref] = None; continue
+                pendentes[motor.submeter(img)] = xref
+            if pendentes: coletar(ALL_COMPLETED)
+        except BrokenProcessPool:
+            _descartar_motor(motor)
+            raise
+    return textos
+
+
+# ----------------- QUALIDADE DA CAMADA DE TEXTO -----------------
+# Mínimo de caracteres alfanuméricos para considerar que a página tem texto nativo.
+OCR_MIN_CARACTERES_PAGINA = 40
+
+
+def texto_nativo_utilizavel(texto):
+    """Heurística por página: tem texto suficiente e não parece fonte com codificação quebrada."""
+    visiveis = [c for c in texto or "" if not c.isspace()]
+    alfanum = sum(1 for c in visiveis if c.isalnum())
+    if alfanum < OCR_MIN_CARACTERES_PAGINA: return False
+    # U+FFFD e área de uso privado aparecem quando a fonte não tem mapa ToUnicode.
+    quebrados = sum(1 for c in visiveis if c == '\ufffd' or '\ue000' <= c <= '\uf8ff')
+    if quebrados > 0.1 * len(visiveis): return False
+    return alfanum >= 0.5 * len(visiveis)
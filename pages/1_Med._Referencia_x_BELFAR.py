@@ -8,15 +8,22 @@
 # - Impede a execução da comparação se os tipos não baterem.
 
 import streamlit as st
-import fitz  # PyMuPDF
-import docx
 import re
 import spacy
-from thefuzz import fuzz
 from spellchecker import SpellChecker
-import difflib
-import unicodedata
 from collections import defaultdict, namedtuple
+from pdf_utils import extrair_pdf_com_titulos, MODO_TEXTO
+from docx_utils import texto_docx_com_titulos
+from cache_utils import ler_cache, gravar_cache
+from sessao_utils import SessaoDocumento
+from texto_utils import normalizar_texto, normalizar_titulo_para_comparacao as normalizar_titulo
+from pontuacao_utils import melhores_titulos
+from secoes_utils import matriz_regras, alinhar, montar_mapa, segmentar
+from marcadores_utils import MARCADORES_PACIENTE, MARCADORES_PROFISSIONAL, MARCADORES_ANVISA
+from contexto_utils import ContextoDocumento, registrar_estatisticas
+from diff_utils import comparar_secoes, marcar_tokens
+from limpeza_utils import (executar_limpeza, linhas_de, etapa_descartar, ETAPA_INVISIVEIS, ETAPA_QUEBRAS,
+                           ETAPA_HIFENIZACAO, ETAPA_LINHAS_VAZIAS, ETAPA_ESPACOS, ETAPA_APARAR)
 
 # ----------------- UI / CSS -----------------
 st.set_page_config(layout="wide", page_title="Auditoria de Bulas", page_icon="🔬")
@@ -85,48 +92,52 @@ nlp = carregar_modelo_spacy()
 
 
 # ----------------- EXTRAÇÃO -----------------
+# Faz parte da chave do cache de extração: altere ao mudar a limpeza abaixo.
+VERSAO_REGRAS_LIMPEZA = "v21.9.2"
+
+# Limpeza em fluxo, linha a linha, sobre as páginas extraídas (ver limpeza_utils).
+ETAPAS_LIMPEZA = [
+    ETAPA_INVISIVEIS, ETAPA_QUEBRAS, ETAPA_HIFENIZACAO,
+    etapa_descartar(re.compile(r'bula (?:do|para o) paciente|página \d+\s*de\s*\d+', re.IGNORECASE), "rodape"),
+    ETAPA_LINHAS_VAZIAS, ETAPA_ESPACOS, ETAPA_APARAR,
+]
+
 def extrair_texto(arquivo, tipo_arquivo):
+    """(texto, erro, títulos): os títulos são dicas tipográficas (PDF) ou de estilo (DOCX)."""
     if arquivo is None:
-        return "", f"Arquivo {tipo_arquivo} não enviado."
+        return "", f"Arquivo {tipo_arquivo} não enviado.", []
     try:
-        arquivo.seek(0)
-        texto = ""
-        if tipo_arquivo == 'pdf':
-            pages = []
-            with fitz.open(stream=arquivo.read(), filetype="pdf") as doc:
-                for page in doc:
-                    pages.append(page.get_text("text", sort=True))
-            texto = "\n".join(pages)
-        elif tipo_arquivo == 'docx':
-            doc = docx.Document(arquivo)
-            texto = "\n".join([p.text for p in doc.paragraphs])
-
-        if texto:
-            invis = ['\u00AD', '\u200B', '\u200C', '\u200D', '\uFEFF']
-            for c in invis:
-                texto = texto.replace(c, '')
-            texto = texto.replace('\r\n', '\n').replace('\r', '\n')
-            texto = re.sub(r'(\w+)-\n(\w+)', r'\1\2', texto, flags=re.IGNORECASE)
-            linhas = texto.split('\n')
-            padrao_rodape = re.compile(r'bula (?:do|para o) paciente|página \d+\s*de\s*\d+', re.IGNORECASE)
-            linhas = [l for l in linhas if not padrao_rodape.search(l.strip())]
-            texto = "\n".join(linhas)
-            texto = re.sub(r'\n{3,}', '\n\n', texto)
-            texto = re.sub(r'[ \t]+', ' ', texto)
-            texto = texto.strip()
-        return texto, None
+        with SessaoDocumento(arquivo, tipo_arquivo) as sessao:
+            chave = sessao.chave_cache("pag1", tipo_arquivo, VERSAO_REGRAS_LIMPEZA)
+            em_cache = ler_cache(chave)
+            if em_cache is not None:
+                return em_cache["texto"], None, em_cache["titulos"]
+            texto, paginas, titulos = "", [], []
+            if tipo_arquivo == 'pdf':
+                paginas, titulos = extrair_pdf_com_titulos(sessao.doc, MODO_TEXTO)
+            elif tipo_arquivo == 'docx':
+                # Em fluxo, com as tabelas (composição, posologia) na ordem do documento.
+                bruto, titulos = texto_docx_com_titulos(sessao.caminho)
+                paginas = [bruto]
+
+        if any(paginas):
+            texto, _ = executar_limpeza(linhas_de(paginas, "\n"), ETAPAS_LIMPEZA)
+            gravar_cache(chave, {"texto": texto, "titulos": titulos})
+        return texto, None, titulos
     except Exception as e:
-        return "", f"Erro ao ler o arquivo {tipo_arquivo}: {e}"
+        return "", f"Erro ao ler o arquivo {tipo_arquivo}: {e}", []
+
 
+RX_ANVISA = re.compile(r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})",
+                       re.IGNORECASE)
 
-def truncar_apos_anvisa(texto):
-    if not isinstance(texto, str): return texto
-    rx = r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
-    m = re.search(rx, texto, re.IGNORECASE)
+def truncar_apos_anvisa(contexto, tipo_bula):
+    """Contexto do texto cortado no fim da linha da data da ANVISA (sem corte, o mesmo)."""
+    m = contexto.buscar_marcador(RX_ANVISA)
     if m:
-        pos = texto.find('\n', m.end())
-        return texto[:pos] if pos != -1 else texto
-    return texto
+        pos = contexto.texto.find('\n', m.end())
+        if pos != -1: return contexto_documento(contexto.texto[:pos], tipo_bula, contexto.titulos)
+    return contexto
 
 
 # ----------------- CONFIGURAÇÃO DE SEÇÕES -----------------
@@ -174,19 +185,12 @@ def obter_secoes_ignorar_ortografia():
 
 
 # ----------------- NORMALIZAÇÃO -----------------
-def normalizar_texto(texto):
-    texto = '' if texto is None else texto
-    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-    texto = re.sub(r'[^\w\s]', '', texto)
-    texto = ' '.join(texto.split())
-    return texto.lower()
+# normalizar_texto: texto_utils (cache do processo)
+RX_NUMERO_TITULO = re.compile(r'^\s*(\d{1,2})\s*[\.\)\-]?\s*')
 
 
 def normalizar_titulo_para_comparacao(texto):
-    texto = '' if texto is None else texto
-    t = normalizar_texto(texto)
-    t = re.sub(r'^\s*(\d{1,2})\s*[\.\)\-]?\s*', '', t).strip()
-    return t
+    return normalizar_titulo(texto, RX_NUMERO_TITULO)
 
 
 def _create_anchor_id(secao_nome, prefix):
@@ -199,40 +203,43 @@ def _create_anchor_id(secao_nome, prefix):
 HeadingCandidate = namedtuple("HeadingCandidate", ["index", "raw", "norm", "numeric", "matched_canon", "score"])
 
 
-def construir_heading_candidates(linhas, secoes_esperadas, aliases):
+def construir_heading_candidates(linhas, secoes_esperadas, aliases, titulos=None):
+    """`titulos`: dicas da extração. Com dicas, linhas que não são título nem pela tipografia
+    nem pela forma do texto não passam pela pontuação fuzzy (só pelo teste de substring)."""
+    dicas = {normalizar_titulo_para_comparacao(t) for t in titulos or []}
     titulos_possiveis = {}
     for s in secoes_esperadas: titulos_possiveis[s] = s
     for a, c in aliases.items():
         if c in secoes_esperadas: titulos_possiveis[a] = c
     titulos_norm = {k: normalizar_titulo_para_comparacao(k) for k in titulos_possiveis.keys()}
-    candidates = []
+    # Pontuação em lote (pontuacao_utils): só os títulos com forma normalizada, na ordem do
+    # dicionário — no empate vale o primeiro.
+    canon_pontuados = [c for k, c in titulos_possiveis.items() if titulos_norm[k]]
+    norm_pontuados = [titulos_norm[k] for k in titulos_possiveis if titulos_norm[k]]
+    linhas_validas = []  # (índice, raw, norm, numeric, pontuar, candidata pela forma)
     for i, linha in enumerate(linhas):
         raw = (linha or "").strip()
         if not raw: continue
         norm = normalizar_titulo_para_comparacao(raw)
-        best_score = 0
-        best_canon = None
         mnum = re.match(r'^\s*(\d{1,2})\s*[\.\)\-]?\s*(.*)$', raw)
         numeric = int(mnum.group(1)) if mnum else None
 
         letters = re.findall(r'[A-Za-zÀ-ÖØ-öø-ÿ]', raw)
         is_upper = len(letters) and sum(1 for ch in letters if ch.isupper()) / len(letters) >= 0.6
         starts_with_cap = raw and (raw[0].isupper() or raw[0].isdigit())
-
-        for titulo_possivel, titulo_canonico in titulos_possiveis.items():
-            t_norm = titulos_norm.get(titulo_possivel, "")
-            if not t_norm: continue
-            score = fuzz.token_set_ratio(t_norm, norm)
-            if t_norm in norm: score = max(score, 95)
-            if score > best_score:
-                best_score = score
-                best_canon = titulo_canonico
-
-        is_candidate = False
-        if numeric is not None: is_candidate = True
-        elif best_score >= 88: is_candidate = True
-        elif is_upper and len(raw.split()) <= 10: is_candidate = True
-        elif starts_with_cap and len(raw.split()) <= 6 and re.search(r'[A-ZÁÉÍÓÚÂÊÔÃÕÇ]', raw): is_candidate = True
+        pontuar = not dicas or numeric is not None or norm in dicas \
+            or (is_upper and len(raw.split()) <= 10) or (starts_with_cap and len(raw.split()) <= 6)
+        pela_forma = numeric is not None or bool(is_upper and len(raw.split()) <= 10) \
+            or bool(starts_with_cap and len(raw.split()) <= 6 and re.search(r'[A-ZÁÉÍÓÚÂÊÔÃÕÇ]', raw))
+        linhas_validas.append((i, raw, norm, numeric, pontuar, pela_forma))
+
+    # Candidatas pela forma precisam da nota exata; as outras só de saber se chegam a 88.
+    notas, melhores = melhores_titulos(norm_pontuados, [l[2] for l in linhas_validas],
+                                       [l[4] for l in linhas_validas], [l[5] for l in linhas_validas])
+    candidates = []
+    for (i, raw, norm, numeric, _, pela_forma), best_score, k in zip(linhas_validas, notas, melhores):
+        best_canon = canon_pontuados[k] if k >= 0 else None
+        is_candidate = pela_forma or best_score >= 88
 
         if is_candidate:
             candidates.append(HeadingCandidate(index=i, raw=raw, norm=norm, numeric=numeric,
@@ -242,76 +249,44 @@ def construir_heading_candidates(linhas, secoes_esperadas, aliases):
     return sorted(unique.values(), key=lambda x: x.index)
 
 
-def mapear_secoes_deterministico(texto_completo, secoes_esperadas):
-    linhas = texto_completo.split('\n')
-    aliases = obter_aliases_secao()
-    candidates = construir_heading_candidates(linhas, secoes_esperadas, aliases)
-    mapa = []
-    last_idx = -1
-    for sec_idx, sec in enumerate(secoes_esperadas):
-        sec_norm = normalizar_titulo_para_comparacao(sec)
-        found = None
-        for c in candidates:
-            if c.index <= last_idx: continue
-            if c.matched_canon == sec: found = c; break
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if c.numeric == (sec_idx + 1): found = c; break
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if sec_norm and sec_norm in c.norm: found = c; break
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if fuzz.token_set_ratio(sec_norm, c.norm) >= 92: found = c; break
-
-        if found:
-            mapa.append({'canonico': sec, 'titulo_encontrado': found.raw, 'linha_inicio': found.index,
-                         'score': found.score})
-            last_idx = found.index
-    mapa = sorted(mapa, key=lambda x: x['linha_inicio'])
-    return mapa, candidates, linhas
-
-
-def obter_dados_secao_v2(secao_canonico, mapa_secoes, linhas_texto, tipo_bula):
-    entrada = None
-    for m in mapa_secoes:
-        if m['canonico'] == secao_canonico: entrada = m; break
-    if not entrada: return False, None, ""
-    linha_inicio = entrada['linha_inicio']
-    if secao_canonico.strip().upper() == "DIZERES LEGAIS":
-        linha_fim = len(linhas_texto)
-    else:
-        sorted_map = sorted(mapa_secoes, key=lambda x: x['linha_inicio'])
-        prox_idx = None
-        for m in sorted_map:
-            if m['linha_inicio'] > linha_inicio: prox_idx = m['linha_inicio']; break
-        linha_fim = prox_idx if prox_idx is not None else len(linhas_texto)
-    conteudo_lines = []
-    for i in range(linha_inicio + 1, linha_fim):
-        line_norm = normalizar_titulo_para_comparacao(linhas_texto[i])
-        if line_norm in {normalizar_titulo_para_comparacao(s) for s in obter_secoes_por_tipo(tipo_bula)}: break
-        conteudo_lines.append(linhas_texto[i])
-    conteudo_final = "\n".join(conteudo_lines).strip()
-    return True, entrada['titulo_encontrado'], conteudo_final
+def mapear_secoes_deterministico(contexto, secoes_esperadas):
+    candidates = contexto.candidatos
+    # Alinhamento monótono em secoes_utils: canônico > número (posição) > texto > fuzzy.
+    normas = [normalizar_titulo_para_comparacao(sec) for sec in secoes_esperadas]
+    numeros = list(range(1, len(secoes_esperadas) + 1))
+    alinhamento = alinhar(matriz_regras(secoes_esperadas, normas, numeros, candidates))
+    return montar_mapa(secoes_esperadas, candidates, alinhamento)
+
+
+def segmentar_secoes(contexto, tipo_bula):
+    """{canônico: (título, conteúdo)} de todas as seções numa passada (secoes_utils.segmentar)."""
+    titulos_norm = {normalizar_titulo_para_comparacao(s) for s in obter_secoes_por_tipo(tipo_bula)}
+    return segmentar(contexto.mapa, contexto.linhas, titulos_norm, normalizar_titulo_para_comparacao,
+                     normalizadas=contexto.linhas_normalizadas)
+
+
+# ----------------- CONTEXTO DO DOCUMENTO (ver contexto_utils) -----------------
+def contexto_documento(texto, tipo_bula, titulos=None):
+    """Linhas, candidatos, mapa, seções, marcadores e vocabulário do texto, calculados uma vez
+    e compartilhados por todas as etapas da auditoria."""
+    secoes = obter_secoes_por_tipo(tipo_bula)
+    return ContextoDocumento(
+        texto, titulos,
+        candidatos=lambda ctx: construir_heading_candidates(ctx.linhas, secoes, obter_aliases_secao(), ctx.titulos),
+        mapear=lambda ctx: mapear_secoes_deterministico(ctx, secoes),
+        segmentar=lambda ctx: segmentar_secoes(ctx, tipo_bula), normalizar_linha=normalizar_titulo_para_comparacao)
 
 
 # ----------------- VERIFICAÇÃO DE CONTEÚDO -----------------
-def verificar_secoes_e_conteudo(texto_ref, texto_belfar, tipo_bula):
+def verificar_secoes_e_conteudo(contexto_ref, contexto_belfar, tipo_bula):
     secoes_esperadas = obter_secoes_por_tipo(tipo_bula)
     ignore_comparison = [s.upper() for s in obter_secoes_ignorar_comparacao()]
     secoes_faltantes, diferencas_conteudo, similaridades_secoes, diferencas_titulos = [], [], [], []
     secoes_analisadas = []
 
-    mapa_ref, _, linhas_ref = mapear_secoes_deterministico(texto_ref, secoes_esperadas)
-    mapa_belfar, _, linhas_belfar = mapear_secoes_deterministico(texto_belfar, secoes_esperadas)
-
     for sec in secoes_esperadas:
-        encontrou_ref, titulo_ref, conteudo_ref = obter_dados_secao_v2(sec, mapa_ref, linhas_ref, tipo_bula)
-        encontrou_belfar, titulo_belfar, conteudo_belfar = obter_dados_secao_v2(sec, mapa_belfar, linhas_belfar,
-                                                                                tipo_bula)
+        encontrou_ref, titulo_ref, conteudo_ref = contexto_ref.secao(sec)
+        encontrou_belfar, titulo_belfar, conteudo_belfar = contexto_belfar.secao(sec)
 
         if not encontrou_ref and not encontrou_belfar:
             secoes_faltantes.append(sec)
@@ -362,23 +337,22 @@ def verificar_secoes_e_conteudo(texto_ref, texto_belfar, tipo_bula):
 
 
 # ----------------- ORTOGRAFIA & DIFF -----------------
-def checar_ortografia_inteligente(texto_para_checar, texto_referencia, tipo_bula):
-    if not texto_para_checar: return []
+def checar_ortografia_inteligente(contexto, contexto_referencia, tipo_bula):
+    if not contexto.texto: return []
     try:
         secoes_ignorar = [s.upper() for s in obter_secoes_ignorar_ortografia()]
         secoes_todas = obter_secoes_por_tipo(tipo_bula)
         texto_filtrado = []
-        mapa, _, linhas = mapear_secoes_deterministico(texto_para_checar, secoes_todas)
         for sec in secoes_todas:
             if sec.upper() in secoes_ignorar: continue
-            enc, _, cont = obter_dados_secao_v2(sec, mapa, linhas, tipo_bula)
+            enc, _, cont = contexto.secao(sec)
             if enc and cont: texto_filtrado.append(cont)
         texto_final = '\n'.join(texto_filtrado)
         if not texto_final: return []
         spell = SpellChecker(language='pt')
         palavras_ignorar = {"alair", "belfar", "peticionamento", "urotrobel", "nebacetin", "neomicina",
                             "bacitracina"}
-        vocab_ref_raw = set(re.findall(r'\b[a-zA-ZÀ-ÖØ-öø-ÿ0-9\-]+\b', (texto_referencia or "").lower()))
+        vocab_ref_raw = contexto_referencia.vocabulario
         spell.word_frequency.load_words(vocab_ref_raw.union(palavras_ignorar))
         entidades = set()
         if nlp:
@@ -388,7 +362,7 @@ def checar_ortografia_inteligente(texto_para_checar, texto_referencia, tipo_bula
         palavras = [p for p in palavras if len(p) > 2]
         possiveis_erros = set(spell.unknown([p.lower() for p in palavras]))
         erros_filtrados = []
-        vocab_norm = set(normalizar_texto(w) for w in vocab_ref_raw)
+        vocab_norm = contexto_referencia.vocabulario_normalizado
         for e in possiveis_erros:
             e_raw = e.lower()
             e_norm = normalizar_texto(e_raw)
@@ -400,31 +374,19 @@ def checar_ortografia_inteligente(texto_para_checar, texto_referencia, tipo_bula
         return []
 
 
-def marcar_diferencas_palavra_por_palavra(texto_ref, texto_belfar, eh_referencia):
-    def tokenizar(txt): return re.findall(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]', txt or "", re.UNICODE)
-
-    def norm(tok):
-        if tok == '\n': return ' '
-        if re.match(r'[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+$', tok): return normalizar_texto(tok)
-        return tok
-
-    ref_tokens = tokenizar(texto_ref)
-    bel_tokens = tokenizar(texto_belfar)
-    ref_norm = [norm(t) for t in ref_tokens]
-    bel_norm = [norm(t) for t in bel_tokens]
-    matcher = difflib.SequenceMatcher(None, ref_norm, bel_norm, autojunk=False)
-    indices = set()
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag != 'equal': indices.update(range(i1, i2) if eh_referencia else range(j1, j2))
-    tokens = ref_tokens if eh_referencia else bel_tokens
-    marcado = []
-    for idx, tok in enumerate(tokens):
-        if tok == '\n':
-            marcado.append('<br>'); continue
-        if idx in indices and tok.strip() != '':
-            marcado.append(f"<mark class='diff'>{tok}</mark>")
-        else:
-            marcado.append(tok)
+# ----------------- DIFF PALAVRA A PALAVRA (ver diff_utils) -----------------
+def tokenizar_diff(txt): return re.findall(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]', txt or "", re.UNICODE)
+
+
+def normalizar_token(tok):
+    if tok == '\n': return ' '
+    if re.match(r'[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+$', tok): return normalizar_texto(tok)
+    return tok
+
+
+def renderizar_diferencas(diff, eh_referencia):
+    """HTML de um lado do diff da seção (diff_utils.comparar), com as diferenças marcadas."""
+    marcado = marcar_tokens(diff, eh_referencia)
     resultado = ""
     for i, tok in enumerate(marcado):
         if i == 0:
@@ -443,7 +405,9 @@ def marcar_diferencas_palavra_por_palavra(texto_ref, texto_belfar, eh_referencia
 
 
 # ----------------- CONSTRUÇÃO HTML -----------------
-def construir_html_secoes(secoes_analisadas, erros_ortograficos, tipo_bula, eh_referencia=False):
+def construir_html_secoes(secoes_analisadas, diffs, erros_ortograficos, tipo_bula, contexto, eh_referencia=False):
+    """`diffs`: {seção: DiffSecao} de comparar_secoes, o mesmo para as duas colunas;
+    `contexto`: o do documento deste lado (o conteúdo vem dele)."""
     html_map = {}
     prefixos_paciente = {
         "PARA QUE ESTE MEDICAMENTO É INDICADO": "1.", "COMO ESTE MEDICAMENTO FUNCIONA?": "2.",
@@ -468,6 +432,8 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, tipo_bula, eh_r
             mapa_erros[pattern] = r"<mark class='ort'>\1</mark>"
     regex_anvisa = r"((?:aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*[\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
     anvisa_pattern = re.compile(regex_anvisa, re.IGNORECASE)
+    # Sem as frases da ANVISA no documento, nenhuma seção dele tem a data para destacar.
+    tem_anvisa = contexto.contar_marcadores(MARCADORES_ANVISA) > 0
     for diff in secoes_analisadas:
         secao_canonico = diff['secao']
         prefixo = prefixos_map.get(secao_canonico, "")
@@ -484,31 +450,29 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, tipo_bula, eh_r
         if diff.get('ignorada', False):
             conteudo_html = (conteudo or "").replace('\n', '<br>')
         else:
-            conteudo_html = marcar_diferencas_palavra_por_palavra(diff.get('conteudo_ref') or "",
-                                                                  diff.get('conteudo_belfar') or "", eh_referencia)
+            conteudo_html = renderizar_diferencas(diffs[secao_canonico], eh_referencia)
         if not eh_referencia and not diff.get('ignorada', False):
             for pat, repl in mapa_erros.items():
                 try:
                     conteudo_html = re.sub(pat, repl, conteudo_html, flags=re.IGNORECASE)
                 except:
                     pass
-        conteudo_html = anvisa_pattern.sub(r"<mark class='anvisa'>\1</mark>", conteudo_html)
+        if tem_anvisa: conteudo_html = anvisa_pattern.sub(r"<mark class='anvisa'>\1</mark>", conteudo_html)
         anchor_id = _create_anchor_id(secao_canonico, "ref" if eh_referencia else "bel")
         html_map[secao_canonico] = f"<div id='{anchor_id}' style='scroll-margin-top: 20px;'>{title_html}<div style='margin-top:6px;'>{conteudo_html}</div></div>"
     return html_map
 
 
-def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_bula):
+def gerar_relatorio_final(contexto_ref, contexto_belfar, nome_ref, nome_belfar, tipo_bula):
     st.header("Relatório de Auditoria Inteligente")
-    rx_anvisa = r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
-    m_ref = re.search(rx_anvisa, texto_ref or "", re.IGNORECASE)
-    m_bel = re.search(rx_anvisa, texto_belfar or "", re.IGNORECASE)
+    m_ref = contexto_ref.buscar_marcador(RX_ANVISA)
+    m_bel = contexto_belfar.buscar_marcador(RX_ANVISA)
     data_ref = m_ref.group(2).strip() if m_ref else "Não encontrada"
     data_bel = m_bel.group(2).strip() if m_bel else "Não encontrada"
 
     secoes_faltantes, diferencas_conteudo, similaridades, diferencas_titulos, secoes_analisadas = verificar_secoes_e_conteudo(
-        texto_ref, texto_belfar, tipo_bula)
-    erros = checar_ortografia_inteligente(texto_belfar, texto_ref, tipo_bula)
+        contexto_ref, contexto_belfar, tipo_bula)
+    erros = checar_ortografia_inteligente(contexto_belfar, contexto_ref, tipo_bula)
     score = sum(similaridades) / len(similaridades) if similaridades else 100.0
 
     c1, c2, c3, c4 = st.columns(4)
@@ -537,8 +501,9 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     }
     prefixos_map = prefixos_paciente if tipo_bula == "Paciente" else prefixos_profissional
 
-    html_ref = construir_html_secoes(secoes_analisadas, [], tipo_bula, True)
-    html_bel = construir_html_secoes(secoes_analisadas, erros, tipo_bula, False)
+    diffs = comparar_secoes(secoes_analisadas, tokenizar_diff, normalizar_token)
+    html_ref = construir_html_secoes(secoes_analisadas, diffs, [], tipo_bula, contexto_ref, True)
+    html_bel = construir_html_secoes(secoes_analisadas, diffs, erros, tipo_bula, contexto_belfar, False)
 
     for diff in secoes_analisadas:
         sec = diff['secao']
@@ -572,48 +537,20 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     cr, cb = st.columns(2, gap="large")
     with cr: st.markdown(f"<div class='bula-box-full'>{h_r}</div>", unsafe_allow_html=True)
     with cb: st.markdown(f"<div class='bula-box-full'>{h_b}</div>", unsafe_allow_html=True)
+    registrar_estatisticas(ref=contexto_ref, belfar=contexto_belfar)
 
 
 # ----------------- VALIDAÇÃO DE TIPO (CORRIGIDA) -----------------
-def detectar_tipo_arquivo_por_score(texto):
+def detectar_tipo_arquivo_por_score(contexto):
     """
-    Conta quantas seções de Paciente vs Profissional existem no texto.
+    Conta quantas seções de Paciente vs Profissional existem no texto do contexto.
     Retorna 'Paciente', 'Profissional' ou 'Indeterminado'.
     """
-    if not texto: return "Indeterminado"
-
-    # Seções exclusivas e fortes de Paciente
-    titulos_paciente = [
-        "como este medicamento funciona",
-        "o que devo saber antes de usar",
-        "onde como e por quanto tempo posso guardar",
-        "o que devo fazer quando eu me esquecer",
-        "quais os males que este medicamento pode causar",
-        "o que fazer se alguem usar uma quantidade maior"
-    ]
-
-    # Seções exclusivas e fortes de Profissional
-    titulos_profissional = [
-        "resultados de eficacia",
-        "caracteristicas farmacologicas",
-        "interacoes medicamentosas",
-        "posologia e modo de usar",
-        "reacoes adversas",
-        "superdose",
-        "propriedades farmacocinetica"
-    ]
-
-    t_norm = normalizar_texto(texto)
-
-    score_pac = 0
-    for t in titulos_paciente:
-        if t in t_norm:
-            score_pac += 1
-
-    score_prof = 0
-    for t in titulos_profissional:
-        if t in t_norm:
-            score_prof += 1
+    if not contexto.texto: return "Indeterminado"
+
+    # Seções exclusivas e fortes de cada tipo (ver marcadores_utils; uma varredura por documento)
+    score_pac = contexto.contar_marcadores(MARCADORES_PACIENTE)
+    score_prof = contexto.contar_marcadores(MARCADORES_PROFISSIONAL)
 
     # Depuração interna (opcional, pode remover print em produção)
     # print(f"Score Pac: {score_pac} | Score Prof: {score_prof}")
@@ -647,16 +584,18 @@ if st.button("🔍 Iniciar Auditoria Completa", use_container_width=True, type="
     else:
         with st.spinner("Lendo arquivos e validando estrutura..."):
             # 1. Extração
-            texto_ref, erro_ref = extrair_texto(pdf_ref, 'docx' if pdf_ref.name.endswith('.docx') else 'pdf')
-            texto_belfar, erro_belfar = extrair_texto(pdf_belfar,
-                                                      'docx' if pdf_belfar.name.endswith('.docx') else 'pdf')
+            texto_ref, erro_ref, titulos_ref = extrair_texto(pdf_ref, 'docx' if pdf_ref.name.endswith('.docx') else 'pdf')
+            texto_belfar, erro_belfar, titulos_belfar = extrair_texto(
+                pdf_belfar, 'docx' if pdf_belfar.name.endswith('.docx') else 'pdf')
 
             if erro_ref or erro_belfar:
                 st.error(f"Erro de leitura: {erro_ref or erro_belfar}")
             else:
-                # 2. Detecção Automática do Tipo
-                detectado_ref = detectar_tipo_arquivo_por_score(texto_ref)
-                detectado_bel = detectar_tipo_arquivo_por_score(texto_belfar)
+                # 2. Detecção Automática do Tipo (o contexto segue para o relatório)
+                ctx_ref = contexto_documento(texto_ref, tipo_bula_selecionado, titulos_ref)
+                ctx_belfar = contexto_documento(texto_belfar, tipo_bula_selecionado, titulos_belfar)
+                detectado_ref = detectar_tipo_arquivo_por_score(ctx_ref)
+                detectado_bel = detectar_tipo_arquivo_por_score(ctx_belfar)
 
                 erro_validacao = False
 
@@ -677,10 +616,9 @@ if st.button("🔍 Iniciar Auditoria Completa", use_container_width=True, type="
                         "⛔ A comparação foi bloqueada. Verifique os arquivos e o tipo selecionado e tente novamente.")
                 else:
                     # 3. Processamento
-                    texto_ref = truncar_apos_anvisa(texto_ref)
-                    texto_belfar = truncar_apos_anvisa(texto_belfar)
-                    gerar_relatorio_final(texto_ref, texto_belfar, pdf_ref.name, pdf_belfar.name,
-                                          tipo_bula_selecionado)
+                    ctx_ref = truncar_apos_anvisa(ctx_ref, tipo_bula_selecionado)
+                    ctx_belfar = truncar_apos_anvisa(ctx_belfar, tipo_bula_selecionado)
+                    gerar_relatorio_final(ctx_ref, ctx_belfar, pdf_ref.name, pdf_belfar.name, tipo_bula_selecionado)
 
 st.divider()
 st.caption("Sistema de Auditoria de Bulas v21.9 | Bloqueio de execução por tipo incorreto.")
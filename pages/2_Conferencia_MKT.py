@@ -8,16 +8,25 @@
 #   continuando a busca pelo título real.
 
 import re
-import difflib
-import unicodedata
-import io
 import streamlit as st
-import fitz  # PyMuPDF
-import docx
 import spacy
-from thefuzz import fuzz
 from spellchecker import SpellChecker
 from collections import namedtuple
+from pdf_utils import extrair_pdf_com_titulos, MODO_COLUNAS
+from docx_utils import texto_docx_com_titulos
+from cache_utils import ler_cache, gravar_cache
+from sessao_utils import SessaoDocumento
+from lixo_utils import aplicar_regras, versao_regras
+from texto_utils import normalizar_texto, normalizar_titulo_para_comparacao
+from pontuacao_utils import melhores_titulos
+from secoes_utils import matriz_regras, alinhar, montar_mapa, segmentar
+from marcadores_utils import contar_marcadores, MARCADORES_ANVISA
+from contexto_utils import ContextoDocumento, registrar_estatisticas
+from diff_utils import comparar_secoes, marcar_tokens
+from titulos_utils import forcar_titulos
+from blocos_utils import realocar_blocos
+from limpeza_utils import (executar_limpeza, linhas_de, etapa_texto, etapa_paragrafos, ETAPA_INVISIVEIS_NBSP,
+                           ETAPA_QUEBRAS, ETAPA_NUMEROS_SOLTOS, ETAPA_SUBLINHADOS, ETAPA_LINHAS_VAZIAS, ETAPA_APARAR)
 
 # ----------------- UI / CSS -----------------
 st.set_page_config(layout="wide", page_title="Auditoria de Bulas", page_icon="🔬")
@@ -88,28 +97,23 @@ def carregar_modelo_spacy():
 nlp = carregar_modelo_spacy()
 
 # ----------------- UTILITÁRIOS DE TEXTO -----------------
-def normalizar_texto(texto):
-    if not isinstance(texto, str): return ""
-    texto = texto.replace('\n', ' ')
-    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-    texto = re.sub(r'[^\w\s]', '', texto)
-    texto = ' '.join(texto.split())
-    return texto.lower()
-
-def normalizar_titulo_para_comparacao(texto):
-    texto_norm = normalizar_texto(texto or "")
-    texto_norm = re.sub(r'^\d+\s*[\.\-)]*\s*', '', texto_norm).strip()
-    return texto_norm
-
-def truncar_apos_anvisa(texto):
-    if not isinstance(texto, str): return texto
-    regex_anvisa = r"((?:aprovad[ao][\s\n]+pela[\s\n]+anvisa[\s\n]+em|data[\s\n]+de[\s\n]+aprova\w+[\s\n]+na[\s\n]+anvisa:)[\s\n]*([\d]{1,2}\s*/\s*[\d]{1,2}\s*/\s*[\d]{2,4}))"
-    match = re.search(regex_anvisa, texto, re.IGNORECASE | re.DOTALL)
-    if not match: return texto
+# normalizar_texto / normalizar_titulo_para_comparacao: texto_utils (cache do processo)
+
+RX_ANVISA = re.compile(r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})",
+                       re.IGNORECASE)
+RX_ANVISA_CORTE = re.compile(r"((?:aprovad[ao][\s\n]+pela[\s\n]+anvisa[\s\n]+em|data[\s\n]+de[\s\n]+aprova\w+[\s\n]+na[\s\n]+anvisa:)[\s\n]*([\d]{1,2}\s*/\s*[\d]{1,2}\s*/\s*[\d]{2,4}))",
+                             re.IGNORECASE | re.DOTALL)
+
+def truncar_apos_anvisa(contexto):
+    """Contexto do texto cortado logo após a data da ANVISA (sem corte, o mesmo)."""
+    match = contexto.buscar_marcador(RX_ANVISA_CORTE)
+    if not match: return contexto
+    texto = contexto.texto
     cut_off_position = match.end(1)
     pos_match = re.search(r'^\s*\.', texto[cut_off_position:], re.IGNORECASE)
     if pos_match: cut_off_position += pos_match.end()
-    return texto[:cut_off_position]
+    if cut_off_position >= len(texto): return contexto
+    return contexto_documento(texto[:cut_off_position], contexto.titulos)
 
 def _create_anchor_id(secao_nome, prefix):
     norm = normalizar_texto(secao_nome)
@@ -118,166 +122,68 @@ def _create_anchor_id(secao_nome, prefix):
 
 # ----------------- FILTRO DE LIXO -----------------
 def limpar_lixo_grafico(texto):
-    padroes_lixo = [
-        r'\b\d{1,3}\s*[,.]\s*\d{0,2}\s*cm\b', 
-        r'\b\d{1,3}\s*[,.]\s*\d{0,2}\s*mm\b',
-        r'^\s*Bula\s*ao\s*Paciente\s*$',
-        r'^\s*Página\s*\d+\s*de\s*\d+\s*$',
-        r'^\s*VERSO\s*$', r'^\s*FRENTE\s*$',
-        r'^\s*ALTEFAR\s*$', 
-        r'.*31\s*2105.*', r'.*w\s*Roman.*', r'.*Negrito\.\s*Corpo\s*14.*',
-        r'AZOLINA:', r'contato:', r'artes\s*@\s*belfar\.com\.br',
-        r'.*Frente\s*/\s*Verso.*', r'.*-\s*\.\s*Cor.*', r'.*Cor:\s*Preta.*',
-        r'.*Papel:.*', r'.*Ap\s*\d+gr.*', r'.*da bula:.*', r'.*AFAZOLINA_BUL.*',
-        r'Tipologia', r'Dimensão', r'Dimensões', r'Formato',
-        r'Times New Roman', r'Myriad Pro', r'Arial', r'Helvética',
-        r'Cores?:', r'Preto', r'Black', r'Cyan', r'Magenta', r'Yellow', r'Pantone',
-        r'^\s*BELFAR\s*$', r'^\s*PHARMA\s*$', r'CNPJ:?', r'SAC:?', r'Farm\. Resp\.?:?',
-        r'Cód\.?:?', r'Ref\.?:?', r'Laetus', r'Pharmacode',
-        r'\b\d{6,}\s*-\s*\d{2}/\d{2}\b', r'^\s*[\w_]*BUL\d+V\d+[\w_]*\s*$',
-        r'.*Impress[ãa]o.*'
-    ]
-    texto_limpo = texto
-    for p in padroes_lixo:
-        texto_limpo = re.sub(p, ' ', texto_limpo, flags=re.IGNORECASE | re.MULTILINE)
-    return texto_limpo
+    # Regras em regras_lixo.json (conjunto "pag2"), compiladas numa varredura só (ver lixo_utils).
+    return aplicar_regras(texto, "pag2")
 
 # ----------------- CORREÇÃO DE ESTRUTURA E ORDEM -----------------
-def corrigir_ordem_blocos_especificos(texto):
-    padrao_bloco = r'(Informações\s*ao\s*paciente\s*com\s*pressão\s*alta.*?internação\s*hospitalar\s*por\s*insuficiência\s*cardí?aca\.?)'
-    match_bloco = re.search(padrao_bloco, texto, re.IGNORECASE | re.DOTALL)
-    match_sec3 = re.search(r'3\.\s*QUANDO\s*NÃO\s*DEVO\s*USAR', texto, re.IGNORECASE)
-    
-    if match_bloco and match_sec3:
-        if match_sec3.start() < match_bloco.start(): 
-            bloco_content = match_bloco.group(1)
-            texto_limpo = texto[:match_bloco.start()] + texto[match_bloco.end():] 
-            match_sec3_novo = re.search(r'3\.\s*QUANDO\s*NÃO\s*DEVO\s*USAR', texto_limpo, re.IGNORECASE)
-            if match_sec3_novo:
-                pos_insercao = match_sec3_novo.start()
-                novo_texto = texto_limpo[:pos_insercao] + "\n" + bloco_content + "\n\n" + texto_limpo[pos_insercao:]
-                return novo_texto
-    return texto
-
-def corrigir_deslocamento_interacoes(texto):
-    padrao_interacoes = r'(Interações\s*medicamentosas:.*?Pode\s*ser\s*perigoso\s*para\s*a\s*sua\s*saúde\.?)'
-    match_inter = re.search(padrao_interacoes, texto, re.IGNORECASE | re.DOTALL)
-    match_sec5 = re.search(r'5\.\s*ONDE', texto, re.IGNORECASE)
-    if match_inter and match_sec5:
-        if match_inter.start() > match_sec5.start():
-            bloco_inter = match_inter.group(1)
-            texto_sem_inter = texto[:match_inter.start()] + texto[match_inter.end():]
-            match_sec5_novo = re.search(r'5\.\s*ONDE', texto_sem_inter, re.IGNORECASE)
-            if match_sec5_novo:
-                pos = match_sec5_novo.start()
-                texto_final = texto_sem_inter[:pos] + "\n" + bloco_inter + "\n\n" + texto_sem_inter[pos:]
-                return texto_final
-    return texto
-
 def forcar_titulos_bula(texto):
-    substituicoes = [
-        (r"(?:1\.?\s*)?PARA\s*QUE\s*ESTE\s*MEDICAMENTO\s*[\s\S]{0,100}?INDICADO\??", r"\n1. PARA QUE ESTE MEDICAMENTO É INDICADO?\n"),
-        (r"(?:2\.?\s*)?COMO\s*ESTE\s*MEDICAMENTO\s*[\s\S]{0,100}?FUNCIONA\??", r"\n2. COMO ESTE MEDICAMENTO FUNCIONA?\n"),
-        (r"(?:3\.?\s*)?QUANDO\s*N[ÃA]O\s*DEVO\s*USAR\s*[\s\S]{0,100}?MEDICAMENTO\??", r"\n3. QUANDO NÃO DEVO USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:4\.?\s*)?O\s*QUE\s*DEVO\s*SABER[\s\S]{1,100}?USAR[\s\S]{1,100}?MEDICAMENTO\??", r"\n4. O QUE DEVO SABER ANTES DE USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:5\.?\s*)?ONDE\s*,?\s*COMO\s*E\s*POR\s*QUANTO[\s\S]{1,100}?GUARDAR[\s\S]{1,100}?MEDICAMENTO\??", r"\n5. ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR ESTE MEDICAMENTO?\n"),
-        (r"(?:6\.?\s*)?COMO\s*DEVO\s*USAR\s*ESTE\s*[\s\S]{0,100}?MEDICAMENTO\??", r"\n6. COMO DEVO USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:7\.?\s*)?O\s*QUE\s*DEVO\s*FAZER[\s\S]{0,200}?MEDICAMENTO\??", r"\n7. O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:8\.?\s*)?QUAIS\s*OS\s*MALES[\s\S]{0,200}?CAUSAR\??", r"\n8. QUAIS OS MALES QUE ESTE MEDICAMENTO PODE CAUSAR?\n"),
-        (r"(?:9\.?\s*)?O\s*QUE\s*FAZER\s*SE\s*ALGU[EÉ]M\s*USAR[\s\S]{0,400}?MEDICAMENTO\??", r"\n9. O QUE FAZER SE ALGUEM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA DESTE MEDICAMENTO?\n"),
-    ]
-    texto_arrumado = texto
-    for padrao, substituto in substituicoes:
-        texto_arrumado = re.sub(padrao, substituto, texto_arrumado, flags=re.IGNORECASE | re.DOTALL)
-    return texto_arrumado
-
-# ----------------- EXTRAÇÃO INTELIGENTE (COLUNAS v89) -----------------
-def organizar_por_colunas(page):
-    blocks = page.get_text("blocks", sort=False)
-    text_blocks = [b for b in blocks if b[6] == 0]
-    if not text_blocks: return ""
-    text_blocks.sort(key=lambda b: b[0])
-    columns = []
-    TOLERANCIA_X = 100 
-    for b in text_blocks:
-        placed = False
-        for col in columns:
-            avg_x = sum(cb[0] for cb in col) / len(col)
-            if abs(b[0] - avg_x) < TOLERANCIA_X:
-                col.append(b); placed = True; break
-        if not placed: columns.append([b])
-    columns.sort(key=lambda c: sum(b[0] for b in c)/len(c))
-    final_text = ""
-    for col in columns:
-        col.sort(key=lambda b: b[1])
-        for b in col: final_text += b[4] + "\n"
-    return final_text
+    return forcar_titulos(texto)
+
+# ----------------- EXTRAÇÃO INTELIGENTE (COLUNAS, ver layout_utils) -----------------
+# Faz parte da chave do cache de extração: altere ao mudar limpeza/títulos/reordenação.
+# As regras de lixo (regras_lixo.json) entram na chave pelo digest delas (lixo_utils.versao_regras).
+VERSAO_REGRAS_LIMPEZA = "v107.5"
+
+# Limpeza em fluxo (ver limpeza_utils); as regras que cruzam linhas são etapas de texto inteiro.
+ETAPAS_LIMPEZA = [
+    ETAPA_INVISIVEIS_NBSP, ETAPA_QUEBRAS,
+    etapa_texto(limpar_lixo_grafico), etapa_texto(forcar_titulos_bula),
+    ETAPA_NUMEROS_SOLTOS, ETAPA_SUBLINHADOS, ETAPA_LINHAS_VAZIAS, ETAPA_APARAR,
+]
 
 def extrair_texto(arquivo, tipo_arquivo):
-    if arquivo is None: return "", f"Arquivo não enviado."
+    """(texto, erro, títulos): os títulos são dicas tipográficas (PDF) ou de estilo (DOCX)."""
+    if arquivo is None: return "", f"Arquivo não enviado.", []
     try:
-        arquivo.seek(0)
-        texto_completo = ""
-        if tipo_arquivo == 'pdf':
-            with fitz.open(stream=arquivo.read(), filetype="pdf") as doc:
-                for page in doc:
-                    texto_completo += organizar_por_colunas(page)
-        elif tipo_arquivo == 'docx':
-            doc = docx.Document(arquivo)
-            texto_completo = "\n".join([p.text for p in doc.paragraphs])
-
-        if texto_completo:
-            invis = ['\u00AD', '\u200B', '\u200C', '\u200D', '\uFEFF']
-            for c in invis: texto_completo = texto_completo.replace(c, '')
-            texto_completo = texto_completo.replace('\r\n', '\n').replace('\r', '\n').replace('\u00A0', ' ')
-            texto_completo = limpar_lixo_grafico(texto_completo)
-            texto_completo = forcar_titulos_bula(texto_completo)
-            texto_completo = corrigir_ordem_blocos_especificos(texto_completo)
-            texto_completo = corrigir_deslocamento_interacoes(texto_completo)
-            texto_completo = re.sub(r'(?m)^\s*\d{1,2}\.\s*$', '', texto_completo)
-            texto_completo = re.sub(r'(?m)^_+$', '', texto_completo)
-            texto_completo = re.sub(r'\n{3,}', '\n\n', texto_completo)
-            return texto_completo.strip(), None
+        with SessaoDocumento(arquivo, tipo_arquivo) as sessao:
+            chave = sessao.chave_cache("pag2", tipo_arquivo, VERSAO_REGRAS_LIMPEZA, versao_regras("pag2"))
+            em_cache = ler_cache(chave)
+            if em_cache is not None: return em_cache["texto"], None, em_cache["titulos"]
+            texto_completo, paginas, titulos = "", [], []
+            if tipo_arquivo == 'pdf':
+                paginas, titulos = extrair_pdf_com_titulos(sessao.doc, MODO_COLUNAS)
+            elif tipo_arquivo == 'docx':
+                # Em fluxo, com as tabelas (composição, posologia) na ordem do documento.
+                bruto, titulos = texto_docx_com_titulos(sessao.caminho)
+                paginas = [bruto]
+
+        if any(paginas):
+            texto_completo, _ = executar_limpeza(linhas_de(paginas), ETAPAS_LIMPEZA)
+            gravar_cache(chave, {"texto": texto_completo, "titulos": titulos})
+        return texto_completo, None, titulos
     except Exception as e:
-        return "", f"Erro: {e}"
+        return "", f"Erro: {e}", []
 
 # ----------------- RECONSTRUÇÃO DE PARÁGRAFOS -----------------
-def is_titulo_secao(linha):
+def is_titulo_secao(linha, dicas=None):
+    """`dicas`: títulos da extração já normalizados (normalizar_titulo_para_comparacao)."""
     ln = linha.strip()
     if len(ln) < 4: return False
     first = ln.split('\n')[0]
+    if dicas and normalizar_titulo_para_comparacao(first) in dicas: return True
     if re.match(r'^\d+\s*[\.\-)]*\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]', first): return True
     if first.isupper() and not first.endswith('.') and len(first) > 4: return True
     return False
 
-def reconstruir_paragrafos(texto):
+PADRAO_TABELA = re.compile(r'\.{3,}|_{3,}|q\.s\.p|^\s*[-•]\s+')
+
+def reconstruir_paragrafos(texto, titulos=None):
     if not texto: return ""
-    texto = forcar_titulos_bula(texto)
-    linhas = texto.split('\n')
-    linhas_out = []
-    buffer = ""
-    padrao_tabela = re.compile(r'\.{3,}|_{3,}|q\.s\.p|^\s*[-•]\s+')
-    for linha in linhas:
-        l_strip = linha.strip()
-        if not l_strip or (len(l_strip) < 3 and not re.match(r'^\d+\.?$', l_strip)):
-            if buffer: linhas_out.append(buffer); buffer = ""
-            if not linhas_out or linhas_out[-1] != "": linhas_out.append("")
-            continue
-        if is_titulo_secao(l_strip):
-            if buffer: linhas_out.append(buffer); buffer = ""
-            linhas_out.append(l_strip)
-            continue
-        if padrao_tabela.search(l_strip):
-            if buffer: linhas_out.append(buffer); buffer = ""
-            linhas_out.append(l_strip)
-            continue
-        if buffer:
-            if buffer.endswith('-'): buffer = buffer[:-1] + l_strip
-            elif not buffer.endswith(('.', ':', '!', '?')): buffer += " " + l_strip
-            else: linhas_out.append(buffer); buffer = l_strip
-        else: buffer = l_strip
-    if buffer: linhas_out.append(buffer)
-    return "\n".join(linhas_out)
+    dicas = {normalizar_titulo_para_comparacao(t) for t in titulos or []}
+    # Títulos e linhas de tabela ficam sozinhos; o resto é remontado em parágrafos.
+    etapas = [etapa_texto(forcar_titulos_bula),
+              etapa_paragrafos(lambda linha: is_titulo_secao(linha, dicas), PADRAO_TABELA)]
+    return executar_limpeza(texto, etapas)[0]
 
 # ----------------- CONFIGURAÇÃO DE SEÇÕES -----------------
 def obter_secoes_por_tipo():
@@ -311,25 +217,35 @@ def obter_secoes_ignorar_ortografia(): return ["COMPOSIÇÃO", "DIZERES LEGAIS"]
 # ----------------- MAPEAMENTO (COM DETECÇÃO DE FALSO TÍTULO) -----------------
 HeadingCandidate = namedtuple("HeadingCandidate", ["index", "raw", "norm", "numeric", "matched_canon", "score"])
 
-def construir_heading_candidates(linhas, secoes_esperadas, aliases):
+def construir_heading_candidates(linhas, secoes_esperadas, aliases, titulos=None):
+    """`titulos`: dicas da extração. Com dicas, linhas que não são título nem pela tipografia
+    nem pela caixa alta não passam pela pontuação fuzzy (só pelo teste de substring)."""
+    dicas = {normalizar_titulo_para_comparacao(t) for t in titulos or []}
     titulos_possiveis = {s: s for s in secoes_esperadas}
     for a, c in aliases.items():
         if c in secoes_esperadas: titulos_possiveis[a] = c
     titulos_norm = {k: normalizar_titulo_para_comparacao(k) for k in titulos_possiveis.keys()}
-    candidates = []
+    # Pontuação em lote (pontuacao_utils): só os títulos com forma normalizada, na ordem do
+    # dicionário — no empate vale o primeiro.
+    canon_pontuados = [c for k, c in titulos_possiveis.items() if titulos_norm[k]]
+    norm_pontuados = [titulos_norm[k] for k in titulos_possiveis if titulos_norm[k]]
+    linhas_validas = []  # (índice, raw, norm, numeric, pontuar)
     for i, linha in enumerate(linhas):
         raw = (linha or "").strip()
         if not raw: continue
         norm = normalizar_titulo_para_comparacao(raw)
-        best_score = 0; best_canon = None
         mnum = re.match(r'^\s*(\d{1,2})\s*[\.\)\-]?\s*(.*)$', raw)
         numeric = int(mnum.group(1)) if mnum else None
-        for t_possivel, t_canon in titulos_possiveis.items():
-            t_norm = titulos_norm.get(t_possivel, "")
-            if not t_norm: continue
-            score = fuzz.token_set_ratio(t_norm, norm)
-            if t_norm in norm: score = max(score, 95)
-            if score > best_score: best_score = score; best_canon = t_canon
+        letras = re.findall(r'[A-Za-zÀ-ÖØ-öø-ÿ]', raw)
+        caixa_alta = letras and sum(1 for ch in letras if ch.isupper()) / len(letras) >= 0.6
+        pontuar = not dicas or numeric is not None or norm in dicas or (caixa_alta and len(raw.split()) <= 10)
+        linhas_validas.append((i, raw, norm, numeric, pontuar))
+    # Numeradas são candidatas de qualquer jeito: precisam da nota exata.
+    notas, melhores = melhores_titulos(norm_pontuados, [l[2] for l in linhas_validas],
+                                       [l[4] for l in linhas_validas], [l[3] is not None for l in linhas_validas])
+    candidates = []
+    for (i, raw, norm, numeric, _), best_score, k in zip(linhas_validas, notas, melhores):
+        best_canon = canon_pontuados[k] if k >= 0 else None
         is_candidate = False
         if numeric is not None: is_candidate = True
         elif best_score >= 88: is_candidate = True
@@ -338,13 +254,9 @@ def construir_heading_candidates(linhas, secoes_esperadas, aliases):
     unique = {c.index: c for c in candidates}
     return sorted(unique.values(), key=lambda x: x.index)
 
-def mapear_secoes_deterministico(texto_completo, secoes_esperadas):
-    linhas = texto_completo.split('\n')
-    aliases = obter_aliases_secao()
-    candidates = construir_heading_candidates(linhas, secoes_esperadas, aliases)
-    mapa = []
-    last_idx = -1
-    
+def mapear_secoes_deterministico(contexto, secoes_esperadas):
+    linhas, candidates = contexto.linhas, contexto.candidatos
+
     def get_canonical_number(sec_name):
         match = re.search(r'^(\d{1,2})\.', sec_name)
         return int(match.group(1)) if match else None
@@ -368,102 +280,51 @@ def mapear_secoes_deterministico(texto_completo, secoes_esperadas):
                 return False # É falso positivo (referência cruzada)
         return True
 
-    for sec in secoes_esperadas:
-        sec_norm = normalizar_titulo_para_comparacao(sec)
-        canon_num = get_canonical_number(sec) 
-        found = None
-        
-        for c in candidates:
-            if c.index <= last_idx: continue
-            if c.matched_canon == sec:
-                if validar_candidato(c, canon_num): 
-                    if validar_falso_positivo(c.index):
-                        found = c; break
-        
-        if not found and canon_num is not None:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if c.numeric == canon_num: 
-                    if validar_falso_positivo(c.index):
-                        found = c; break
-        
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if sec_norm and sec_norm in c.norm:
-                    if validar_candidato(c, canon_num): 
-                        if validar_falso_positivo(c.index):
-                            found = c; break
-        
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if fuzz.token_set_ratio(sec_norm, c.norm) >= 92:
-                    if validar_candidato(c, canon_num): 
-                        if validar_falso_positivo(c.index):
-                            found = c; break
-        
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                match_canon = (c.matched_canon == sec)
-                match_num = (canon_num is not None and c.numeric == canon_num)
-                match_text = (sec_norm and sec_norm in c.norm)
-                if match_canon or match_num or match_text:
-                    if validar_candidato(c, canon_num):
-                        if match_num or c.score > 95: 
-                            if validar_falso_positivo(c.index):
-                                found = c; break
-        
-        if found:
-            mapa.append({'canonico': sec, 'titulo_encontrado': found.raw, 'linha_inicio': found.index, 'score': found.score})
-            if found.index > last_idx: last_idx = found.index
-                
-    mapa = sorted(mapa, key=lambda x: x['linha_inicio'])
-    return mapa, candidates, linhas
-
-def obter_dados_secao_v2(secao_canonico, mapa_secoes, linhas_texto):
-    entrada = None
-    for m in mapa_secoes:
-        if m['canonico'] == secao_canonico: entrada = m; break
-    if not entrada: return False, None, ""
-    linha_inicio = entrada['linha_inicio']
-    if secao_canonico.strip().upper() == "DIZERES LEGAIS": linha_fim = len(linhas_texto)
-    else:
-        sorted_map = sorted(mapa_secoes, key=lambda x: x['linha_inicio'])
-        prox_idx = None
-        for m in sorted_map:
-            if m['linha_inicio'] > linha_inicio: prox_idx = m['linha_inicio']; break
-        linha_fim = prox_idx if prox_idx is not None else len(linhas_texto)
-    conteudo_lines = []
-    for i in range(linha_inicio + 1, linha_fim):
-        line_norm = normalizar_titulo_para_comparacao(linhas_texto[i])
-        # TRAVA NUMÉRICA DE CONTEÚDO: Se achar um número de seção maior, para.
-        match_num = re.match(r'^(\d{1,2})\.', linhas_texto[i].strip())
-        if match_num:
-            num_enc = int(match_num.group(1))
-            match_atual = re.match(r'^(\d{1,2})\.', secao_canonico)
-            if match_atual:
-                if num_enc > int(match_atual.group(1)): break
-        
-        if line_norm in {normalizar_titulo_para_comparacao(s) for s in obter_secoes_por_tipo()}: break
-        conteudo_lines.append(linhas_texto[i])
-    conteudo_final = "\n".join(conteudo_lines).strip()
-    return True, entrada['titulo_encontrado'], conteudo_final
+    # Alinhamento monótono em secoes_utils: canônico > número > texto > fuzzy, sempre com
+    # número coerente e sem referência cruzada logo abaixo.
+    normas = [normalizar_titulo_para_comparacao(sec) for sec in secoes_esperadas]
+    numeros = [get_canonical_number(sec) for sec in secoes_esperadas]
+    valido = lambda k, c: validar_candidato(c, numeros[k]) and validar_falso_positivo(c.index)
+    alinhamento = alinhar(matriz_regras(secoes_esperadas, normas, numeros, candidates, valido=valido))
+    return montar_mapa(secoes_esperadas, candidates, alinhamento)
+
+def segmentar_secoes(contexto):
+    """{canônico: (título, conteúdo)} de todas as seções numa passada (secoes_utils.segmentar).
+    TRAVA NUMÉRICA DE CONTEÚDO: uma linha com número de seção maior encerra a seção."""
+    titulos_norm = {normalizar_titulo_para_comparacao(s) for s in obter_secoes_por_tipo()}
+    return segmentar(contexto.mapa, contexto.linhas, titulos_norm, normalizar_titulo_para_comparacao,
+                     trava_numerica=True, normalizadas=contexto.linhas_normalizadas)
+
+# ----------------- CONTEXTO DO DOCUMENTO (ver contexto_utils) -----------------
+def contexto_documento(texto, titulos=None):
+    """Linhas, candidatos, mapa, seções, marcadores e vocabulário do texto, calculados uma vez
+    e compartilhados por todas as etapas da auditoria."""
+    secoes = obter_secoes_por_tipo()
+    return ContextoDocumento(
+        texto, titulos,
+        candidatos=lambda ctx: construir_heading_candidates(ctx.linhas, secoes, obter_aliases_secao(), ctx.titulos),
+        mapear=lambda ctx: mapear_secoes_deterministico(ctx, secoes),
+        segmentar=segmentar_secoes)
+
+# ----------------- BLOCOS DESLOCADOS (ver blocos_utils) -----------------
+def realocar_blocos_deslocados(contexto_ref, contexto_belfar):
+    """Parágrafos do MKT que a leitura das colunas jogou para outra seção voltam para a seção
+    onde estão na referência. Retorna (contexto do MKT, [Relocacao]): sem relocação, o mesmo."""
+    linhas, relocacoes = realocar_blocos(contexto_ref.linhas, contexto_ref.secao_por_linha,
+                                         contexto_belfar.linhas, contexto_belfar.secao_por_linha, normalizar_texto)
+    if not relocacoes: return contexto_belfar, []
+    return contexto_documento("\n".join(linhas), contexto_belfar.titulos), relocacoes
 
 # ----------------- VERIFICAÇÃO -----------------
-def verificar_secoes_e_conteudo(texto_ref, texto_belfar):
+def verificar_secoes_e_conteudo(contexto_ref, contexto_belfar):
     secoes_esperadas = obter_secoes_por_tipo()
     ignore_comparison = [s.upper() for s in obter_secoes_ignorar_comparacao()]
     secoes_faltantes, diferencas_conteudo, similaridades_secoes, diferencas_titulos = [], [], [], []
     secoes_analisadas = []
 
-    mapa_ref, _, linhas_ref = mapear_secoes_deterministico(texto_ref, secoes_esperadas)
-    mapa_belfar, _, linhas_belfar = mapear_secoes_deterministico(texto_belfar, secoes_esperadas)
-
     for sec in secoes_esperadas:
-        encontrou_ref, titulo_ref, conteudo_ref = obter_dados_secao_v2(sec, mapa_ref, linhas_ref)
-        encontrou_belfar, titulo_belfar, conteudo_belfar = obter_dados_secao_v2(sec, mapa_belfar, linhas_belfar)
+        encontrou_ref, titulo_ref, conteudo_ref = contexto_ref.secao(sec)
+        encontrou_belfar, titulo_belfar, conteudo_belfar = contexto_belfar.secao(sec)
 
         if not encontrou_ref and not encontrou_belfar:
             secoes_faltantes.append(sec)
@@ -509,22 +370,21 @@ def verificar_secoes_e_conteudo(texto_ref, texto_belfar):
     return secoes_faltantes, diferencas_conteudo, similaridades_secoes, diferencas_titulos, secoes_analisadas
 
 # ----------------- ORTOGRAFIA & DIFF -----------------
-def checar_ortografia_inteligente(texto_para_checar, texto_referencia):
-    if not texto_para_checar: return []
+def checar_ortografia_inteligente(contexto, contexto_referencia):
+    if not contexto.texto: return []
     try:
         secoes_ignorar = [s.upper() for s in obter_secoes_ignorar_ortografia()]
         secoes_todas = obter_secoes_por_tipo()
         texto_filtrado = []
-        mapa, _, linhas = mapear_secoes_deterministico(texto_para_checar, secoes_todas)
         for sec in secoes_todas:
             if sec.upper() in secoes_ignorar: continue
-            enc, _, cont = obter_dados_secao_v2(sec, mapa, linhas)
+            enc, _, cont = contexto.secao(sec)
             if enc and cont: texto_filtrado.append(cont)
         texto_final = '\n'.join(texto_filtrado)
         if not texto_final: return []
         spell = SpellChecker(language='pt')
         palavras_ignorar = {"alair", "belfar", "peticionamento", "urotrobel", "nebacetin", "neomicina", "bacitracina", "sac"}
-        vocab_ref_raw = set(re.findall(r'\b[a-zA-ZÀ-ÖØ-öø-ÿ0-9\-]+\b', (texto_referencia or "").lower()))
+        vocab_ref_raw = contexto_referencia.vocabulario
         spell.word_frequency.load_words(vocab_ref_raw.union(palavras_ignorar))
         entidades = set()
         if nlp:
@@ -534,7 +394,7 @@ def checar_ortografia_inteligente(texto_para_checar, texto_referencia):
         palavras = [p for p in palavras if len(p) > 2]
         possiveis_erros = set(spell.unknown([p.lower() for p in palavras]))
         erros_filtrados = []
-        vocab_norm = set(normalizar_texto(w) for w in vocab_ref_raw)
+        vocab_norm = contexto_referencia.vocabulario_normalizado
         for e in possiveis_erros:
             e_raw = e.lower()
             e_norm = normalizar_texto(e_raw)
@@ -544,28 +404,19 @@ def checar_ortografia_inteligente(texto_para_checar, texto_referencia):
         return sorted(set(erros_filtrados))[:60]
     except: return []
 
-def marcar_diferencas_palavra_por_palavra(texto_ref, texto_belfar, eh_referencia):
-    def pre_norm(txt): return re.sub(r'([.,;?!()\[\]])', r' \1 ', txt or "")
-    def tokenizar(txt): return re.findall(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]', pre_norm(txt), re.UNICODE)
-    def norm(tok):
-        if tok == '\n': return ' '
-        if re.match(r'[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+$', tok): return normalizar_texto(tok)
-        return tok.strip()
-
-    ref_tokens = tokenizar(texto_ref)
-    bel_tokens = tokenizar(texto_belfar)
-    ref_norm = [norm(t) for t in ref_tokens]
-    bel_norm = [norm(t) for t in bel_tokens]
-    matcher = difflib.SequenceMatcher(None, ref_norm, bel_norm, autojunk=False)
-    indices = set()
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag != 'equal': indices.update(range(i1, i2) if eh_referencia else range(j1, j2))
-    tokens = ref_tokens if eh_referencia else bel_tokens
-    marcado = []
-    for idx, tok in enumerate(tokens):
-        if tok == '\n': marcado.append('<br>'); continue
-        if idx in indices and tok.strip() != '': marcado.append(f"<mark class='diff'>{tok}</mark>")
-        else: marcado.append(tok)
+# ----------------- DIFF PALAVRA A PALAVRA (ver diff_utils) -----------------
+def tokenizar_diff(txt):
+    txt = re.sub(r'([.,;?!()\[\]])', r' \1 ', txt or "")
+    return re.findall(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]', txt, re.UNICODE)
+
+def normalizar_token(tok):
+    if tok == '\n': return ' '
+    if re.match(r'[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+$', tok): return normalizar_texto(tok)
+    return tok.strip()
+
+def renderizar_diferencas(diff, eh_referencia):
+    """HTML de um lado do diff da seção (diff_utils.comparar), com as diferenças marcadas."""
+    marcado = marcar_tokens(diff, eh_referencia)
     resultado = ""
     for i, tok in enumerate(marcado):
         if i == 0: resultado += tok; continue
@@ -577,7 +428,9 @@ def marcar_diferencas_palavra_por_palavra(texto_ref, texto_belfar, eh_referencia
     return re.sub(r"(</mark>)\s+(<mark[^>]*>)", " ", resultado)
 
 # ----------------- CONSTRUÇÃO HTML -----------------
-def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=False):
+def construir_html_secoes(secoes_analisadas, diffs, erros_ortograficos, contexto, eh_referencia=False):
+    """`diffs`: {seção: DiffSecao} de comparar_secoes, o mesmo para as duas colunas;
+    `contexto`: o do documento deste lado (o conteúdo vem dele)."""
     html_map = {}
     prefixos_paciente = {
         "PARA QUE ESTE MEDICAMENTO É INDICADO": "1.", "COMO ESTE MEDICAMENTO FUNCIONA?": "2.",
@@ -594,6 +447,8 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=F
             mapa_erros[pattern] = r"<mark class='ort'>\1</mark>"
     regex_anvisa = r"((?:aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*[\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
     anvisa_pattern = re.compile(regex_anvisa, re.IGNORECASE)
+    # Sem as frases da ANVISA no documento, nenhuma seção dele tem a data para destacar.
+    tem_anvisa = contexto.contar_marcadores(MARCADORES_ANVISA) > 0
     for diff in secoes_analisadas:
         secao_canonico = diff['secao']
         prefixo = prefixos_map.get(secao_canonico, "")
@@ -610,7 +465,7 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=F
         if diff.get('ignorada', False):
             conteudo_html = (conteudo or "").replace('\n', '<br>')
         else:
-            conteudo_html = marcar_diferencas_palavra_por_palavra(diff.get('conteudo_ref') or "", diff.get('conteudo_belfar') or "", eh_referencia)
+            conteudo_html = renderizar_diferencas(diffs[secao_canonico], eh_referencia)
         
         conteudo_html = re.sub(r'(<br\s*/?>\s*){3,}', '<br><br>', conteudo_html)
         
@@ -618,21 +473,20 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=F
             for pat, repl in mapa_erros.items():
                 try: conteudo_html = re.sub(pat, repl, conteudo_html, flags=re.IGNORECASE)
                 except: pass
-        conteudo_html = anvisa_pattern.sub(r"<mark class='anvisa'>\1</mark>", conteudo_html)
+        if tem_anvisa: conteudo_html = anvisa_pattern.sub(r"<mark class='anvisa'>\1</mark>", conteudo_html)
         anchor_id = _create_anchor_id(secao_canonico, "ref" if eh_referencia else "bel")
         html_map[secao_canonico] = f"<div id='{anchor_id}' style='scroll-margin-top: 20px;'>{title_html}<div style='margin-top:6px;'>{conteudo_html}</div></div>"
     return html_map
 
-def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_bula):
+def gerar_relatorio_final(contexto_ref, contexto_belfar, nome_ref, nome_belfar, tipo_bula, relocacoes=None):
     st.header("Relatório de Auditoria Inteligente")
-    rx_anvisa = r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
-    m_ref = re.search(rx_anvisa, texto_ref or "", re.IGNORECASE)
-    m_bel = re.search(rx_anvisa, texto_belfar or "", re.IGNORECASE)
+    m_ref = contexto_ref.buscar_marcador(RX_ANVISA)
+    m_bel = contexto_belfar.buscar_marcador(RX_ANVISA)
     data_ref = m_ref.group(2).strip() if m_ref else "Não encontrada"
     data_bel = m_bel.group(2).strip() if m_bel else "Não encontrada"
 
-    secoes_faltantes, diferencas_conteudo, similaridades, diferencas_titulos, secoes_analisadas = verificar_secoes_e_conteudo(texto_ref, texto_belfar)
-    erros = checar_ortografia_inteligente(texto_belfar, texto_ref)
+    secoes_faltantes, diferencas_conteudo, similaridades, diferencas_titulos, secoes_analisadas = verificar_secoes_e_conteudo(contexto_ref, contexto_belfar)
+    erros = checar_ortografia_inteligente(contexto_belfar, contexto_ref)
     score = sum(similaridades)/len(similaridades) if similaridades else 100.0
 
     c1, c2, c3, c4 = st.columns(4)
@@ -641,6 +495,11 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     c3.metric("Data ANVISA (Ref)", data_ref)
     c4.metric("Data ANVISA (Bel)", data_bel)
 
+    if relocacoes:
+        with st.expander(f"🔀 {len(relocacoes)} bloco(s) do MKT realocado(s) para a seção da referência"):
+            for r in relocacoes:
+                st.markdown(f"- **{r.de or 'início'}** → **{r.para}** ({r.paragrafos} parágrafo(s)): _{r.texto}…_")
+
     st.divider()
     st.subheader("Seções (clique para expandir)")
     
@@ -653,8 +512,9 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     }
     prefixos_map = prefixos_paciente
 
-    html_ref = construir_html_secoes(secoes_analisadas, [], True)
-    html_bel = construir_html_secoes(secoes_analisadas, erros, False)
+    diffs = comparar_secoes(secoes_analisadas, tokenizar_diff, normalizar_token)
+    html_ref = construir_html_secoes(secoes_analisadas, diffs, [], contexto_ref, True)
+    html_bel = construir_html_secoes(secoes_analisadas, diffs, erros, contexto_belfar, False)
 
     for diff in secoes_analisadas:
         sec = diff['secao']
@@ -683,14 +543,15 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     cr, cb = st.columns(2, gap="large")
     with cr: st.markdown(f"**📄 {nome_ref}**<div class='bula-box-full'>{h_r}</div>", unsafe_allow_html=True)
     with cb: st.markdown(f"**📄 {nome_belfar}**<div class='bula-box-full'>{h_b}</div>", unsafe_allow_html=True)
+    registrar_estatisticas(ref=contexto_ref, mkt=contexto_belfar)
 
 def detectar_tipo_arquivo_por_score(texto):
+    """Pontua o texto extraído (antes da remontagem dos parágrafos), sem montar contexto."""
     if not texto: return "Indeterminado"
     titulos_paciente = ["como este medicamento funciona", "o que devo saber antes de usar"]
     titulos_profissional = ["resultados de eficacia", "caracteristicas farmacologicas"]
-    t_norm = normalizar_texto(texto)
-    score_pac = sum(1 for t in titulos_paciente if t in t_norm)
-    score_prof = sum(1 for t in titulos_profissional if t in t_norm)
+    score_pac = contar_marcadores(texto, titulos_paciente)
+    score_prof = contar_marcadores(texto, titulos_profissional)
     if score_pac > score_prof: return "Paciente"
     elif score_prof > score_pac: return "Profissional"
     return "Indeterminado"
@@ -715,8 +576,8 @@ if st.button("🔍 Iniciar Auditoria Completa", use_container_width=True, type="
         st.warning("⚠️ Envie ambos os arquivos.")
     else:
         with st.spinner("Lendo arquivos, removendo lixo gráfico e validando estrutura..."):
-            texto_ref_raw, erro_ref = extrair_texto(pdf_ref, 'docx' if pdf_ref.name.endswith('.docx') else 'pdf')
-            texto_belfar_raw, erro_belfar = extrair_texto(pdf_belfar, 'docx' if pdf_belfar.name.endswith('.docx') else 'pdf')
+            texto_ref_raw, erro_ref, titulos_ref = extrair_texto(pdf_ref, 'docx' if pdf_ref.name.endswith('.docx') else 'pdf')
+            texto_belfar_raw, erro_belfar, titulos_belfar = extrair_texto(pdf_belfar, 'docx' if pdf_belfar.name.endswith('.docx') else 'pdf')
 
             if erro_ref or erro_belfar:
                 st.error(f"Erro de leitura: {erro_ref or erro_belfar}")
@@ -731,13 +592,12 @@ if st.button("🔍 Iniciar Auditoria Completa", use_container_width=True, type="
                     st.error(f"🚨 Arquivo MKT parece Bula Profissional. Use Paciente."); erro=True
                 
                 if not erro:
-                    t_ref = reconstruir_paragrafos(texto_ref_raw)
-                    t_ref = truncar_apos_anvisa(t_ref)
-                    
-                    t_bel = reconstruir_paragrafos(texto_belfar_raw)
-                    t_bel = truncar_apos_anvisa(t_bel)
+                    ctx_ref = contexto_documento(reconstruir_paragrafos(texto_ref_raw, titulos_ref), titulos_ref)
+                    ctx_bel = contexto_documento(reconstruir_paragrafos(texto_belfar_raw, titulos_belfar), titulos_belfar)
+                    ctx_ref = truncar_apos_anvisa(ctx_ref)
+                    ctx_bel, relocacoes = realocar_blocos_deslocados(ctx_ref, truncar_apos_anvisa(ctx_bel))
                     
-                    gerar_relatorio_final(t_ref, t_bel, pdf_ref.name, pdf_belfar.name, tipo_bula_selecionado)
+                    gerar_relatorio_final(ctx_ref, ctx_bel, pdf_ref.name, pdf_belfar.name, tipo_bula_selecionado, relocacoes)
 
 st.divider()
 st.caption("Sistema de Auditoria de Bulas v107 | Correção 'e' via Contexto")
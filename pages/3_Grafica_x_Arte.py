@@ -6,18 +6,25 @@
 # - MANTIDO: Todas as limpezas anteriores (v104).
 
 import re
-import difflib
-import unicodedata
-import io
 import streamlit as st
-import fitz  # PyMuPDF
-import docx
 import spacy
-from thefuzz import fuzz
 from spellchecker import SpellChecker
 from collections import namedtuple
-from PIL import Image
-import pytesseract
+from docx_utils import texto_docx
+from cache_utils import ler_cache, gravar_cache
+from sessao_utils import SessaoDocumento
+from lixo_utils import aplicar_regras, versao_regras
+from texto_utils import normalizar_texto, normalizar_titulo_para_comparacao
+from pontuacao_utils import melhores_titulos
+from secoes_utils import matriz_regras, alinhar, montar_mapa, segmentar
+from marcadores_utils import contar_marcadores, MARCADORES_QUALIDADE, MARCADORES_ANVISA
+from contexto_utils import ContextoDocumento, registrar_estatisticas
+from diff_utils import comparar_secoes, marcar_tokens
+from titulos_utils import forcar_titulos, compilar_titulos, REGRAS_TITULOS
+from limpeza_utils import (executar_limpeza, linhas_de, etapa_texto, etapa_paragrafos, ETAPA_INVISIVEIS_NBSP,
+                           ETAPA_QUEBRAS, ETAPA_NUMEROS_SOLTOS, ETAPA_SUBLINHADOS, ETAPA_LINHAS_VAZIAS, ETAPA_APARAR)
+from layout_utils import ordenar_blocos
+from ocr_utils import executar_ocr_paginas, executar_ocr_imagens, blocos_com_imagens, texto_nativo_utilizavel
 
 # ----------------- UI / CSS -----------------
 st.set_page_config(layout="wide", page_title="Auditoria de Bulas", page_icon="🔬")
@@ -90,28 +97,23 @@ def carregar_modelo_spacy():
 nlp = carregar_modelo_spacy()
 
 # ----------------- UTILITÁRIOS -----------------
-def normalizar_texto(texto):
-    if not isinstance(texto, str): return ""
-    texto = texto.replace('\n', ' ')
-    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-    texto = re.sub(r'[^\w\s]', '', texto)
-    texto = ' '.join(texto.split())
-    return texto.lower()
-
-def normalizar_titulo_para_comparacao(texto):
-    texto_norm = normalizar_texto(texto or "")
-    texto_norm = re.sub(r'^\d+\s*[\.\-)]*\s*', '', texto_norm).strip()
-    return texto_norm
-
-def truncar_apos_anvisa(texto):
-    if not isinstance(texto, str): return texto
-    regex_anvisa = r"((?:aprovad[ao][\s\n]+pela[\s\n]+anvisa[\s\n]+em|data[\s\n]+de[\s\n]+aprova\w+[\s\n]+na[\s\n]+anvisa:)[\s\n]*([\d]{1,2}\s*/\s*[\d]{1,2}\s*/\s*[\d]{2,4}))"
-    match = re.search(regex_anvisa, texto, re.IGNORECASE | re.DOTALL)
-    if not match: return texto
+# normalizar_texto / normalizar_titulo_para_comparacao: texto_utils (cache do processo)
+
+RX_ANVISA = re.compile(r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})",
+                       re.IGNORECASE)
+RX_ANVISA_CORTE = re.compile(r"((?:aprovad[ao][\s\n]+pela[\s\n]+anvisa[\s\n]+em|data[\s\n]+de[\s\n]+aprova\w+[\s\n]+na[\s\n]+anvisa:)[\s\n]*([\d]{1,2}\s*/\s*[\d]{1,2}\s*/\s*[\d]{2,4}))",
+                             re.IGNORECASE | re.DOTALL)
+
+def truncar_apos_anvisa(contexto):
+    """Contexto do texto cortado logo após a data da ANVISA (sem corte, o mesmo)."""
+    match = contexto.buscar_marcador(RX_ANVISA_CORTE)
+    if not match: return contexto
+    texto = contexto.texto
     cut_off_position = match.end(1)
     pos_match = re.search(r'^\s*\.', texto[cut_off_position:], re.IGNORECASE)
     if pos_match: cut_off_position += pos_match.end()
-    return texto[:cut_off_position]
+    if cut_off_position >= len(texto): return contexto
+    return contexto_documento(texto[:cut_off_position])
 
 def _create_anchor_id(secao_nome, prefix):
     norm = normalizar_texto(secao_nome)
@@ -122,112 +124,9 @@ def _create_anchor_id(secao_nome, prefix):
 
 def limpar_lixo_grafico(texto):
     """Remove lixo técnico e fragmentos específicos."""
-    texto_limpo = texto
-    
-    # 1. Frases/Padrões Literais Longos (Seguros para replace simples)
-    lixo_frases = [
-        "MEDICAMENTO ?", 
-        "DEVO USAR ESTE", 
-        "mma USO ORAL mm USO ADULTO",
-        "mem CSA comprimido",
-        "MMA 1250 - 12/25",
-        "Medida da bula",
-        "19 , 0 cm x 45 , 0 cm"
-    ]
-    for item in lixo_frases:
-        texto_limpo = texto_limpo.replace(item, "")
-
-    # 2. Tokens curtos/soltos (Usar Regex \b para evitar quebrar palavras)
-    tokens_lixo = ["MM", "mm", "pe", "BRR", "EE", "gm", "cm", "mma"]
-    pattern_tokens = r'\b(' + '|'.join(tokens_lixo) + r')\b'
-    texto_limpo = re.sub(pattern_tokens, '', texto_limpo, flags=re.IGNORECASE)
-
-    # 3. Limpezas Específicas (Regex)
-    padroes_especificos = [
-        # NOVO (v105): Medidas numéricas soltas (ex: 210, 00 / 30 , 00)
-        # O uso de ^ e $ garante que só apague se a linha for SÓ o número
-        r'^\s*\d{1,3}\s*,\s*00\s*$',
-        
-        # NOVO (v105): Padrão de dimensão solta (ex: : 15 X 21)
-        r'^\s*:\s*\d{1,3}\s*[xX]\s*\d{1,3}\s*$',
-
-        # Remove aspas simples soltas
-        r"\s+'\s+", 
-        
-        # Remove telefone (31) 3514 - 2900
-        r'.*\(?\s*31\s*\)?\s*3514\s*-\s*2900.*',
-        
-        # Remove palavra "contato" se estiver solta na linha
-        r'^\s*contato\s*$',
-        
-        # Medidas soltas numéricas (com unidade)
-        r'\b\d{1,3}\s*mm\b',
-        r'\b\d{1,3}\s*cm\b',
-        
-        # Medida específica ": 19, 0 x 45, 0"
-        r'.*:\s*19\s*,\s*0\s*x\s*45\s*,\s*0.*',
-
-        # Marcas de corte com travessões e setas (— — — > > > »)
-        r'.*(?:—\s*)+\s*>\s*>\s*>\s*».*',
-
-        # Marcas de corte antigas
-        r'.*gm\s*>\s*>\s*>.*',              
-        r'.*_{3,}.*gm.*', 
-        r'.*MMA\s+\d{4}\s*-\s*\d{1,2}/\d{2,4}.*',
-
-        # Títulos quebrados/fantasmas antigos
-        r'^\s*MEDICAMENTO\s*\?\s*$',
-        r'^\s*DEVO\s*USAR\s*ESTE\s*$',
-        
-        # Lixos diversos
-        r'.*PROVA\s*-\s*[\d\s/]+.*',       
-        r'.*Tipologia.*',                  
-        r'.*Normal\s+e.*',                 
-        r'^\s*Belcomplex\s+B\s+comprimido\s*$',
-        r'^\s*Belcomplex:\s*$',
-        r'.*Impress[ãa]o:.*',
-        r'.*Negrito\s*[\.,]?\s*Corpo\s*\d+.*',
-        r'.*artes.*belfar.*',
-        r'^contato:.*',                    
-        r'.*BUL\d+[A-Z0-9]*.*',
-        r'.*\(\s*\d+\s*\)\s*BELFAR.*',
-        r'^\s*VERSO\s*$', r'^\s*FRENTE\s*$',
-        r'.*Cor:\s*Preta.*', r'.*Papel:.*', r'.*Ap\s*\d+gr.*', 
-        r'.*bula do paciente.*', r'.*página \d+\s*de\s*\d+.*', 
-        r'.*Times New Roman.*', r'.*Arial.*', r'.*Helvética.*', 
-        r'.*Cores?:.*', r'.*Preto.*', r'.*Pantone.*', 
-        r'^\s*BELFAR\s*$', r'^\s*PHARMA\s*$',
-        r'.*CNPJ:.*', r'.*SAC:.*', r'.*Farm\. Resp\..*', 
-        r'.*Laetus.*', r'.*Pharmacode.*', 
-        r'.*\b\d{6,}\s*-\s*\d{2}/\d{2}\b.*', 
-        r'.*BUL_CLORIDRATO.*',
-        r'^\s*450\s*$'
-    ]
-    
-    for p in padroes_especificos:
-        # Tenta remover linha inteira primeiro
-        try:
-            texto_limpo = re.sub(r'(?m)^' + p + r'$', '', texto_limpo, flags=re.IGNORECASE)
-        except Exception:
-            pass
-            
-        # Se sobrar, remove inline (exceto aspas que precisam ser substituidas por espaço)
-        if p == r"\s+'\s+":
-             texto_limpo = re.sub(p, ' ', texto_limpo, flags=re.IGNORECASE)
-        else:
-             # Remove inline APENAS se não for um padrão restrito a linha inteira (^...$)
-             # Como os novos padrões numéricos têm ^ e $, eles só serão removidos se forem a linha toda,
-             # o que protege números legítimos no meio do texto.
-             if not p.startswith(r'^\s*'): 
-                texto_limpo = re.sub(p, '', texto_limpo, flags=re.IGNORECASE)
-
-    # Limpa linhas vazias ou com pontuação que sobraram
-    texto_limpo = re.sub(r'^\s*[-_.,|:;]\s*$', '', texto_limpo, flags=re.MULTILINE)
-    
-    # Corrige "se a administrado"
-    texto_limpo = texto_limpo.replace(" se a administrado ", " se administrado ")
-
-    return texto_limpo
+    # Regras em regras_lixo.json (conjunto "pag3"): frases/tokens soltos, linhas inteiras,
+    # trechos e sobras, cada grupo numa varredura só (ver lixo_utils).
+    return aplicar_regras(texto, "pag3")
 
 def corrigir_padroes_bula(texto):
     """Corrige erros de OCR (300, Guarde-o, 15 Ca 30)."""
@@ -253,113 +152,123 @@ def corrigir_padroes_bula(texto):
 
 # ----------------- EXTRAÇÃO -----------------
 
+# Na bula desta página o título 8 termina em "PODE ME CAUSAR?".
+TITULOS_BULA = compilar_titulos([r._replace(canonico="8. QUAIS OS MALES QUE ESTE MEDICAMENTO PODE ME CAUSAR?")
+                                 if r.numero == 8 else r for r in REGRAS_TITULOS])
+
 def forcar_titulos_bula(texto):
-    substituicoes = [
-        (r"(?:1\.?\s*)?PARA\s*QUE\s*ESTE\s*MEDICAMENTO\s*[\s\S]{0,100}?INDICADO\??", r"\n1. PARA QUE ESTE MEDICAMENTO É INDICADO?\n"),
-        (r"(?:2\.?\s*)?COMO\s*ESTE\s*MEDICAMENTO\s*[\s\S]{0,100}?FUNCIONA\??", r"\n2. COMO ESTE MEDICAMENTO FUNCIONA?\n"),
-        (r"(?:3\.?\s*)?QUANDO\s*N[ÃA]O\s*DEVO\s*USAR\s*[\s\S]{0,100}?MEDICAMENTO\??", r"\n3. QUANDO NÃO DEVO USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:4\.?\s*)?O\s*QUE\s*DEVO\s*SABER[\s\S]{1,100}?USAR[\s\S]{1,100}?MEDICAMENTO\??", r"\n4. O QUE DEVO SABER ANTES DE USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:5\.?\s*)?ONDE\s*,?\s*COMO\s*E\s*POR\s*QUANTO[\s\S]{1,100}?GUARDAR[\s\S]{1,100}?MEDICAMENTO\??", r"\n5. ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR ESTE MEDICAMENTO?\n"),
-        (r"(?:6\.?\s*)?COMO\s*DEVO\s*USAR\s*ESTE\s*[\s\S]{0,100}?MEDICAMENTO\??", r"\n6. COMO DEVO USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:7\.?\s*)?O\s*QUE\s*DEVO\s*FAZER[\s\S]{0,200}?MEDICAMENTO\??", r"\n7. O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR ESTE MEDICAMENTO?\n"),
-        (r"(?:8\.?\s*)?QUAIS\s*OS\s*MALES[\s\S]{0,200}?CAUSAR\??", r"\n8. QUAIS OS MALES QUE ESTE MEDICAMENTO PODE ME CAUSAR?\n"),
-        (r"(?:9\.?\s*)?O\s*QUE\s*FAZER\s*SE\s*ALGU[EÉ]M\s*USAR[\s\S]{0,400}?MEDICAMENTO\??", r"\n9. O QUE FAZER SE ALGUEM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA DESTE MEDICAMENTO?\n"),
-    ]
-    texto_arrumado = texto
-    for padrao, substituto in substituicoes:
-        texto_arrumado = re.sub(padrao, substituto, texto_arrumado, flags=re.IGNORECASE | re.DOTALL)
-    return texto_arrumado
-
-def executar_ocr(arquivo_bytes):
-    texto_ocr = ""
-    with fitz.open(stream=io.BytesIO(arquivo_bytes), filetype="pdf") as doc:
-        for page in doc:
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            try: texto_ocr += pytesseract.image_to_string(img, lang='por', config='--psm 3') + "\n"
-            except: pass
-    return texto_ocr
+    return forcar_titulos(texto, TITULOS_BULA)
+
+def executar_ocr(doc, paginas=None):
+    """OCR das páginas pedidas (todas por padrão). Retorna ({índice: texto}, índices que falharam)."""
+    # Motor de OCR persistente (ver ocr_utils); páginas em que o Tesseract falhou ficam vazias.
+    paginas = list(range(doc.page_count)) if paginas is None else list(paginas)
+    textos, _ = executar_ocr_paginas(doc, paginas)
+    falhas = {i for i, t in zip(paginas, textos) if t is None}
+    return {i: (t + "\n" if t is not None else "") for i, t in zip(paginas, textos)}, falhas
+
+def montar_texto_blocos(blocos, is_marketing_pdf, textos_imagem=None):
+    """Texto da página a partir dos blocos; imagens entram com o texto reconhecido nelas."""
+    partes = []
+    for b in blocos:
+        if b[6] == 0: partes.append(b[4]); continue
+        t = ((textos_imagem or {}).get(b[7]) or "").strip("\f\n")
+        if t.strip(): partes.append(t + "\n")
+    if is_marketing_pdf: return "".join(p + "\n" for p in partes)
+    return "".join(partes) + "\n"
 
 def verifica_qualidade_texto(texto):
-    if not texto: return False
-    t_limpo = re.sub(r'\s+', '', unicodedata.normalize('NFD', texto).lower())
-    keywords = ["paraqueeste", "comodevousar", "dizereslegais", "quandonaodevo", "composicao"]
-    hits = sum(1 for k in keywords if k in t_limpo)
-    return hits >= 2
+    return contar_marcadores(texto, MARCADORES_QUALIDADE) >= 2
+
+# Faz parte da chave do cache de extração: altere ao mudar limpeza/correções/títulos.
+# As regras de lixo (regras_lixo.json) entram na chave pelo digest delas (lixo_utils.versao_regras).
+VERSAO_REGRAS_LIMPEZA = "v105.6"
+
+# Limpeza em fluxo (ver limpeza_utils). A limpeza cirúrgica vem antes de tudo para juntar frases.
+ETAPAS_LIMPEZA = [
+    ETAPA_INVISIVEIS_NBSP, ETAPA_QUEBRAS,
+    etapa_texto(limpar_lixo_grafico),    # 1. limpeza cirúrgica
+    etapa_texto(corrigir_padroes_bula),  # 2. correção
+    etapa_texto(forcar_titulos_bula),    # 3. estrutura
+    ETAPA_NUMEROS_SOLTOS, ETAPA_SUBLINHADOS, ETAPA_LINHAS_VAZIAS, ETAPA_APARAR,
+]
+
+def extrair_pdf_hibrido(doc, is_marketing_pdf):
+    """Texto nativo + OCR onde faltar. Retorna (texto de cada página, páginas que passaram por OCR,
+    páginas em que o OCR da página ou de alguma imagem dela falhou), numeradas a partir de 0."""
+    paginas, blocos_paginas = [], []
+    for page in doc:
+        # Imagens com texto (parágrafo achatado, quadro escaneado) ficam na posição delas.
+        blocos = blocos_com_imagens(page)
+        if is_marketing_pdf: blocos = ordenar_blocos(blocos)
+        blocos_paginas.append(blocos)
+        paginas.append(montar_texto_blocos(blocos, is_marketing_pdf))
+
+    # Decisão por página: só as páginas sem camada de texto utilizável vão para o OCR.
+    paginas_ocr = [i for i, t in enumerate(paginas) if not texto_nativo_utilizavel(t)]
+    # Nas demais, só as imagens embutidas são reconhecidas (na resolução nativa).
+    ja_ocr = set(paginas_ocr)
+    falhas = set()
+    imagens = {}
+    for i, blocos in enumerate(blocos_paginas):
+        if i in ja_ocr: continue
+        for b in blocos:
+            if b[6] == 1: imagens[b[7]] = max(imagens.get(b[7], 0), b[2] - b[0])
+    if imagens:
+        textos_imagem = executar_ocr_imagens(doc, imagens)
+        for i, blocos in enumerate(blocos_paginas):
+            if i not in ja_ocr and any(b[6] == 1 for b in blocos):
+                paginas[i] = montar_texto_blocos(blocos, is_marketing_pdf, textos_imagem)
+                if any(b[6] == 1 and textos_imagem.get(b[7]) is None for b in blocos): falhas.add(i)
+    if paginas_ocr:
+        textos, falhas_ocr = executar_ocr(doc, paginas_ocr)
+        for i, t in textos.items(): paginas[i] = t
+        falhas |= falhas_ocr
+    # Rede de segurança: se o documento ainda não parece uma bula, faz OCR do restante.
+    if not verifica_qualidade_texto("".join(paginas)):
+        restantes = [i for i in range(len(paginas)) if i not in ja_ocr]
+        if restantes:
+            textos, falhas_ocr = executar_ocr(doc, restantes)
+            for i, t in textos.items(): paginas[i] = t
+            # O OCR da página inteira substitui o das imagens dela: vale a falha (ou não) dele.
+            falhas = (falhas - set(restantes)) | falhas_ocr
+            paginas_ocr = sorted(paginas_ocr + restantes)
+    return paginas, paginas_ocr, sorted(falhas)
 
 def extrair_texto_hibrido(arquivo, tipo_arquivo, is_marketing_pdf=False):
-    if arquivo is None: return "", "Arquivo não enviado."
+    """Retorna (texto, erro, páginas que passaram por OCR — numeradas a partir de 1)."""
+    if arquivo is None: return "", "Arquivo não enviado.", []
     try:
-        arquivo.seek(0)
-        arquivo_bytes = arquivo.read()
-        texto_completo = ""
-        
-        if tipo_arquivo == 'pdf':
-            texto_nativo = ""
-            with fitz.open(stream=io.BytesIO(arquivo_bytes), filetype="pdf") as doc:
-                for page in doc:
-                    if is_marketing_pdf:
-                        blocks = page.get_text("blocks")
-                        blocks.sort(key=lambda b: (b[1], b[0]))
-                        for b in blocks:
-                            if b[6] == 0: texto_nativo += b[4] + "\n"
-                    else:
-                        texto_nativo += page.get_text() + "\n"
-            
-            if verifica_qualidade_texto(texto_nativo):
-                texto_completo = texto_nativo
-            else:
-                texto_completo = executar_ocr(arquivo_bytes)
-
-        elif tipo_arquivo == 'docx':
-            doc = docx.Document(io.BytesIO(arquivo_bytes))
-            texto_completo = "\n".join([p.text for p in doc.paragraphs])
-
-        if texto_completo:
-            invis = ['\u00AD', '\u200B', '\u200C', '\u200D', '\uFEFF']
-            for c in invis: texto_completo = texto_completo.replace(c, '')
-            texto_completo = texto_completo.replace('\r\n', '\n').replace('\r', '\n').replace('\u00A0', ' ')
-            
-            # 1. LIMPEZA CIRÚRGICA (IMPORTANTE: Antes de tudo para juntar frases)
-            texto_completo = limpar_lixo_grafico(texto_completo)
-            # 2. CORREÇÃO
-            texto_completo = corrigir_padroes_bula(texto_completo)
-            # 3. ESTRUTURA
-            texto_completo = forcar_titulos_bula(texto_completo)
-            texto_completo = re.sub(r'(?m)^\s*\d{1,2}\.\s*$', '', texto_completo)
-            texto_completo = re.sub(r'(?m)^_+$', '', texto_completo)
-            texto_completo = re.sub(r'\n{3,}', '\n\n', texto_completo)
-            
-            return texto_completo.strip(), None
+        with SessaoDocumento(arquivo, tipo_arquivo) as sessao:
+            chave = sessao.chave_cache("pag3", tipo_arquivo, is_marketing_pdf, VERSAO_REGRAS_LIMPEZA, versao_regras("pag3"))
+            em_cache = ler_cache(chave)
+            if em_cache is not None: return em_cache["texto"], None, em_cache["paginas_ocr"]
+            paginas, paginas_ocr, falhas = [], [], []
+            if tipo_arquivo == 'pdf':
+                paginas, paginas_ocr, falhas = extrair_pdf_hibrido(sessao.doc, is_marketing_pdf)
+            elif tipo_arquivo == 'docx':
+                # Em fluxo, com as tabelas (composição, posologia) na ordem do documento.
+                paginas = [texto_docx(sessao.caminho)]
+
+        if any(paginas):
+            texto_completo, _ = executar_limpeza(linhas_de(paginas), ETAPAS_LIMPEZA)
+            paginas_ocr = [i + 1 for i in paginas_ocr]
+            # Falha de OCR pode ser passageira (processo do motor caiu, idioma ausente): sem cache,
+            # o próximo envio do mesmo arquivo tenta de novo em vez de herdar páginas vazias.
+            if not falhas: gravar_cache(chave, {"texto": texto_completo, "paginas_ocr": paginas_ocr})
+            return texto_completo, None, paginas_ocr
+        return "", "Nenhum texto extraído do arquivo.", []
 
     except Exception as e:
-        return "", f"Erro: {e}"
+        return "", f"Erro: {e}", []
 
 # ----------------- RECONSTRUÇÃO E ANÁLISE -----------------
+def is_titulo_secao(linha):
+    return bool(re.match(r'^\d+\s*[\.\-)]*\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]', linha) or (linha.isupper() and len(linha) > 4))
+
 def reconstruir_paragrafos(texto):
     if not texto: return ""
-    linhas = texto.split('\n')
-    linhas_out = []
-    buffer = ""
-    for linha in linhas:
-        l_strip = linha.strip()
-        if not l_strip or (len(l_strip) < 3 and not re.match(r'^\d+\.?$', l_strip)):
-            if buffer: linhas_out.append(buffer); buffer = ""
-            if not linhas_out or linhas_out[-1] != "": linhas_out.append("")
-            continue
-        first = l_strip.split('\n')[0]
-        is_title = re.match(r'^\d+\s*[\.\-)]*\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]', first) or (first.isupper() and len(first)>4)
-        if is_title:
-            if buffer: linhas_out.append(buffer); buffer = ""
-            linhas_out.append(l_strip)
-            continue
-        if buffer:
-            if buffer.endswith('-'): buffer = buffer[:-1] + l_strip
-            elif not buffer.endswith(('.', ':', '!', '?')): buffer += " " + l_strip
-            else: linhas_out.append(buffer); buffer = l_strip
-        else: buffer = l_strip
-    if buffer: linhas_out.append(buffer)
-    return "\n".join(linhas_out)
+    return executar_limpeza(texto, [etapa_paragrafos(is_titulo_secao)])[0]
 
 def obter_secoes_por_tipo():
     return [
@@ -396,20 +305,22 @@ def construir_heading_candidates(linhas, secoes_esperadas, aliases):
     for a, c in aliases.items():
         if c in secoes_esperadas: titulos_possiveis[a] = c
     titulos_norm = {k: normalizar_titulo_para_comparacao(k) for k in titulos_possiveis.keys()}
-    candidates = []
+    # Pontuação em lote (pontuacao_utils): só os títulos com forma normalizada, na ordem do
+    # dicionário — no empate vale o primeiro.
+    canon_pontuados = [c for k, c in titulos_possiveis.items() if titulos_norm[k]]
+    norm_pontuados = [titulos_norm[k] for k in titulos_possiveis if titulos_norm[k]]
+    linhas_validas = []  # (índice, raw, norm, numeric)
     for i, linha in enumerate(linhas):
         raw = (linha or "").strip()
         if not raw: continue
-        norm = normalizar_titulo_para_comparacao(raw)
-        best_score = 0; best_canon = None
         mnum = re.match(r'^\s*(\d{1,2})\s*[\.\)\-]?\s*(.*)$', raw)
-        numeric = int(mnum.group(1)) if mnum else None
-        for t_possivel, t_canon in titulos_possiveis.items():
-            t_norm = titulos_norm.get(t_possivel, "")
-            if not t_norm: continue
-            score = fuzz.token_set_ratio(t_norm, norm)
-            if t_norm in norm: score = max(score, 95)
-            if score > best_score: best_score = score; best_canon = t_canon
+        linhas_validas.append((i, raw, normalizar_titulo_para_comparacao(raw), int(mnum.group(1)) if mnum else None))
+    # Numeradas são candidatas de qualquer jeito: precisam da nota exata.
+    notas, melhores = melhores_titulos(norm_pontuados, [l[2] for l in linhas_validas],
+                                       exatas=[l[3] is not None for l in linhas_validas])
+    candidates = []
+    for (i, raw, norm, numeric), best_score, k in zip(linhas_validas, notas, melhores):
+        best_canon = canon_pontuados[k] if k >= 0 else None
         is_candidate = False
         if numeric is not None: is_candidate = True
         elif best_score >= 88: is_candidate = True
@@ -418,68 +329,50 @@ def construir_heading_candidates(linhas, secoes_esperadas, aliases):
     unique = {c.index: c for c in candidates}
     return sorted(unique.values(), key=lambda x: x.index)
 
-def mapear_secoes_deterministico(texto_completo, secoes_esperadas):
-    linhas = texto_completo.split('\n')
-    aliases = obter_aliases_secao()
-    candidates = construir_heading_candidates(linhas, secoes_esperadas, aliases)
-    mapa = []
-    last_idx = -1
-    for sec_idx, sec in enumerate(secoes_esperadas):
-        sec_norm = normalizar_titulo_para_comparacao(sec)
-        found = None
+def mapear_secoes_deterministico(contexto, secoes_esperadas):
+    candidates = contexto.candidatos
+    # Alinhamento monótono em secoes_utils: canônico > número (posição) > texto.
+    normas = [normalizar_titulo_para_comparacao(sec) for sec in secoes_esperadas]
+    numeros = list(range(1, len(secoes_esperadas) + 1))
+    alinhamento = alinhar(matriz_regras(secoes_esperadas, normas, numeros, candidates, fuzzy=False))
+    mapa = montar_mapa(secoes_esperadas, candidates, alinhamento)
+    # Seção fora de ordem: aceita o título canônico/numerado mesmo antes das outras seções.
+    for sec_idx, (sec, j) in enumerate(zip(secoes_esperadas, alinhamento.escolhas)):
+        if j is not None: continue
         for c in candidates:
-            if c.index <= last_idx: continue
-            if c.matched_canon == sec: found = c; break
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if c.numeric == (sec_idx + 1): found = c; break
-        if not found:
-            for c in candidates:
-                if c.index <= last_idx: continue
-                if sec_norm and sec_norm in c.norm: found = c; break
-        if not found:
-            for c in candidates:
-                if c.matched_canon == sec or (c.numeric == (sec_idx + 1)):
-                    if c.numeric == (sec_idx + 1) or c.score > 95: found = c; break
-        if found:
-            mapa.append({'canonico': sec, 'titulo_encontrado': found.raw, 'linha_inicio': found.index})
-            if found.index > last_idx: last_idx = found.index
-    mapa = sorted(mapa, key=lambda x: x['linha_inicio'])
-    return mapa, candidates, linhas
-
-def obter_dados_secao_v2(secao_canonico, mapa_secoes, linhas_texto):
-    entrada = None
-    for m in mapa_secoes:
-        if m['canonico'] == secao_canonico: entrada = m; break
-    if not entrada: return False, None, ""
-    linha_inicio = entrada['linha_inicio']
-    if secao_canonico.strip().upper() == "DIZERES LEGAIS": linha_fim = len(linhas_texto)
-    else:
-        sorted_map = sorted(mapa_secoes, key=lambda x: x['linha_inicio'])
-        prox_idx = None
-        for m in sorted_map:
-            if m['linha_inicio'] > linha_inicio: prox_idx = m['linha_inicio']; break
-        linha_fim = prox_idx if prox_idx is not None else len(linhas_texto)
-    conteudo_lines = []
-    for i in range(linha_inicio + 1, linha_fim):
-        line_norm = normalizar_titulo_para_comparacao(linhas_texto[i])
-        if line_norm in {normalizar_titulo_para_comparacao(s) for s in obter_secoes_por_tipo()}: break
-        conteudo_lines.append(linhas_texto[i])
-    return True, entrada['titulo_encontrado'], "\n".join(conteudo_lines).strip()
-
-def verificar_secoes_e_conteudo(texto_ref, texto_belfar):
+            if c.matched_canon == sec or (c.numeric == (sec_idx + 1)):
+                if c.numeric == (sec_idx + 1) or c.score > 95:
+                    mapa.append({'canonico': sec, 'titulo_encontrado': c.raw, 'linha_inicio': c.index,
+                                 'score': c.score, 'regra': "fora de ordem"})
+                    break
+    return sorted(mapa, key=lambda x: x['linha_inicio'])
+
+def segmentar_secoes(contexto):
+    """{canônico: (título, conteúdo)} de todas as seções numa passada (secoes_utils.segmentar)."""
+    titulos_norm = {normalizar_titulo_para_comparacao(s) for s in obter_secoes_por_tipo()}
+    return segmentar(contexto.mapa, contexto.linhas, titulos_norm, normalizar_titulo_para_comparacao,
+                     normalizadas=contexto.linhas_normalizadas)
+
+# ----------------- CONTEXTO DO DOCUMENTO (ver contexto_utils) -----------------
+def contexto_documento(texto):
+    """Linhas, candidatos, mapa, seções, marcadores e vocabulário do texto, calculados uma vez
+    e compartilhados por todas as etapas da auditoria."""
+    secoes = obter_secoes_por_tipo()
+    return ContextoDocumento(
+        texto,
+        candidatos=lambda ctx: construir_heading_candidates(ctx.linhas, secoes, obter_aliases_secao()),
+        mapear=lambda ctx: mapear_secoes_deterministico(ctx, secoes),
+        segmentar=segmentar_secoes)
+
+def verificar_secoes_e_conteudo(contexto_ref, contexto_belfar):
     secoes_esperadas = obter_secoes_por_tipo()
     ignore_comparison = [s.upper() for s in obter_secoes_ignorar_comparacao()]
     secoes_faltantes, diferencas_conteudo, similaridades_secoes, diferencas_titulos = [], [], [], []
     secoes_analisadas = []
 
-    mapa_ref, _, linhas_ref = mapear_secoes_deterministico(texto_ref, secoes_esperadas)
-    mapa_belfar, _, linhas_belfar = mapear_secoes_deterministico(texto_belfar, secoes_esperadas)
-
     for sec in secoes_esperadas:
-        encontrou_ref, titulo_ref, conteudo_ref = obter_dados_secao_v2(sec, mapa_ref, linhas_ref)
-        encontrou_belfar, titulo_belfar, conteudo_belfar = obter_dados_secao_v2(sec, mapa_belfar, linhas_belfar)
+        encontrou_ref, titulo_ref, conteudo_ref = contexto_ref.secao(sec)
+        encontrou_belfar, titulo_belfar, conteudo_belfar = contexto_belfar.secao(sec)
 
         if not encontrou_ref and not encontrou_belfar:
             secoes_faltantes.append(sec)
@@ -515,18 +408,19 @@ def verificar_secoes_e_conteudo(texto_ref, texto_belfar):
         })
     return secoes_faltantes, diferencas_conteudo, similaridades_secoes, diferencas_titulos, secoes_analisadas
 
-def checar_ortografia_inteligente(texto_para_checar, texto_referencia):
+def checar_ortografia_inteligente(contexto, contexto_referencia):
+    texto_para_checar = contexto.texto
     if not texto_para_checar: return []
     try:
         spell = SpellChecker(language='pt')
         palavras_ignorar = {"alair", "belfar", "peticionamento", "urotrobel", "nebacetin", "sac"}
-        vocab_ref_raw = set(re.findall(r'\b[a-zA-ZÀ-ÖØ-öø-ÿ0-9\-]+\b', (texto_referencia or "").lower()))
+        vocab_ref_raw = contexto_referencia.vocabulario
         spell.word_frequency.load_words(vocab_ref_raw.union(palavras_ignorar))
         palavras = re.findall(r'\b[a-zA-ZÀ-ÖØ-öø-ÿ]+\b', texto_para_checar)
         palavras = [p for p in palavras if len(p) > 2]
         possiveis_erros = set(spell.unknown([p.lower() for p in palavras]))
         erros_filtrados = []
-        vocab_norm = set(normalizar_texto(w) for w in vocab_ref_raw)
+        vocab_norm = contexto_referencia.vocabulario_normalizado
         for e in possiveis_erros:
             e_norm = normalizar_texto(e)
             if e.lower() not in vocab_ref_raw and e_norm not in vocab_norm:
@@ -534,27 +428,16 @@ def checar_ortografia_inteligente(texto_para_checar, texto_referencia):
         return sorted(set(erros_filtrados))[:60]
     except: return []
 
-def marcar_diferencas_palavra_por_palavra(texto_ref, texto_belfar, eh_referencia):
-    def pre_norm(txt): return re.sub(r'([.,;?!()\[\]])', r' \1 ', txt or "")
-    def tokenizar(txt): return re.findall(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]', pre_norm(txt), re.UNICODE)
-    def norm(tok): return ' ' if tok == '\n' else (normalizar_texto(tok) if re.match(r'\w+', tok) else tok.strip())
-
-    ref_tokens = tokenizar(texto_ref)
-    bel_tokens = tokenizar(texto_belfar)
-    ref_norm = [norm(t) for t in ref_tokens]
-    bel_norm = [norm(t) for t in bel_tokens]
-    matcher = difflib.SequenceMatcher(None, ref_norm, bel_norm, autojunk=False)
-    indices = set()
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag != 'equal': indices.update(range(i1, i2) if eh_referencia else range(j1, j2))
-    
-    tokens = ref_tokens if eh_referencia else bel_tokens
-    marcado = []
-    for idx, tok in enumerate(tokens):
-        if tok == '\n': marcado.append('<br>'); continue
-        if idx in indices and tok.strip() != '': marcado.append(f"<mark class='diff'>{tok}</mark>")
-        else: marcado.append(tok)
-    
+# ----------------- DIFF PALAVRA A PALAVRA (ver diff_utils) -----------------
+def tokenizar_diff(txt):
+    txt = re.sub(r'([.,;?!()\[\]])', r' \1 ', txt or "")
+    return re.findall(r'\n|[A-Za-zÀ-ÖØ-öø-ÿ0-9_•]+|[^\w\s]', txt, re.UNICODE)
+
+def normalizar_token(tok): return ' ' if tok == '\n' else (normalizar_texto(tok) if re.match(r'\w+', tok) else tok.strip())
+
+def renderizar_diferencas(diff, eh_referencia):
+    """HTML de um lado do diff da seção (diff_utils.comparar), com as diferenças marcadas."""
+    marcado = marcar_tokens(diff, eh_referencia)
     resultado = ""
     for i, tok in enumerate(marcado):
         if i == 0: resultado += tok; continue
@@ -563,7 +446,9 @@ def marcar_diferencas_palavra_por_palavra(texto_ref, texto_belfar, eh_referencia
         else: resultado += " " + tok
     return re.sub(r"(</mark>)\s+(<mark[^>]*>)", " ", resultado)
 
-def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=False):
+def construir_html_secoes(secoes_analisadas, diffs, erros_ortograficos, contexto, eh_referencia=False):
+    """`diffs`: {seção: DiffSecao} de comparar_secoes, o mesmo para as duas colunas;
+    `contexto`: o do documento deste lado (o conteúdo vem dele)."""
     html_map = {}
     prefixos = {
         "PARA QUE ESTE MEDICAMENTO É INDICADO": "1.", "COMO ESTE MEDICAMENTO FUNCIONA?": "2.",
@@ -580,6 +465,8 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=F
             
     regex_anvisa = r"((?:aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*[\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
     anvisa_pattern = re.compile(regex_anvisa, re.IGNORECASE)
+    # Sem as frases da ANVISA no documento, nenhuma seção dele tem a data para destacar.
+    tem_anvisa = contexto.contar_marcadores(MARCADORES_ANVISA) > 0
 
     for diff in secoes_analisadas:
         sec = diff['secao']
@@ -597,7 +484,7 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=F
         if diff.get('ignorada', False):
             c_html = (conteudo or "").replace('\n', '<br>')
         else:
-            c_html = marcar_diferencas_palavra_por_palavra(diff.get('conteudo_ref') or "", diff.get('conteudo_belfar') or "", eh_referencia)
+            c_html = renderizar_diferencas(diffs[sec], eh_referencia)
         
         c_html = re.sub(r'(<br\s*/?>\s*){3,}', '<br><br>', c_html)
         
@@ -606,32 +493,31 @@ def construir_html_secoes(secoes_analisadas, erros_ortograficos, eh_referencia=F
                 try: c_html = re.sub(pat, repl, c_html, flags=re.IGNORECASE)
                 except: pass
         
-        c_html = anvisa_pattern.sub(r"<mark class='anvisa'>\1</mark>", c_html)
+        if tem_anvisa: c_html = anvisa_pattern.sub(r"<mark class='anvisa'>\1</mark>", c_html)
         anchor_id = _create_anchor_id(sec, "ref" if eh_referencia else "bel")
         html_map[sec] = f"<div id='{anchor_id}' style='scroll-margin-top: 20px;'>{title_html}<div style='margin-top:6px;'>{c_html}</div></div>"
     return html_map
 
 def detectar_tipo_arquivo_por_score(texto):
+    """Pontua o texto extraído (antes da remontagem dos parágrafos), sem montar contexto."""
     if not texto: return "Indeterminado"
     titulos_paciente = ["como este medicamento funciona", "o que devo saber antes de usar"]
     titulos_profissional = ["resultados de eficacia", "caracteristicas farmacologicas"]
-    t_norm = normalizar_texto(texto)
-    score_pac = sum(1 for t in titulos_paciente if t in t_norm)
-    score_prof = sum(1 for t in titulos_profissional if t in t_norm)
+    score_pac = contar_marcadores(texto, titulos_paciente)
+    score_prof = contar_marcadores(texto, titulos_profissional)
     if score_pac > score_prof: return "Paciente"
     elif score_prof > score_pac: return "Profissional"
     return "Indeterminado"
 
-def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_bula):
+def gerar_relatorio_final(contexto_ref, contexto_belfar, nome_ref, nome_belfar, tipo_bula):
     st.header("Relatório de Auditoria Inteligente")
-    rx_anvisa = r"(aprovad[ao]\s+pela\s+anvisa\s+em|data\s+de\s+aprovação\s+na\s+anvisa:)\s*([\d]{1,2}/[\d]{1,2}/[\d]{2,4})"
-    m_ref = re.search(rx_anvisa, texto_ref or "", re.IGNORECASE)
-    m_bel = re.search(rx_anvisa, texto_belfar or "", re.IGNORECASE)
+    m_ref = contexto_ref.buscar_marcador(RX_ANVISA)
+    m_bel = contexto_belfar.buscar_marcador(RX_ANVISA)
     data_ref = m_ref.group(2).strip() if m_ref else "Não encontrada"
     data_bel = m_bel.group(2).strip() if m_bel else "Não encontrada"
 
-    secoes_faltantes, diferencas_conteudo, similaridades, diferencas_titulos, secoes_analisadas = verificar_secoes_e_conteudo(texto_ref, texto_belfar)
-    erros = checar_ortografia_inteligente(texto_belfar, texto_ref)
+    secoes_faltantes, diferencas_conteudo, similaridades, diferencas_titulos, secoes_analisadas = verificar_secoes_e_conteudo(contexto_ref, contexto_belfar)
+    erros = checar_ortografia_inteligente(contexto_belfar, contexto_ref)
     score = sum(similaridades)/len(similaridades) if similaridades else 100.0
 
     c1, c2, c3, c4 = st.columns(4)
@@ -643,8 +529,9 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     st.divider()
     st.subheader("Seções (clique para expandir)")
     
-    html_ref = construir_html_secoes(secoes_analisadas, [], True)
-    html_bel = construir_html_secoes(secoes_analisadas, erros, False)
+    diffs = comparar_secoes(secoes_analisadas, tokenizar_diff, normalizar_token)
+    html_ref = construir_html_secoes(secoes_analisadas, diffs, [], contexto_ref, True)
+    html_bel = construir_html_secoes(secoes_analisadas, diffs, erros, contexto_belfar, False)
     prefixos = {"PARA QUE ESTE MEDICAMENTO É INDICADO": "1.", "COMO ESTE MEDICAMENTO FUNCIONA?": "2.", "QUANDO NÃO DEVO USAR ESTE MEDICAMENTO?": "3.", "O QUE DEVO SABER ANTES DE USAR ESTE MEDICAMENTO?": "4.", "ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR ESTE MEDICAMENTO?": "5.", "COMO DEVO USAR ESTE MEDICAMENTO?": "6.", "O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR ESTE MEDICAMENTO?": "7.", "QUAIS OS MALES QUE ESTE MEDICAMENTO PODE CAUSAR?": "8.", "O QUE FAZER SE ALGUEM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA DESTE MEDICAMENTO?": "9."}
 
     for diff in secoes_analisadas:
@@ -674,6 +561,7 @@ def gerar_relatorio_final(texto_ref, texto_belfar, nome_ref, nome_belfar, tipo_b
     cr, cb = st.columns(2, gap="large")
     with cr: st.markdown(f"**📄 {nome_ref}**<div class='bula-box-full'>{h_r}</div>", unsafe_allow_html=True)
     with cb: st.markdown(f"**📄 {nome_belfar}**<div class='bula-box-full'>{h_b}</div>", unsafe_allow_html=True)
+    registrar_estatisticas(ref=contexto_ref, arte=contexto_belfar)
 
 # ----------------- MAIN -----------------
 st.title("🔬 Inteligência Artificial para Auditoria de Bulas (v105)")
@@ -695,12 +583,14 @@ if st.button("🔍 Iniciar Auditoria Completa", use_container_width=True, type="
         st.warning("⚠️ Envie ambos os arquivos.")
     else:
         with st.spinner("Lendo arquivos, removendo lixo gráfico e validando estrutura..."):
-            texto_ref_raw, erro_ref = extrair_texto_hibrido(pdf_ref, 'docx' if pdf_ref.name.endswith('.docx') else 'pdf', is_marketing_pdf=False)
-            texto_belfar_raw, erro_belfar = extrair_texto_hibrido(pdf_belfar, 'docx' if pdf_belfar.name.endswith('.docx') else 'pdf', is_marketing_pdf=True)
+            texto_ref_raw, erro_ref, ocr_ref = extrair_texto_hibrido(pdf_ref, 'docx' if pdf_ref.name.endswith('.docx') else 'pdf', is_marketing_pdf=False)
+            texto_belfar_raw, erro_belfar, ocr_bel = extrair_texto_hibrido(pdf_belfar, 'docx' if pdf_belfar.name.endswith('.docx') else 'pdf', is_marketing_pdf=True)
 
             if erro_ref or erro_belfar:
                 st.error(f"Erro de leitura: {erro_ref or erro_belfar}")
             else:
+                for nome, paginas_ocr in ((pdf_ref.name, ocr_ref), (pdf_belfar.name, ocr_bel)):
+                    if paginas_ocr: st.info(f"🔎 {nome}: OCR aplicado nas páginas {', '.join(map(str, paginas_ocr))}.")
                 detectado_ref = detectar_tipo_arquivo_por_score(texto_ref_raw)
                 detectado_bel = detectar_tipo_arquivo_por_score(texto_belfar_raw)
                 
@@ -711,13 +601,10 @@ if st.button("🔍 Iniciar Auditoria Completa", use_container_width=True, type="
                     st.error(f"🚨 Arquivo MKT parece Bula Profissional. Use Paciente."); erro=True
                 
                 if not erro:
-                    t_ref = reconstruir_paragrafos(texto_ref_raw)
-                    t_ref = truncar_apos_anvisa(t_ref)
-                    
-                    t_bel = reconstruir_paragrafos(texto_belfar_raw)
-                    t_bel = truncar_apos_anvisa(t_bel)
-                    
-                    gerar_relatorio_final(t_ref, t_bel, pdf_ref.name, pdf_belfar.name, tipo_bula_selecionado)
+                    ctx_ref = contexto_documento(reconstruir_paragrafos(texto_ref_raw))
+                    ctx_bel = contexto_documento(reconstruir_paragrafos(texto_belfar_raw))
+                    gerar_relatorio_final(truncar_apos_anvisa(ctx_ref), truncar_apos_anvisa(ctx_bel), pdf_ref.name,
+                                          pdf_belfar.name, tipo_bula_selecionado)
 
 st.divider()
 st.caption("Sistema de Auditoria v105 | Limpeza de Dimensões Numéricas Soltas.")
@@ -0,0 +1,110 @@
+import os
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import fitz  # PyMuPDF
+
+from layout_utils import ordenar_blocos
+from tipografia_utils import ler_pagina, titulos_tipograficos, LINHA_DTYPE
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Número de processos usados na extração paralela (0 = um por núcleo).
+PDF_WORKERS = int(os.environ.get("BULAS_PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+# Abaixo deste número de páginas o custo de subir o pool não compensa: extrai em série.
+PDF_MIN_PAGINAS_PARALELO = int(os.environ.get("BULAS_PDF_MIN_PAGINAS_PARALELO", "8"))
+
+MODO_TEXTO = "texto"      # page.get_text("text", sort=True)
+MODO_COLUNAS = "colunas"  # organizar_por_colunas(page)
+
+
+@contextmanager
+def abrir_pdf(fonte):
+    """Documento fitz a partir de bytes, de um caminho ou já aberto (este não é fechado aqui)."""
+    if isinstance(fonte, fitz.Document):
+        yield fonte
+        return
+    doc = fitz.open(fonte) if isinstance(fonte, str) else fitz.open(stream=fonte, filetype="pdf")
+    try:
+        yield doc
+    finally:
+        doc.close()
+
+
+# ----------------- EXTRAÇÃO POR PÁGINA -----------------
+def organizar_por_colunas(page, blocos=None):
+    if blocos is None: blocos = [b for b in page.get_text("blocks", sort=False) if b[6] == 0]
+    return "".join(b[4] + "\n" for b in ordenar_blocos(blocos))
+
+
+def extrair_pagina_tipografica(page, modo):
+    """(texto, linhas, textos das linhas) da página a partir de uma única leitura (ver tipografia_utils)."""
+    leitura = ler_pagina(page)
+    if modo == MODO_COLUNAS: texto = organizar_por_colunas(page, leitura.blocos)
+    else: texto = page.get_text("text", sort=True, textpage=leitura.textpage)
+    return texto, leitura.linhas, leitura.textos
+
+
+def extrair_texto_pagina(page, modo):
+    return extrair_pagina_tipografica(page, modo)[0]
+
+
+# ----------------- POOL DE PROCESSOS -----------------
+# Cada worker reabre o PDF uma única vez (pelo caminho do arquivo da sessão ou, sem ele,
+# a partir dos bytes) e depois só recebe intervalos de páginas.
+_doc_worker = None
+
+
+def _iniciar_worker(fonte):
+    global _doc_worker
+    _doc_worker = fitz.open(fonte) if isinstance(fonte, str) else fitz.open(stream=fonte, filetype="pdf")
+
+
+def _fonte_worker(fonte):
+    if not isinstance(fonte, fitz.Document): return fonte
+    return fonte.name if fonte.name and os.path.isfile(fonte.name) else fonte.tobytes()
+
+
+def _extrair_intervalo(inicio, fim, modo):
+    return [extrair_pagina_tipografica(_doc_worker[i], modo) for i in range(inicio, fim)]
+
+
+def _dividir_intervalos(total, workers):
+    # Duas fatias por worker equilibram páginas "pesadas" sem multiplicar o IPC.
+    fatias = min(total, workers * 2)
+    tamanho = -(-total // fatias)
+    return [(i, min(i + tamanho, total)) for i in range(0, total, tamanho)]
+
+
+def _extrair_documento(pdf, modo, workers):
+    workers = PDF_WORKERS if workers is None else workers
+    with abrir_pdf(pdf) as doc:
+        total = doc.page_count
+        if workers <= 1 or total < max(PDF_MIN_PAGINAS_PARALELO, 2):
+            return [extrair_pagina_tipografica(page, modo) for page in doc]
+
+    intervalos = _dividir_intervalos(total, workers)
+    # "spawn" evita fazer fork do servidor Streamlit (multi-thread).
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(intervalos)), mp_context=ctx,
+                             initializer=_iniciar_worker, initargs=(_fonte_worker(pdf),)) as pool:
+        partes = pool.map(_extrair_intervalo, [a for a, _ in intervalos], [b for _, b in intervalos],
+                          [modo] * len(intervalos))
+        return [pagina for parte in partes for pagina in parte]
+
+
+def extrair_paginas_pdf(pdf, modo=MODO_TEXTO, workers=None):
+    """Retorna o texto de cada página, na ordem original (idêntico ao modo serial).
+
+    `pdf` pode ser os bytes, o caminho ou um documento fitz já aberto (ex.: SessaoDocumento.doc).
+    """
+    return [texto for texto, _, _ in _extrair_documento(pdf, modo, workers)]
+
+
+def extrair_pdf_com_titulos(pdf, modo=MODO_TEXTO, workers=None):
+    """Como extrair_paginas_pdf, mais as linhas que a tipografia aponta como títulos."""
+    paginas = _extrair_documento(pdf, modo, workers)
+    linhas = np.concatenate([l for _, l, _ in paginas]) if paginas else np.empty(0, LINHA_DTYPE)
+    textos = [t for _, _, ts in paginas for t in ts]
+    return [texto for texto, _, _ in paginas], titulos_tipograficos(linhas, textos)
@@ -0,0 +1,97 @@
+from functools import lru_cache
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from thefuzz.utils import full_process
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Pontuação dos títulos de seção em lote: todas as linhas contra todos os títulos numa matriz
+# (rapidfuzz.process.cdist), com as mesmas notas de thefuzz.fuzz.token_set_ratio — mesmo
+# pré-processamento (full_process, força ASCII) e o mesmo arredondamento (round, meio para o par).
+TITULO_NOTA_CANDIDATO = 88   # nota a partir da qual a linha vira candidata a título
+TITULO_NOTA_SUBSTRING = 95   # título normalizado contido na linha
+PONTUACAO_CACHE = 16         # documentos pontuados mantidos em cache (a arte é mapeada mais de uma vez)
+
+
+def processar(texto):
+    """O pré-processamento que thefuzz aplica antes de pontuar."""
+    return full_process(texto, force_ascii=True)
+
+
+def _conjunto(texto):
+    return " ".join(sorted(set(texto.split())))
+
+
+# ----------------- PRÉ-FILTRO -----------------
+def _pode_passar(linhas, titulos, corte):
+    """Máscara das linhas que podem chegar a `corte` contra algum título.
+
+    Uma linha sem nenhuma palavra de título só é comparada como conjunto ordenado de palavras
+    (ratio), que não passa de 200·min(a, b)/(a + b): se esse limite fica abaixo do corte para
+    todos os títulos, a linha é descartada sem ser pontuada.
+    """
+    palavras = set().union(*(t.split() for t in titulos))
+    tam_titulos = np.array([len(_conjunto(t)) for t in titulos], dtype=float)
+    mascara = np.zeros(len(linhas), dtype=bool)
+    for i, linha in enumerate(linhas):
+        tokens = linha.split()
+        if palavras.intersection(tokens): mascara[i] = True; continue
+        n = len(_conjunto(linha))
+        mascara[i] = n > 0 and (200 * np.minimum(n, tam_titulos) / (n + tam_titulos)).max() >= corte
+    return mascara
+
+
+# ----------------- PONTUAÇÃO -----------------
+def _notas(titulos, linhas, corte=None):
+    """Matriz linhas x títulos de notas inteiras; com `corte`, notas abaixo dele viram 0."""
+    if not linhas: return np.zeros((0, len(titulos)), dtype=np.int64)
+    # Mesma ordem de argumentos de token_set_ratio(título, linha) no laço antigo.
+    bruto = process.cdist(titulos, linhas, scorer=fuzz.token_set_ratio, processor=None,
+                          score_cutoff=corte, dtype=np.float64)
+    return np.rint(bruto).astype(np.int64).T
+
+
+@lru_cache(maxsize=PONTUACAO_CACHE)
+def _melhores(titulos, linhas, pontuar, exatas):
+    titulos_p = [processar(t) for t in titulos]
+    pontuar, exatas = np.array(pontuar, dtype=bool), np.array(exatas, dtype=bool)
+    notas = np.zeros((len(linhas), len(titulos)), dtype=np.int64)
+
+    # Linhas que precisam da nota exata (ex.: numeradas, que são candidatas de qualquer jeito).
+    idx = np.flatnonzero(pontuar & exatas)
+    notas[idx] = _notas(titulos_p, [processar(linhas[i]) for i in idx])
+    # Nas demais só importa saber se chegam à nota de candidato: notas menores viram 0.
+    corte = TITULO_NOTA_CANDIDATO - 0.5  # round(87.5) == 88
+    idx = np.flatnonzero(pontuar & ~exatas)
+    linhas_p = [processar(linhas[i]) for i in idx]
+    passa = _pode_passar(linhas_p, titulos_p, corte) if len(idx) else np.zeros(0, dtype=bool)
+    notas[idx[passa]] = _notas(titulos_p, [l for l, p in zip(linhas_p, passa) if p], corte)
+
+    for j, t in enumerate(titulos):
+        contem = np.fromiter((t in linha for linha in linhas), dtype=bool, count=len(linhas))
+        notas[contem, j] = np.maximum(notas[contem, j], TITULO_NOTA_SUBSTRING)
+
+    if not titulos: return (0,) * len(linhas), (-1,) * len(linhas)
+    melhor = notas.argmax(axis=1)  # o primeiro título com a maior nota, como no laço com ">"
+    nota = notas[np.arange(len(linhas)), melhor]
+    return tuple(nota.tolist()), tuple(np.where(nota > 0, melhor, -1).tolist())
+
+
+def melhores_titulos(titulos, linhas, pontuar=None, exatas=None):
+    """Para cada linha normalizada: (maior nota entre os títulos, índice do título ou -1).
+
+    Mesmo resultado do laço com fuzz.token_set_ratio (+ nota 95 quando o título está contido
+    na linha), para as linhas em `exatas`. Nas outras, a nota só é exata quando chega a
+    TITULO_NOTA_CANDIDATO ou vem da substring; abaixo disso pode sair menor (até 0).
+    pontuar: linhas que passam pela pontuação fuzzy (as demais só pelo teste de substring).
+    """
+    n = len(linhas)
+    return _melhores(tuple(titulos), tuple(linhas),
+                     tuple(map(bool, pontuar)) if pontuar is not None else (True,) * n,
+                     tuple(map(bool, exatas)) if exatas is not None else (False,) * n)
+
+
+def notas_exatas(titulos, linhas):
+    """Matriz títulos x linhas com fuzz.token_set_ratio(título, linha) do thefuzz, em lote."""
+    if not titulos: return np.zeros((0, len(linhas)), dtype=np.int64)
+    return _notas([processar(t) for t in titulos], [processar(l) for l in linhas]).T
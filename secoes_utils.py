@@ -0,0 +1,127 @@
+import re
+import logging
+from bisect import bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from pontuacao_utils import notas_exatas
+
+logger = logging.getLogger(__name__)
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Mapeamento das seções esperadas nos candidatos a título. Cada par (seção, candidato) recebe
+# uma vez a regra mais forte que o casa (as mesmas regras das passadas antigas, na mesma
+# prioridade); a escolha é o alinhamento monótono — seções em ordem, linhas crescentes — que
+# encontra o maior número de seções e, entre esses, o de regras mais fortes. Uma referência
+# cruzada casada cedo não empurra mais as seções seguintes para fora do mapa.
+REGRA_FUZZY, REGRA_TEXTO, REGRA_NUMERO, REGRA_CANONICO = 1, 2, 3, 4
+NOMES_REGRAS = {REGRA_FUZZY: "fuzzy", REGRA_TEXTO: "texto", REGRA_NUMERO: "número", REGRA_CANONICO: "canônico"}
+NOTA_FUZZY_SECAO = 92
+PESO_SECAO = 1000  # > soma de todas as regras: achar mais uma seção vale mais que regras melhores
+
+# escolhas: posição do candidato de cada seção (ou None); regras: matriz seções x candidatos;
+# total: valor do alinhamento.
+Alinhamento = namedtuple("Alinhamento", ["escolhas", "regras", "total"])
+
+_RX_NUMERO_SECAO = re.compile(r'^(\d{1,2})\.')  # "3." no começo do título canônico / da linha
+
+
+# ----------------- REGRAS -----------------
+def matriz_regras(secoes, normas, numeros, candidatos, fuzzy=True, valido=None):
+    """Regra mais forte que casa cada seção com cada candidato (0 = nenhuma).
+
+    normas: título normalizado de cada seção; numeros: número esperado de cada seção (ou None);
+    valido(k, c): filtro da página para o par (ex.: número divergente, referência cruzada).
+    """
+    regras = np.zeros((len(normas), len(candidatos)), dtype=np.int64)
+    if not candidatos: return regras
+    if fuzzy: regras[notas_exatas(normas, [c.norm for c in candidatos]) >= NOTA_FUZZY_SECAO] = REGRA_FUZZY
+    for k, (sec, norma, numero) in enumerate(zip(secoes, normas, numeros)):
+        for j, c in enumerate(candidatos):
+            if c.matched_canon == sec: regras[k, j] = REGRA_CANONICO
+            elif numero is not None and c.numeric == numero: regras[k, j] = REGRA_NUMERO
+            elif norma and norma in c.norm: regras[k, j] = REGRA_TEXTO
+            if regras[k, j] and valido and not valido(k, c): regras[k, j] = 0
+    return regras
+
+
+# ----------------- ALINHAMENTO -----------------
+def alinhar(regras):
+    """Atribuição monótona de maior valor: cada seção casada vale PESO_SECAO + regra.
+
+    melhor[s, j]: valor ótimo das s primeiras seções usando só os j primeiros candidatos.
+    Cada linha da tabela sai de max(pular o candidato, pular a seção, casar os dois) — O(seções
+    x candidatos). No empate, cada seção fica com o candidato mais cedo.
+    """
+    m, n = regras.shape
+    ganho = np.where(regras > 0, PESO_SECAO + regras, -1)
+    melhor = np.zeros((m + 1, n + 1), dtype=np.int64)
+    for s in range(m):
+        melhor[s + 1, 1:] = np.maximum.accumulate(np.maximum(melhor[s, 1:], melhor[s, :-1] + ganho[s]))
+
+    escolhas = [None] * m
+    s, j = m, n
+    while s and j:
+        if melhor[s, j] == melhor[s, j - 1]: j -= 1
+        elif regras[s - 1, j - 1] and melhor[s, j] == melhor[s - 1, j - 1] + ganho[s - 1, j - 1]:
+            escolhas[s - 1] = j - 1; s -= 1; j -= 1
+        else: s -= 1
+    return Alinhamento(escolhas, regras, int(melhor[m, n]))
+
+
+def descrever(secoes, candidatos, alinhamento):
+    """Por seção: linha escolhida, regra e todas as linhas que a casariam — para depuração."""
+    saida = []
+    for k, sec in enumerate(secoes):
+        j = alinhamento.escolhas[k]
+        saida.append({'secao': sec, 'linha': candidatos[j].index if j is not None else None,
+                      'regra': NOMES_REGRAS.get(int(alinhamento.regras[k, j])) if j is not None else None,
+                      'alternativas': [(c.index, NOMES_REGRAS[int(r)])
+                                       for c, r in zip(candidatos, alinhamento.regras[k]) if r]})
+    return saida
+
+
+def montar_mapa(secoes, candidatos, alinhamento):
+    """Entradas do mapa de seções (ordenadas pela linha), no formato das páginas."""
+    if logger.isEnabledFor(logging.DEBUG):
+        for d in descrever(secoes, candidatos, alinhamento): logger.debug("seção %s", d)
+    mapa = [{'canonico': sec, 'titulo_encontrado': candidatos[j].raw, 'linha_inicio': candidatos[j].index,
+             'score': candidatos[j].score, 'regra': NOMES_REGRAS[int(alinhamento.regras[k, j])]}
+            for k, (sec, j) in enumerate(zip(secoes, alinhamento.escolhas)) if j is not None]
+    return sorted(mapa, key=lambda x: x['linha_inicio'])
+
+
+# ----------------- SEGMENTAÇÃO -----------------
+def segmentar(mapa, linhas, titulos_norm, normalizar, trava_numerica=False, normalizadas=None):
+    """{canônico: (título encontrado, conteúdo)} de todas as seções do mapa, numa passada.
+
+    O conteúdo vai da linha seguinte ao título até o próximo início do mapa (DIZERES LEGAIS:
+    até o fim do texto) e para antes na primeira linha cuja forma normalizada está em
+    `titulos_norm` — ou, com trava_numerica, numa linha "N." com N maior que o número da seção.
+    Cada linha é normalizada no máximo uma vez; `normalizadas` (as formas já calculadas de
+    todas as linhas, ex.: ContextoDocumento.linhas_normalizadas) dispensa `normalizar`.
+    """
+    inicios = sorted({m['linha_inicio'] for m in mapa})
+    eh_titulo = {}  # linha -> forma normalizada está entre os títulos (calculado sob demanda)
+    segmentos = {}
+    for m in mapa:
+        sec, ini = m['canonico'], m['linha_inicio']
+        if sec in segmentos: continue  # vale a primeira entrada da seção, como na busca antiga
+        if sec.strip().upper() == "DIZERES LEGAIS": fim = len(linhas)
+        else:
+            k = bisect_right(inicios, ini)
+            fim = inicios[k] if k < len(inicios) else len(linhas)
+        num_sec = _RX_NUMERO_SECAO.match(sec) if trava_numerica else None
+        num_sec = int(num_sec.group(1)) if num_sec else None
+        i = ini + 1
+        while i < fim:
+            if num_sec is not None:
+                num = _RX_NUMERO_SECAO.match(linhas[i].strip())
+                if num and int(num.group(1)) > num_sec: break
+            if i not in eh_titulo:
+                eh_titulo[i] = (normalizadas[i] if normalizadas is not None else normalizar(linhas[i])) in titulos_norm
+            if eh_titulo[i]: break
+            i += 1
+        segmentos[sec] = (m['titulo_encontrado'], "\n".join(linhas[ini + 1:i]).strip())
+    return segmentos
@@ -0,0 +1,78 @@
+import os
+import mmap
+import shutil
+import hashlib
+import tempfile
+
+import fitz  # PyMuPDF
+
+from cache_utils import chave_cache_digest
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Uploads são gravados uma vez em disco e mapeados em memória: o fitz lê do arquivo sob
+# demanda e os workers abrem o mesmo caminho, em vez de cada etapa receber uma cópia dos bytes.
+SESSAO_DIR = os.environ.get("BULAS_SPOOL_DIR") or None  # None = diretório temporário do sistema
+
+
+def _copiar_upload(arquivo, destino):
+    arquivo.seek(0)
+    if hasattr(arquivo, "getbuffer"):
+        # UploadedFile do Streamlit é um BytesIO: grava direto do buffer, sem outra cópia.
+        with arquivo.getbuffer() as buf: destino.write(buf)
+    else:
+        shutil.copyfileobj(arquivo, destino, 1 << 20)
+
+
+# ----------------- SESSÃO DO DOCUMENTO -----------------
+class SessaoDocumento:
+    """Um upload gravado em disco uma única vez, com mmap, digest e documento fitz compartilhados.
+
+    Use como context manager: ao sair, o documento é fechado e o arquivo temporário removido.
+    """
+
+    def __init__(self, arquivo, tipo_arquivo):
+        self.tipo = tipo_arquivo
+        fd, self.caminho = tempfile.mkstemp(prefix="bula_", suffix="." + tipo_arquivo, dir=SESSAO_DIR)
+        self._mm, self._doc, self._digest = None, None, None
+        try:
+            with os.fdopen(fd, "wb") as f: _copiar_upload(arquivo, f)
+            if os.path.getsize(self.caminho):
+                with open(self.caminho, "rb") as f:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.fechar()
+            raise
+
+    @property
+    def dados(self):
+        """Conteúdo do upload (memoryview sobre o mmap, sem cópia)."""
+        return memoryview(self._mm) if self._mm is not None else memoryview(b"")
+
+    @property
+    def digest(self):
+        if self._digest is None: self._digest = hashlib.sha256(self.dados).hexdigest()
+        return self._digest
+
+    def chave_cache(self, *modo):
+        """Mesma chave de cache_utils.chave_cache(bytes do upload, *modo)."""
+        return chave_cache_digest(self.digest, *modo)
+
+    @property
+    def doc(self):
+        """Documento fitz aberto a partir do arquivo (uma vez por sessão)."""
+        if self._doc is None: self._doc = fitz.open(self.caminho)
+        return self._doc
+
+    def fechar(self):
+        if self._doc is not None: self._doc.close(); self._doc = None
+        if self._mm is not None: self._mm.close(); self._mm = None
+        try:
+            os.remove(self.caminho)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
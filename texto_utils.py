@@ -0,0 +1,48 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Normalização de texto compartilhada pelas páginas. É chamada para cada token dos dois
+# lados do diff, para cada palavra do vocabulário do corretor e para cada linha no recorte
+# das seções — e o vocabulário de bula se repete muito. Por isso fica num cache do processo
+# (lru_cache: limitado e seguro entre threads), com um atalho para tokens ASCII simples.
+NORMALIZACAO_CACHE_MAX = 65536
+
+_RX_PONTUACAO = re.compile(r"[^\w\s]")
+# Prefixo numérico dos títulos ("1.", "2 -", "3)") nas páginas 2 e 3.
+RX_NUMERO_TITULO = re.compile(r"^\d+\s*[\.\-)]*\s*")
+
+
+# ----------------- NORMALIZAÇÃO -----------------
+def normalizar_texto_sem_cache(texto):
+    """Minúsculo, sem acentos, sem pontuação e com os espaços colapsados."""
+    texto = "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+    texto = _RX_PONTUACAO.sub("", texto)
+    return " ".join(texto.split()).lower()
+
+
+_normalizar_com_cache = lru_cache(maxsize=NORMALIZACAO_CACHE_MAX)(normalizar_texto_sem_cache)
+
+
+def normalizar_texto(texto):
+    if not isinstance(texto, str): return ""
+    # Atalho: token ASCII só com letras e dígitos não tem acento, pontuação nem espaço.
+    if texto.isascii() and texto.isalnum(): return texto.lower()
+    return _normalizar_com_cache(texto)
+
+
+@lru_cache(maxsize=NORMALIZACAO_CACHE_MAX)
+def _normalizar_titulo(texto, prefixo):
+    return prefixo.sub("", normalizar_texto(texto)).strip()
+
+
+def normalizar_titulo_para_comparacao(texto, prefixo=RX_NUMERO_TITULO):
+    """normalizar_texto sem o número do título no começo (o padrão `prefixo`)."""
+    return _normalizar_titulo(texto or "", prefixo)
+
+
+def estatisticas_normalizacao():
+    """{função: CacheInfo(hits, misses, maxsize, currsize)} dos caches de normalização."""
+    return {"normalizar_texto": _normalizar_com_cache.cache_info(),
+            "normalizar_titulo_para_comparacao": _normalizar_titulo.cache_info()}
@@ -0,0 +1,92 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+import fitz  # PyMuPDF
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Uma única leitura por página (um TextPage) alimenta o texto puro, os blocos e as
+# características tipográficas de cada linha, guardadas num array estruturado.
+LINHA_DTYPE = np.dtype([
+    ("pagina", "i4"), ("bloco", "i4"), ("inicio_bloco", "?"),
+    ("x0", "f4"), ("y0", "f4"), ("x1", "f4"), ("y1", "f4"),
+    ("tamanho", "f4"),      # corpo dominante da linha (por número de caracteres)
+    ("negrito", "f4"),      # fração dos caracteres em negrito
+    ("maiusculas", "f4"),   # fração das letras em caixa alta
+    ("caracteres", "i4"),
+])
+
+TIPO_FATOR_TAMANHO = 1.15       # corpo >= 115% do corpo do texto = destaque
+TIPO_TITULO_MAX_CARACTERES = 90
+TIPO_MAX_FRACAO_TITULOS = 0.4   # acima disto a "tipografia" não diferencia nada: sem dicas
+
+LeituraPagina = namedtuple("LeituraPagina", ["textpage", "blocos", "linhas", "textos"])
+
+_RX_FONTE_NEGRITO = re.compile(r"bold|black|heavy|demi|semibold|negrito", re.IGNORECASE)
+
+
+# ----------------- LEITURA DA PÁGINA -----------------
+def _span_negrito(span):
+    return bool(span["flags"] & fitz.TEXT_FONT_BOLD) or bool(_RX_FONTE_NEGRITO.search(span["font"]))
+
+
+def ler_pagina(page):
+    """Lê a página uma vez: TextPage reutilizável, blocos no formato de get_text("blocks")
+    (só texto) e, por linha, o array tipográfico e o texto."""
+    tp = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+    blocos, textos, registros = [], [], []
+    for b in tp.extractDICT()["blocks"]:
+        if b["type"] != 0: continue
+        linhas_bloco = []
+        for k, linha in enumerate(b["lines"]):
+            spans = linha["spans"]
+            texto = "".join(s["text"] for s in spans)
+            linhas_bloco.append(texto)
+            n = [len(s["text"].strip()) for s in spans]
+            total = sum(n) or 1
+            tamanhos = {}
+            for s, c in zip(spans, n): tamanhos[s["size"]] = tamanhos.get(s["size"], 0) + c
+            letras = [c for c in texto if c.isalpha()]
+            registros.append((page.number, len(blocos), k == 0, *linha["bbox"],
+                              max(tamanhos, key=tamanhos.get) if tamanhos else 0,
+                              sum(c for s, c in zip(spans, n) if _span_negrito(s)) / total,
+                              sum(c.isupper() for c in letras) / len(letras) if letras else 0,
+                              sum(n)))
+            textos.append(texto)
+        blocos.append((*b["bbox"], "".join(t + "\n" for t in linhas_bloco), b["number"], 0))
+    return LeituraPagina(tp, blocos, np.array(registros, dtype=LINHA_DTYPE), textos)
+
+
+# ----------------- DICAS DE TÍTULO -----------------
+def corpo_do_texto(linhas):
+    """Corpo (tamanho de fonte) predominante, ponderado pelo número de caracteres."""
+    if len(linhas) == 0 or linhas["caracteres"].sum() == 0: return 0.0
+    ordem = np.argsort(linhas["tamanho"])
+    acumulado = np.cumsum(linhas["caracteres"][ordem])
+    return float(linhas["tamanho"][ordem][np.searchsorted(acumulado, acumulado[-1] / 2)])
+
+
+def titulos_tipograficos(linhas, textos):
+    """Linhas que a tipografia aponta como título (maiores que o corpo, ou curtas em negrito
+    abrindo bloco / em caixa alta). Títulos quebrados em várias linhas do mesmo bloco
+    entram também juntos. Lista vazia quando a tipografia não distingue nada."""
+    if len(linhas) == 0: return []
+    corpo = corpo_do_texto(linhas)
+    curta = (linhas["caracteres"] > 0) & (linhas["caracteres"] <= TIPO_TITULO_MAX_CARACTERES)
+    negrito = linhas["negrito"] >= 0.8
+    destaque = curta & ((linhas["tamanho"] >= corpo * TIPO_FATOR_TAMANHO)
+                        | (negrito & (linhas["inicio_bloco"] | (linhas["maiusculas"] >= 0.6))))
+    if not destaque.any() or destaque.mean() > TIPO_MAX_FRACAO_TITULOS: return []
+
+    titulos, atual, chave_atual, anterior = [], [], None, None
+    for i in np.flatnonzero(destaque).tolist():
+        chave = (int(linhas["pagina"][i]), int(linhas["bloco"][i]))
+        texto = textos[i].strip()
+        titulos.append(texto)
+        if atual and chave == chave_atual and anterior == i - 1: atual.append(texto)
+        else:
+            if len(atual) > 1: titulos.append(" ".join(atual))
+            atual, chave_atual = [texto], chave
+        anterior = i
+    if len(atual) > 1: titulos.append(" ".join(atual))
+    return titulos
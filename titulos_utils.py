@@ -0,0 +1,149 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+
+# ----------------- CONFIGURAÇÃO -----------------
+# Normalização dos 9 títulos da bula do paciente numa varredura só. Cada regra é o padrão
+# antigo de forcar_titulos_bula partido em âncora (palavras fixas do início do título, com
+# espaços opcionais) e cauda (lacunas limitadas até a palavra final). As âncoras são achadas
+# como palavras-chave (chaves) no texto normalizado — minúsculo e sem espaços — e só nesses
+# pontos a cauda é verificada, com no máximo cauda_max caracteres além da âncora.
+RegraTitulo = namedtuple("RegraTitulo", ["numero", "ancora", "chaves", "cauda", "cauda_max", "canonico"])
+
+REGRAS_TITULOS = [
+    RegraTitulo(1, r"PARA\s*QUE\s*ESTE\s*MEDICAMENTO\s*", ("paraqueestemedicamento",), r"[\s\S]{0,100}?INDICADO\??", 109,
+                "1. PARA QUE ESTE MEDICAMENTO É INDICADO?"),
+    RegraTitulo(2, r"COMO\s*ESTE\s*MEDICAMENTO\s*", ("comoestemedicamento",), r"[\s\S]{0,100}?FUNCIONA\??", 109,
+                "2. COMO ESTE MEDICAMENTO FUNCIONA?"),
+    RegraTitulo(3, r"QUANDO\s*N[ÃA]O\s*DEVO\s*USAR\s*", ("quandonãodevousar", "quandonaodevousar"), r"[\s\S]{0,100}?MEDICAMENTO\??", 112,
+                "3. QUANDO NÃO DEVO USAR ESTE MEDICAMENTO?"),
+    RegraTitulo(4, r"O\s*QUE\s*DEVO\s*SABER", ("oquedevosaber",), r"[\s\S]{1,100}?USAR[\s\S]{1,100}?MEDICAMENTO\??", 216,
+                "4. O QUE DEVO SABER ANTES DE USAR ESTE MEDICAMENTO?"),
+    RegraTitulo(5, r"ONDE\s*,?\s*COMO\s*E\s*POR\s*QUANTO", ("onde,comoeporquanto", "ondecomoeporquanto"), r"[\s\S]{1,100}?GUARDAR[\s\S]{1,100}?MEDICAMENTO\??", 219,
+                "5. ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR ESTE MEDICAMENTO?"),
+    RegraTitulo(6, r"COMO\s*DEVO\s*USAR\s*ESTE\s*", ("comodevousareste",), r"[\s\S]{0,100}?MEDICAMENTO\??", 112,
+                "6. COMO DEVO USAR ESTE MEDICAMENTO?"),
+    RegraTitulo(7, r"O\s*QUE\s*DEVO\s*FAZER", ("oquedevofazer",), r"[\s\S]{0,200}?MEDICAMENTO\??", 212,
+                "7. O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR ESTE MEDICAMENTO?"),
+    RegraTitulo(8, r"QUAIS\s*OS\s*MALES", ("quaisosmales",), r"[\s\S]{0,200}?CAUSAR\??", 207,
+                "8. QUAIS OS MALES QUE ESTE MEDICAMENTO PODE CAUSAR?"),
+    RegraTitulo(9, r"O\s*QUE\s*FAZER\s*SE\s*ALGU[EÉ]M\s*USAR", ("oquefazersealguémusar", "oquefazersealguemusar"), r"[\s\S]{0,400}?MEDICAMENTO\??", 412,
+                "9. O QUE FAZER SE ALGUEM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA DESTE MEDICAMENTO?"),
+]
+
+# rx: padrão completo (o mesmo da cadeia antiga); seguro: False se o canônico de alguma regra
+# casar com outra regra — aí a varredura única não equivale à cadeia e ela é sempre usada.
+NormalizadorTitulos = namedtuple("NormalizadorTitulos", ["regras", "rx", "ancoras", "seguro"])
+
+# \s do re = str.isspace (todos os espaços Unicode estão abaixo de U+3001).
+_ESPACOS = np.array([c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+# Letras que o re.IGNORECASE iguala a i/s mas que str.lower() não converte.
+_DOBRAS = {0x131: "i", 0x17F: "s"}
+
+
+def padrao_completo(regra):
+    return rf"(?:{regra.numero}\.?\s*)?" + regra.ancora + regra.cauda
+
+
+def compilar_titulos(regras=REGRAS_TITULOS):
+    flags = re.IGNORECASE | re.DOTALL
+    rx = [re.compile(padrao_completo(r), flags) for r in regras]
+    ancoras = [re.compile(r.ancora, flags) for r in regras]
+    seguro = not any(rx[j].search("\n" + r.canonico + "\n") for i, r in enumerate(regras)
+                     for j in range(len(regras)) if j != i)
+    return NormalizadorTitulos(regras, rx, ancoras, seguro)
+
+
+NORMALIZADOR_PADRAO = compilar_titulos()
+
+
+# ----------------- NORMALIZAÇÃO -----------------
+def cadeia_regex(texto, normalizador=NORMALIZADOR_PADRAO):
+    """Caminho antigo: um re.sub por regra, em sequência (referência e fallback)."""
+    for regra, rx in zip(normalizador.regras, normalizador.rx):
+        texto = rx.sub("\n" + regra.canonico.replace("\\", r"\\") + "\n", texto)
+    return texto
+
+
+def _inicio_com_numero(texto, pos, numero, limite):
+    """Início do prefixo opcional "N.␣" antes da âncora em pos (ou pos, se não houver)."""
+    j = pos
+    while j > limite and texto[j - 1].isspace(): j -= 1
+    if j > limite and texto[j - 1] == ".": j -= 1
+    return j - 1 if j > limite and texto[j - 1] == str(numero) else pos
+
+
+def _ancoras_regex(texto, normalizador):
+    return [[(m.start(), m.end()) for m in rx.finditer(texto)] for rx in normalizador.ancoras]
+
+
+def achar_ancoras(texto, normalizador=NORMALIZADOR_PADRAO):
+    """Por regra: [(início, fim)] das âncoras no texto original.
+
+    Uma passada normaliza o texto (minúsculo, sem espaços, com o mapa de posições) e as
+    chaves são procuradas com str.find; cada candidata é confirmada com a regex da âncora.
+    """
+    minusculo = texto.lower()
+    if "ı" in minusculo or "ſ" in minusculo: minusculo = minusculo.translate(_DOBRAS)
+    try:
+        codigos = np.frombuffer(minusculo.encode("utf-32-le"), dtype=np.uint32)
+    except UnicodeEncodeError:  # surrogates soltos
+        return _ancoras_regex(texto, normalizador)
+    if len(codigos) != len(texto): return _ancoras_regex(texto, normalizador)  # lower() mudou o tamanho
+    manter = ~np.isin(codigos, _ESPACOS)
+    posicoes = np.flatnonzero(manter)
+    normal = codigos[manter].tobytes().decode("utf-32-le")
+
+    achados = []
+    for regra, rx in zip(normalizador.regras, normalizador.ancoras):
+        inicios = set()
+        for chave in regra.chaves:
+            i = normal.find(chave)
+            while i != -1:
+                inicios.add(int(posicoes[i]))
+                i = normal.find(chave, i + 1)
+        achados.append([(m.start(), m.end()) for m in (rx.match(texto, i) for i in sorted(inicios)) if m])
+    return achados
+
+
+def _ocorrencias(texto, normalizador):
+    """Por regra: âncoras (com o prefixo "N.") e trechos que casam, como um re.sub isolado acharia."""
+    ancoras, trechos = [], []
+    for regra, rx, achados in zip(normalizador.regras, normalizador.rx, achar_ancoras(texto, normalizador)):
+        fim, lista = 0, []
+        for ini, _ in achados:
+            if ini < fim: continue
+            m = rx.match(texto, _inicio_com_numero(texto, ini, regra.numero, fim))
+            if m: lista.append(m.span()); fim = m.end()
+        ancoras.append([(_inicio_com_numero(texto, ini, regra.numero, 0), f) for ini, f in achados])
+        trechos.append(lista)
+    return ancoras, trechos
+
+
+def _interferem(normalizador, ancoras, trechos):
+    """A regra j roda depois da i na cadeia: se alguma âncora de j alcança um trecho trocado
+    por i (ou está dentro dele), o resultado de j pode mudar e a varredura única não vale."""
+    for j, regra in enumerate(normalizador.regras):
+        for inicio, fim_ancora in ancoras[j]:
+            alcance = fim_ancora + regra.cauda_max
+            for i in range(j):
+                if any(inicio < b and alcance > a for a, b in trechos[i]): return True
+    return False
+
+
+def forcar_titulos(texto, normalizador=NORMALIZADOR_PADRAO):
+    """Reescreve os títulos da bula com a forma canônica (cada um em linha própria).
+    Mesmo resultado da cadeia de re.sub, numa varredura só."""
+    if not normalizador.seguro: return cadeia_regex(texto, normalizador)
+    ancoras, trechos = _ocorrencias(texto, normalizador)
+    if _interferem(normalizador, ancoras, trechos): return cadeia_regex(texto, normalizador)
+    trocas = sorted((a, b, "\n" + normalizador.regras[k].canonico + "\n")
+                    for k, lista in enumerate(trechos) for a, b in lista)
+    if not trocas: return texto
+    partes, pos = [], 0
+    for a, b, novo in trocas:
+        partes += [texto[pos:a], novo]
+        pos = b
+    partes.append(texto[pos:])
+    return "".join(partes)